@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+ホットパスのマイクロベンチマーク
+記録済みの1日分の出走表（cache/boatrace_openapi_cache.json、156レース）を固定の入力として、
+予想・正規化・API整形の各処理の1回あたり・1日分あたりの時間とメモリ確保量を計測する。
+ベースライン（--update-baseline で保存）から許容悪化率を超えた場合は終了コード1を返す
+
+使用例:
+    python scripts/hot_path_benchmark.py --update-baseline
+    python scripts/hot_path_benchmark.py --repeat 7 --max-regression 0.25
+    python scripts/hot_path_benchmark.py --only normalize_prediction_data
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES_DIR = os.path.join(PROJECT_ROOT, 'scripts', 'modules')
+SRC_CORE_DIR = os.path.join(PROJECT_ROOT, 'src', 'core')
+for _path in (MODULES_DIR, SRC_CORE_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+DEFAULT_FIXTURE = os.path.join(PROJECT_ROOT, 'cache', 'boatrace_openapi_cache.json')
+DEFAULT_BASELINE = os.path.join('data', 'benchmarks', 'hot_path_baseline.json')
+DEFAULT_OUTPUT = os.path.join('logs', 'hot_path_benchmark.json')
+
+# 固定入力のレース数（記録済みの1日分）
+EXPECTED_PROGRAMS = 156
+
+
+def load_programs(fixture_path: str = DEFAULT_FIXTURE) -> Tuple[str, List[Dict]]:
+    """記録済みの1日分の出走表（日付とプログラム一覧、会場・レース番号順）"""
+    with open(fixture_path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    programs = (cache.get('data') or {}).get('programs') or []
+    programs = sorted(programs, key=lambda p: (p.get('race_stadium_number') or 0, p.get('race_number') or 0))
+    return cache.get('date'), programs
+
+
+def seed_tracker_db(db_path: str, race_date: str, programs: List[Dict]) -> int:
+    """出走表から racer_details を作成（AccuracyTracker._generate_real_prediction の入力）"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS racer_details (
+                race_date TEXT, venue_id INTEGER, race_number INTEGER, boat_number INTEGER,
+                racer_name TEXT, racer_age INTEGER, racer_weight REAL,
+                nationwide_win_rate REAL, nationwide_place_rate REAL,
+                local_win_rate REAL, local_place_rate REAL,
+                motor_win_rate REAL, motor_place_rate REAL,
+                boat_win_rate REAL, boat_place_rate REAL,
+                start_timing REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_racer_details_race ON racer_details (venue_id, race_number, race_date)')
+        rows = [
+            (race_date, program['race_stadium_number'], program['race_number'], boat.get('racer_boat_number'),
+             boat.get('racer_name'), boat.get('racer_age') or 35, boat.get('racer_weight') or 52.0,
+             boat.get('racer_national_top_1_percent'), boat.get('racer_national_top_2_percent'),
+             boat.get('racer_local_top_1_percent'), boat.get('racer_local_top_2_percent'),
+             boat.get('racer_assigned_motor_top_2_percent'), boat.get('racer_assigned_motor_top_3_percent'),
+             boat.get('racer_assigned_boat_top_2_percent'), boat.get('racer_assigned_boat_top_3_percent'),
+             boat.get('racer_average_start_timing'))
+            for program in programs for boat in program.get('boats') or []
+        ]
+        conn.executemany(f"INSERT INTO racer_details VALUES ({', '.join('?' * 16)})", rows)
+    return len(rows)
+
+
+def fixture_predictions(programs: List[Dict]) -> List[Dict]:
+    """正規化の入力（全国勝率順の固定予想、旧形式・新形式のキーを交互に使う）"""
+    predictions = []
+    for index, program in enumerate(programs):
+        boats = sorted(program.get('boats') or [], key=lambda b: -(b.get('racer_national_top_1_percent') or 0))
+        order = [boat.get('racer_boat_number') for boat in boats]
+        if index % 2:
+            predictions.append({'predicted_win': str(order[0]), 'predicted_place': order[:3], 'confidence': '0.55'})
+        else:
+            predictions.append({'recommended_win': order[0], 'recommended_place': order[:3], 'confidence': 0.6})
+    return predictions
+
+
+# ---- ベンチマーク対象（setup は (1回分の処理, 1日分の入力一覧) を返す） ----
+
+def _setup_predictor(race_date, programs, workdir):
+    from core.feature_store import get_feature_store
+    from core.race_model import parse_programs
+    # 特徴量ストアは計測用の空DBで初期化（実DBの内容に左右されないようにする）
+    get_feature_store(os.path.join(workdir, 'features.db'))
+    from core.real_predictor import RealEnhancedPredictor
+    predictor = RealEnhancedPredictor()
+    return predictor.calculate_prediction_from_program, parse_programs(programs)
+
+
+def _setup_tracker(race_date, programs, workdir):
+    from accuracy_tracker import AccuracyTracker
+    db_path = os.path.join(workdir, 'tracker.db')
+    seed_tracker_db(db_path, race_date, programs)
+    tracker = AccuracyTracker()
+    tracker.db_path = db_path
+    inputs = [(program['race_stadium_number'], program['race_number']) for program in programs]
+    return lambda key: tracker._generate_real_prediction(key[0], key[1], race_date=race_date), inputs
+
+
+def _setup_api_prediction(race_date, programs, workdir):
+    from api_fetcher import calculate_prediction
+    return calculate_prediction, programs
+
+
+def _setup_normalize(race_date, programs, workdir):
+    from api_fetcher import normalize_prediction_data
+    return normalize_prediction_data, fixture_predictions(programs)
+
+
+def _setup_normalize_core(race_date, programs, workdir):
+    # api_fetcher を読み込めない環境でも typed_schema 側の正規化は計測する
+    from core.typed_schema import prediction_columns
+    return prediction_columns, fixture_predictions(programs)
+
+
+def _setup_format(race_date, programs, workdir):
+    from core.dummy_data_generator import format_race_data_for_api
+    from core.race_model import parse_programs
+    # 1日分のレース一覧をまとめて整形する呼び出し方（APIと同じ）
+    return format_race_data_for_api, [parse_programs(programs)]
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    'predictor_from_program': _setup_predictor,
+    'tracker_generate_real_prediction': _setup_tracker,
+    'api_calculate_prediction': _setup_api_prediction,
+    'normalize_prediction_data': _setup_normalize,
+    'prediction_columns': _setup_normalize_core,
+    'format_race_data_for_api': _setup_format
+}
+
+
+def time_day(func: Callable, inputs: List, repeat: int) -> Dict:
+    """1日分の入力を repeat 回処理し、1日分・1回分の時間を集計（初回はウォームアップとして除外）"""
+    for item in inputs:
+        func(item)
+    day_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in inputs:
+            func(item)
+        day_ms.append((time.perf_counter() - started) * 1000)
+    median_day = statistics.median(day_ms)
+    return {
+        'calls_per_day': len(inputs),
+        'per_day_ms': {
+            'median': round(median_day, 3),
+            'min': round(min(day_ms), 3),
+            'max': round(max(day_ms), 3)
+        },
+        'per_call_us': {
+            'median': round(median_day * 1000 / len(inputs), 3) if inputs else 0.0,
+            'min': round(min(day_ms) * 1000 / len(inputs), 3) if inputs else 0.0
+        }
+    }
+
+
+def measure_allocations(func: Callable, inputs: List) -> Dict:
+    """1日分を処理する間のメモリ確保（ピーク・処理後に残った量・確保ブロック数の増分）"""
+    tracemalloc.start()
+    try:
+        blocks_before = sys.getallocatedblocks()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        results = [func(item) for item in inputs]
+        current, peak = tracemalloc.get_traced_memory()
+        blocks_after = sys.getallocatedblocks()
+    finally:
+        tracemalloc.stop()
+    del results
+    return {
+        'peak_kb_per_day': round((peak - before) / 1024, 1),
+        'retained_kb_per_day': round((current - before) / 1024, 1),
+        'blocks_per_call': round((blocks_after - blocks_before) / len(inputs), 1) if inputs else 0.0
+    }
+
+
+def run_benchmarks(race_date: str, programs: List[Dict], repeat: int, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """各ベンチマークを実行（読み込めない対象は理由付きで skipped）"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            try:
+                func, inputs = setup(race_date, programs, workdir)
+            except Exception as e:
+                results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+                continue
+            result = time_day(func, inputs, repeat)
+            result['allocations'] = measure_allocations(func, inputs)
+            results[name] = result
+    return results
+
+
+def evaluate(results: Dict[str, Dict], baseline: Optional[Dict] = None, max_regression: float = 0.2,
+             max_alloc_regression: float = 0.5) -> List[str]:
+    """ベースラインとの比較（1回あたりの時間の中央値とピークメモリ、違反内容の一覧を返す）"""
+    failures = []
+    if not baseline:
+        return failures
+    for name, base in baseline.get('results', {}).items():
+        current = results.get(name)
+        if not current or 'skipped' in current or 'skipped' in base:
+            continue
+        base_us, current_us = base['per_call_us']['median'], current['per_call_us']['median']
+        if base_us and current_us > base_us * (1 + max_regression):
+            failures.append(f"{name}: {current_us:.1f}us/回 (ベースライン {base_us:.1f}us から "
+                            f"{(current_us / base_us - 1) * 100:.0f}% 悪化)")
+        base_kb = base.get('allocations', {}).get('peak_kb_per_day')
+        current_kb = current.get('allocations', {}).get('peak_kb_per_day')
+        if base_kb and current_kb is not None and current_kb > base_kb * (1 + max_alloc_regression):
+            failures.append(f"{name}: ピークメモリ {current_kb:.0f}KB/日 (ベースライン {base_kb:.0f}KB から "
+                            f"{(current_kb / base_kb - 1) * 100:.0f}% 増加)")
+    return failures
+
+
+def _resolve(path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ホットパスのマイクロベンチマーク')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='1日分の出走表（取得キャッシュ形式）')
+    parser.add_argument('--repeat', type=int, default=5, help='1日分の処理の繰り返し回数（中央値で評価）')
+    parser.add_argument('--only', action='append', choices=list(BENCHMARKS), help='実行するベンチマーク')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='比較対象のベースライン（JSON）')
+    parser.add_argument('--update-baseline', action='store_true', help='今回の結果をベースラインとして保存')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='1回あたりの時間の許容悪化率')
+    parser.add_argument('--max-alloc-regression', type=float, default=0.5, help='ピークメモリの許容増加率')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='レポート出力先')
+    args = parser.parse_args()
+
+    os.chdir(PROJECT_ROOT)
+    race_date, programs = load_programs(args.fixture)
+    if len(programs) != EXPECTED_PROGRAMS:
+        print(f"[WARN] 固定入力のレース数が {len(programs)} です（想定 {EXPECTED_PROGRAMS}）")
+
+    results = run_benchmarks(race_date, programs, args.repeat, args.only)
+
+    baseline = None
+    baseline_path = _resolve(args.baseline)
+    if os.path.exists(baseline_path) and not args.update_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    failures = evaluate(results, baseline, args.max_regression, args.max_alloc_regression)
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'fixture': {'date': race_date, 'programs': len(programs)},
+        'repeat': args.repeat,
+        'results': results,
+        'baseline': args.baseline if baseline else None,
+        'passed': not failures,
+        'failures': failures
+    }
+
+    targets = [_resolve(args.output)] + ([baseline_path] if args.update_baseline else [])
+    for path in targets:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"[FIXTURE] {race_date} {len(programs)}レース × {args.repeat}回")
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f"  {name}: スキップ ({result['skipped']})")
+            continue
+        print(f"  {name}: {result['per_call_us']['median']:.1f}us/回 {result['per_day_ms']['median']:.1f}ms/日 "
+              f"ピーク {result['allocations']['peak_kb_per_day']:.0f}KB")
+    if args.update_baseline:
+        print(f"\n[BASELINE] {baseline_path} を更新しました")
+    if failures:
+        print("\n[FAIL]")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n[PASS]")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
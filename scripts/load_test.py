@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+負荷試験
+テンプレートが発生させるアクセスを仮想ユーザーで再現し、指定した同時接続数・時間だけ実行する。
+1セッションは トップページ → /api/races/basic → /api/races（予想の読み込み）→ 数件のレース詳細
+（ときどき的中率レポート）で、ルート別のスループット・レイテンシ分位点・エラー率をJSONレポートに出力する。
+ベースラインと比較してスループット低下・p95悪化・エラー率がしきい値を超えた場合は終了コード1を返す
+
+使用例:
+    python scripts/load_test.py --base-url http://127.0.0.1:5000 --users 20 --duration 60
+    python scripts/load_test.py --users 50 --duration 120 --baseline logs/load_test.json --max-regression 0.2
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASE_URL = 'http://127.0.0.1:5000'
+DEFAULT_OUTPUT = os.path.join('logs', 'load_test.json')
+
+# 1セッションで開くレース詳細の件数（一覧から数件を見る）
+DETAIL_VIEWS = (1, 4)
+# 的中率レポートを開くセッションの割合
+ACCURACY_VIEW_RATIO = 0.1
+# レイテンシの集計対象の分位点
+PERCENTILES = (50, 90, 95, 99)
+# 一覧からレースIDを取れなかった場合の詳細ページ
+FALLBACK_RACE_IDS = tuple(f'{venue:02d}_{race:02d}' for venue in (1, 2, 12, 24) for race in (1, 6, 12))
+
+
+class HttpClient:
+    """仮想ユーザーごとの持続接続（ブラウザと同じく keep-alive で再利用）"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+
+    def _connect(self):
+        conn_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self._conn = conn_class(self.host, self.port, timeout=self.timeout)
+
+    def get(self, path: str) -> Tuple[int, bytes]:
+        """GETしてステータスと本文を返す（接続が切れていれば1回だけ張り直す）"""
+        for attempt in range(2):
+            if self._conn is None:
+                self._connect()
+            try:
+                self._conn.request('GET', self.prefix + path, headers={'Accept-Encoding': 'identity'})
+                response = self._conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+        raise ConnectionError('unreachable')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Recorder:
+    """ルート別のレイテンシ・ステータスの記録（スレッド間で共有）"""
+
+    def __init__(self):
+        self.records: Dict[str, List[Tuple[float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, route: str, latency_ms: float, ok: bool):
+        with self._lock:
+            self.records.setdefault(route, []).append((latency_ms, ok))
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """線形補間の分位点"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(records: Dict[str, List[Tuple[float, bool]]], duration_s: float) -> Dict[str, Dict]:
+    """ルート別（と全体）のスループット・レイテンシ分位点・エラー率"""
+    summary = {}
+    everything = [record for route_records in records.values() for record in route_records]
+    for route, route_records in sorted(records.items()) + [('_total', everything)]:
+        if not route_records:
+            continue
+        latencies = [latency for latency, _ in route_records]
+        errors = sum(1 for _, ok in route_records if not ok)
+        stats = {
+            'requests': len(route_records),
+            'errors': errors,
+            'error_rate': round(errors / len(route_records), 4),
+            'throughput_rps': round(len(route_records) / duration_s, 2) if duration_s else 0.0,
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'max_ms': round(max(latencies), 2)
+        }
+        for p in PERCENTILES:
+            stats[f'p{p}_ms'] = round(percentile(latencies, p), 2)
+        summary[route] = stats
+    return summary
+
+
+def evaluate(summary: Dict[str, Dict], baseline: Optional[Dict] = None, max_regression: float = 0.2,
+             max_error_rate: float = 0.01) -> List[str]:
+    """エラー率・ベースラインとの比較（違反内容の一覧を返す）"""
+    total = summary.get('_total')
+    if not total:
+        return ['リクエストが1件も完了しませんでした']
+
+    failures = []
+    for route, stats in summary.items():
+        if stats['error_rate'] > max_error_rate:
+            failures.append(f"{route}: エラー率 {stats['error_rate'] * 100:.1f}% が上限 {max_error_rate * 100:.1f}% を超過")
+
+    if baseline:
+        for route, stats in summary.items():
+            base = baseline.get('summary', {}).get(route)
+            if not base:
+                continue
+            if base.get('p95_ms') and stats['p95_ms'] > base['p95_ms'] * (1 + max_regression):
+                failures.append(f"{route}: p95 {stats['p95_ms']:.0f}ms (ベースライン {base['p95_ms']:.0f}ms から "
+                                f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100:.0f}% 悪化)")
+        base_rps = baseline.get('summary', {}).get('_total', {}).get('throughput_rps')
+        if base_rps and total['throughput_rps'] < base_rps * (1 - max_regression):
+            failures.append(f"スループット {total['throughput_rps']:.1f}rps (ベースライン {base_rps:.1f}rps から "
+                            f"{(1 - total['throughput_rps'] / base_rps) * 100:.0f}% 低下)")
+    return failures
+
+
+def _race_ids(body: bytes) -> List[str]:
+    """レース一覧APIのレスポンスからレースIDを取り出す"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return []
+    return [race['race_id'] for race in data.get('races') or [] if isinstance(race, dict) and race.get('race_id')]
+
+
+def run_session(fetch: Callable[[str, str], Tuple[int, bytes]], rng: random.Random,
+                think: Callable[[], None], report_date: str):
+    """1セッション分のアクセス（トップページの表示からレース詳細の閲覧まで）"""
+    fetch('index', '/')
+    _, basic_body = fetch('api_races_basic', '/api/races/basic')
+    _, races_body = fetch('api_races', '/api/races')
+    race_ids = _race_ids(races_body) or _race_ids(basic_body) or list(FALLBACK_RACE_IDS)
+
+    for _ in range(rng.randint(*DETAIL_VIEWS)):
+        think()
+        fetch('predict', f'/predict/{rng.choice(race_ids)}')
+    if rng.random() < ACCURACY_VIEW_RATIO:
+        think()
+        fetch('accuracy', f'/accuracy/{report_date}')
+
+
+def run_user(base_url: str, recorder: Recorder, deadline: float, think_ms: float, seed: int, report_date: str):
+    """仮想ユーザー1人分（期限までセッションを繰り返す）"""
+    rng = random.Random(seed)
+    client = HttpClient(base_url)
+
+    def fetch(route: str, path: str) -> Tuple[int, bytes]:
+        if time.monotonic() >= deadline:
+            raise TimeoutError
+        started = time.perf_counter()
+        try:
+            status, body = client.get(path)
+        except Exception:
+            status, body = 0, b''
+        recorder.add(route, (time.perf_counter() - started) * 1000, 200 <= status < 400)
+        return status, body
+
+    def think():
+        # 閲覧間隔は指数分布（平均 think_ms）
+        if think_ms > 0:
+            time.sleep(min(rng.expovariate(1000 / think_ms), max(0.0, deadline - time.monotonic())))
+
+    try:
+        while time.monotonic() < deadline:
+            run_session(fetch, rng, think, report_date)
+    except TimeoutError:
+        pass
+    finally:
+        client.close()
+
+
+def run_load(base_url: str, users: int, duration_s: float, think_ms: float, ramp_up_s: float,
+             seed: int, report_date: str) -> Tuple[Dict[str, Dict], float]:
+    """同時接続数 users で duration_s 秒実行してルート別の集計を返す"""
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + ramp_up_s + duration_s
+    threads = []
+    for index in range(users):
+        thread = threading.Thread(target=run_user, name=f'load-user-{index}', daemon=True,
+                                  args=(base_url, recorder, deadline, think_ms, seed + index, report_date))
+        threads.append(thread)
+        thread.start()
+        if ramp_up_s and users > 1:
+            time.sleep(ramp_up_s / (users - 1))
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return summarize(recorder.records, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='負荷試験')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='対象サーバー')
+    parser.add_argument('--users', type=int, default=10, help='同時接続数（仮想ユーザー数）')
+    parser.add_argument('--duration', type=float, default=30.0, help='実行時間（秒）')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='全ユーザーが揃うまでの時間（秒）')
+    parser.add_argument('--think-ms', type=float, default=1000.0, help='閲覧間隔の平均（ms、0で待機なし）')
+    parser.add_argument('--date', default=datetime.now().strftime('%Y-%m-%d'), help='的中率レポートの日付')
+    parser.add_argument('--seed', type=int, default=1, help='アクセス順序の乱数シード')
+    parser.add_argument('--baseline', help='比較対象の過去レポート（JSON）')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='ベースラインからの許容悪化率')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='許容エラー率')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='レポート出力先')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(f"[RUN] {args.base_url} に {args.users}ユーザーで {args.duration:.0f}秒")
+    summary, elapsed = run_load(args.base_url, args.users, args.duration, args.think_ms, args.ramp_up,
+                                args.seed, args.date)
+    failures = evaluate(summary, baseline, args.max_regression, args.max_error_rate)
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'base_url': args.base_url,
+        'users': args.users,
+        'duration_s': round(elapsed, 2),
+        'think_ms': args.think_ms,
+        'summary': summary,
+        'passed': not failures,
+        'failures': failures
+    }
+
+    output_path = os.path.join(PROJECT_ROOT, args.output) if not os.path.isabs(args.output) else args.output
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n[REPORT] ルート別:")
+    for route, stats in summary.items():
+        print(f"  {route}: {stats['requests']}件 {stats['throughput_rps']:.1f}rps "
+              f"p50={stats['p50_ms']:.0f}ms p95={stats['p95_ms']:.0f}ms エラー率={stats['error_rate'] * 100:.1f}%")
+    print(f"\n[OUTPUT] {output_path}")
+    if failures:
+        print("\n[FAIL]")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n[PASS]")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
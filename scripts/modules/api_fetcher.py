@@ -11,34 +11,41 @@ import json
 import logging
 import time
 import os
-import asyncio
-import aiohttp
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 import threading
 
+try:
+    from core.metrics import get_metrics
+    from core.request_tracing import span
+    from core.race_model import VENUE_NAMES, as_race
+    from core.openapi_endpoint import programs_base_url, results_base_url
+except ImportError:  # scripts.modules.api_fetcher としてインポートされた場合
+    from .core.metrics import get_metrics
+    from .core.request_tracing import span
+    from .core.race_model import VENUE_NAMES, as_race
+    from .core.openapi_endpoint import programs_base_url, results_base_url
+
 logger = logging.getLogger(__name__)
 
-# 競艇場マッピング
-VENUE_MAPPING = {
-    1: "桐生", 2: "戸田", 3: "江戸川", 4: "平和島", 5: "多摩川", 6: "浜名湖",
-    7: "蒲郡", 8: "常滑", 9: "津", 10: "三国", 11: "びわこ", 12: "住之江",
-    13: "尼崎", 14: "鳴門", 15: "丸亀", 16: "児島", 17: "宮島", 18: "徳山",
-    19: "下関", 20: "若松", 21: "芦屋", 22: "福岡", 23: "唐津", 24: "大村"
-}
+# 競艇場マッピング（会場名の定義は race_model に一本化）
+VENUE_MAPPING = {venue_id: name for venue_id, name in enumerate(VENUE_NAMES) if venue_id}
 
 class SimpleOpenAPIFetcher:
     """競艇公式データAPI専用データ取得クラス"""
     
     def __init__(self):
-        self.programs_base_url = "https://boatraceopenapi.github.io/programs/v2"
-        self.results_base_url = "https://boatraceopenapi.github.io/results/v2"
+        # 接続先は設定で切り替え可能（ローカルの再生サーバーなど）
+        self.programs_base_url = programs_base_url()
+        self.results_base_url = results_base_url()
         self.cache_file = "cache/boatrace_openapi_cache.json"
         self.results_cache_file = "cache/boatrace_results_cache.json"
         self.cache_expiry = 300
         self.max_retries = 3
         self.retry_delay = 1.0
+        # 非同期APIのセッション取得（None なら共通イベントループのセッション、ASGIサーバーは自前のループのものを設定）
+        self.session_provider = None
         os.makedirs("cache", exist_ok=True)
     
     def get_programs_for_date(self, date: str) -> Optional[List[Dict]]:
@@ -53,7 +60,7 @@ class SimpleOpenAPIFetcher:
                 date_obj = datetime.strptime(date, '%Y-%m-%d')
                 url = f"{self.programs_base_url}/{date_obj.strftime('%Y%m%d')}.json"
             
-            response = requests.get(url, timeout=10)
+            response = self._http_get(url, 'programs')
             if response.status_code == 200:
                 data = response.json()
                 programs = data.get('programs', [])
@@ -69,13 +76,14 @@ class SimpleOpenAPIFetcher:
     def get_today_races(self) -> Optional[Dict]:
         """今日のレース一覧を取得"""
         cached_data = self._load_cache()
+        get_metrics().cache_hit('programs_file', bool(cached_data))
         if cached_data:
             logger.info("キャッシュから今日のレースを取得")
             return cached_data
         
         try:
             url = f"{self.programs_base_url}/today.json"
-            response = self._make_request(url)
+            response = self._make_request(url, 'programs')
             if response and response.status_code == 200:
                 data = response.json()
                 self._save_cache(data)
@@ -115,7 +123,7 @@ class SimpleOpenAPIFetcher:
                 date_obj = datetime.strptime(date, '%Y-%m-%d')
                 url = f"{self.results_base_url}/{date_obj.strftime('%Y%m%d')}.json"
             
-            response = requests.get(url, timeout=10)
+            response = self._http_get(url, 'results')
             if response.status_code == 200:
                 data = response.json()
                 results = data.get('results', [])
@@ -131,13 +139,14 @@ class SimpleOpenAPIFetcher:
     def get_today_results(self) -> Optional[Dict]:
         """今日の結果一覧を取得"""
         cached_data = self._load_results_cache()
+        get_metrics().cache_hit('results_file', bool(cached_data))
         if cached_data:
             logger.info("キャッシュから今日の結果を取得")
             return cached_data
         
         try:
             url = f"{self.results_base_url}/today.json"
-            response = self._make_request(url)
+            response = self._make_request(url, 'results')
             if response and response.status_code == 200:
                 data = response.json()
                 self._save_results_cache(data)
@@ -222,23 +231,178 @@ class SimpleOpenAPIFetcher:
         except Exception as e:
             logger.error(f"キャッシュ保存エラー: {e}")
     
-    def _make_request(self, url: str) -> Optional[requests.Response]:
+    def _http_get(self, url: str, source: str) -> requests.Response:
+        """HTTP GET（トレース・取得時間・バイト数を記録）"""
+        metrics = get_metrics()
+        start = time.perf_counter()
+        try:
+            with span('upstream', 'upstream', url):
+                response = requests.get(url, timeout=10)
+        except requests.exceptions.RequestException:
+            metrics.inc('upstream_fetch_errors_total', source=source)
+            raise
+        finally:
+            metrics.observe('upstream_fetch_seconds', time.perf_counter() - start, source=source)
+        metrics.inc('upstream_fetch_bytes_total', len(response.content), source=source)
+        if response.status_code != 200:
+            metrics.inc('upstream_fetch_errors_total', source=source)
+        return response
+    
+    def _make_request(self, url: str, source: str = 'other') -> Optional[requests.Response]:
         """HTTPリクエスト実行（リトライ付き）"""
         for attempt in range(self.max_retries):
             try:
-                response = requests.get(url, timeout=10)
+                response = self._http_get(url, source)
                 if response.status_code == 200:
                     return response
             except requests.exceptions.RequestException as e:
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay * (attempt + 1))
-        
+
         return None
 
-def calculate_prediction(race_data: Dict) -> Dict:
-    """レースデータから予想を計算（改善版統合システム使用）"""
+    # ---- 非同期API（共通イベントループ上で実行、キャッシュは同期版と共有） ----
+
+    def _dated_url(self, base_url: str, date: str) -> str:
+        """日付別JSONのURL（今日は today.json）"""
+        if date == datetime.now().strftime('%Y-%m-%d'):
+            return f"{base_url}/today.json"
+        return f"{base_url}/{datetime.strptime(date, '%Y-%m-%d').strftime('%Y%m%d')}.json"
+
+    async def _in_executor(self, func, *args):
+        """キャッシュファイルの読み書きをループ外で実行"""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _http_get_async(self, url: str, source: str):
+        """非同期HTTP GET（共通セッション使用、(ステータス, JSON) を返す）"""
+        session_provider = self.session_provider
+        if session_provider is None:
+            try:
+                from core.async_loop import get_async_loop
+            except ImportError:
+                from .core.async_loop import get_async_loop
+            session_provider = get_async_loop().get_session
+        metrics = get_metrics()
+        start = time.perf_counter()
+        try:
+            session = await session_provider()
+            async with session.get(url) as response:
+                body = await response.read()
+                status = response.status
+        except Exception:
+            metrics.inc('upstream_fetch_errors_total', source=source)
+            raise
+        finally:
+            metrics.observe('upstream_fetch_seconds', time.perf_counter() - start, source=source)
+        metrics.inc('upstream_fetch_bytes_total', len(body), source=source)
+        if status != 200:
+            metrics.inc('upstream_fetch_errors_total', source=source)
+            return status, None
+        return status, json.loads(body)
+
+    async def _make_request_async(self, url: str, source: str = 'other') -> Optional[Dict]:
+        """非同期HTTPリクエスト実行（リトライ付き、成功時はJSONを返す）"""
+        import asyncio
+        for attempt in range(self.max_retries):
+            try:
+                status, data = await self._http_get_async(url, source)
+                if status == 200:
+                    return data
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+        return None
+
+    async def get_programs_for_date_async(self, date: str) -> Optional[List[Dict]]:
+        """指定日のプログラムデータを取得（非同期版）"""
+        try:
+            status, data = await self._http_get_async(self._dated_url(self.programs_base_url, date), 'programs')
+            if status == 200:
+                programs = data.get('programs', [])
+                logger.info(f"{date}のプログラムデータ取得完了: {len(programs)}レース")
+                return programs
+            logger.warning(f"{date}のプログラムデータ取得失敗: HTTP {status}")
+            return []
+        except Exception as e:
+            logger.error(f"{date}のプログラムデータ取得エラー: {e}")
+            return []
+
+    async def get_results_for_date_async(self, date: str) -> Optional[List[Dict]]:
+        """指定日の結果データを取得（非同期版）"""
+        try:
+            status, data = await self._http_get_async(self._dated_url(self.results_base_url, date), 'results')
+            if status == 200:
+                results = data.get('results', [])
+                logger.info(f"{date}の結果データ取得完了: {len(results)}レース")
+                return results
+            logger.warning(f"{date}の結果データ取得失敗: HTTP {status}")
+            return []
+        except Exception as e:
+            logger.error(f"{date}の結果データ取得エラー: {e}")
+            return []
+
+    async def get_today_races_async(self) -> Optional[Dict]:
+        """今日のレース一覧を取得（非同期版、キャッシュファイルは同期版と共通）"""
+        cached_data = await self._in_executor(self._load_cache)
+        get_metrics().cache_hit('programs_file', bool(cached_data))
+        if cached_data:
+            logger.info("キャッシュから今日のレースを取得")
+            return cached_data
+
+        try:
+            data = await self._make_request_async(f"{self.programs_base_url}/today.json", 'programs')
+            if data is not None:
+                await self._in_executor(self._save_cache, data)
+                logger.info(f"今日のレース取得成功: {len(data.get('programs', []))}件")
+                return data
+        except Exception as e:
+            logger.error(f"今日のレース取得エラー: {e}")
+
+        return None
+
+    async def get_today_results_async(self) -> Optional[Dict]:
+        """今日の結果一覧を取得（非同期版、キャッシュファイルは同期版と共通）"""
+        cached_data = await self._in_executor(self._load_results_cache)
+        get_metrics().cache_hit('results_file', bool(cached_data))
+        if cached_data:
+            logger.info("キャッシュから今日の結果を取得")
+            return cached_data
+
+        try:
+            data = await self._make_request_async(f"{self.results_base_url}/today.json", 'results')
+            if data is not None:
+                await self._in_executor(self._save_results_cache, data)
+                logger.info(f"今日の結果取得成功: {len(data.get('results', []))}件")
+                return data
+        except Exception as e:
+            logger.error(f"今日の結果取得エラー: {e}")
+
+        return None
+
+    async def get_day_bundle_async(self, date: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """指定日（省略時は今日）の出走表と結果を並行取得"""
+        import asyncio
+        today = datetime.now().strftime('%Y-%m-%d')
+        date = date or today
+        if date == today:
+            programs_data, results_data = await asyncio.gather(
+                self.get_today_races_async(), self.get_today_results_async())
+            programs = (programs_data or {}).get('programs', [])
+            results = (results_data or {}).get('results', [])
+        else:
+            programs, results = await asyncio.gather(
+                self.get_programs_for_date_async(date), self.get_results_for_date_async(date))
+        return {'date': date, 'programs': programs or [], 'results': results or []}
+
+def calculate_prediction(race_data) -> Dict:
+    """レースデータ（プログラム辞書または解析済み Race）から予想を計算（改善版統合システム使用）"""
     try:
-        if not race_data or 'racers' not in race_data:
+        race = as_race(race_data) if race_data else None
+        if race is None or not race.entrants:
             raise ValueError("レースデータが不正です")
         
         # 改善された統合予想システムを使用
@@ -253,9 +417,9 @@ def calculate_prediction(race_data: Dict) -> Dict:
             prediction_system = IntegratedPredictionSystem()
             
             # レースデータから基本情報を抽出
-            race_date = race_data.get('race_date', datetime.now().strftime('%Y-%m-%d'))
-            venue_id = race_data.get('venue_id')
-            race_number = race_data.get('race_number')
+            race_date = race.race_date or datetime.now().strftime('%Y-%m-%d')
+            venue_id = race.venue_id
+            race_number = race.race_number
             
             if venue_id and race_number:
                 # 統合システムで予想実行
@@ -291,12 +455,11 @@ def calculate_prediction(race_data: Dict) -> Dict:
             logger.warning(f"統合予想システム使用失敗、フォールバック実行: {integration_error}")
         
         # フォールバック: 改善された簡易システム
-        racers = race_data['racers']
         predictions = {}
         racer_info = []
         
-        for racer in racers:
-            boat_number = racer.get('boat_number', 0)
+        for entrant in race.entrants:
+            boat_number = entrant.boat_number
             if boat_number == 0:
                 continue
                 
@@ -304,15 +467,15 @@ def calculate_prediction(race_data: Dict) -> Dict:
             score = 0.0
             
             # 全国勝率（重視）
-            overall_win_rate = racer.get('win_rate', {}).get('overall', 0)
+            overall_win_rate = entrant.national_win_rate or 0
             score += overall_win_rate * 0.25
             
             # 当地勝率
-            local_win_rate = racer.get('win_rate', {}).get('local', 0) 
+            local_win_rate = entrant.local_win_rate or 0
             score += local_win_rate * 0.20
             
-            # モーター勝率
-            motor_win_rate = racer.get('motor_win_rate', 0)
+            # モーター2連率（%）を勝率と同程度の尺度に換算
+            motor_win_rate = (entrant.motor_top2_rate or 0) / 10
             score += motor_win_rate * 0.18
             
             # 艇番優位性（軽減）
@@ -320,14 +483,14 @@ def calculate_prediction(race_data: Dict) -> Dict:
             score += position_bonus
             
             # 年齢による経験値
-            age = racer.get('racer_age', 30)
+            age = entrant.age or 30
             age_factor = min(1.0, (age - 20) / 15.0) * 0.05
             score += age_factor
             
             predictions[boat_number] = score
             racer_info.append({
                 'boat_number': boat_number,
-                'name': racer.get('racer_name', '不明'),
+                'name': entrant.name,
                 'prediction': round(score, 3),
                 'win_rate': overall_win_rate
             })
@@ -398,19 +561,14 @@ def normalize_prediction_data(prediction: Dict) -> Optional[Dict]:
     
     return normalized
 
-def run_async_in_thread(coro):
-    """非同期コルーチンを別スレッドで実行"""
-    def run_in_thread():
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
-    
-    executor = ThreadPoolExecutor(max_workers=1)
-    future = executor.submit(run_in_thread)
-    return future.result()
+def run_async_in_thread(coro, timeout: Optional[float] = None):
+    """非同期コルーチンをプロセス共通のイベントループスレッドで実行して結果を返す"""
+    # asyncio は非同期APIを使う経路でのみ読み込む
+    try:
+        from core.async_loop import get_async_loop
+    except ImportError:
+        from .core.async_loop import get_async_loop
+    return get_async_loop().run(coro, timeout)
 
 # キャッシュ関数
 race_list_cache = {'data': None, 'timestamp': 0}
@@ -420,9 +578,9 @@ def get_cached_race_list():
     current_time = time.time()
     cache_age_minutes = (current_time - race_list_cache['timestamp']) / 60
     
-    if race_list_cache['data'] is not None and cache_age_minutes < 5:
-        return race_list_cache['data']
-    return None
+    hit = race_list_cache['data'] is not None and cache_age_minutes < 5
+    get_metrics().cache_hit('race_list', hit)
+    return race_list_cache['data'] if hit else None
 
 def save_race_list_to_cache(race_list_data):
     """レース一覧をキャッシュに保存"""
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+JSON API（ASGI版）
+/api/* のうち上流取得を伴うルート（レース一覧・強化予想・結果更新）を非同期ハンドラーで提供する。
+上流HTTPはサーバーのイベントループ上の aiohttp セッション、SQLiteは上限付きスレッドプール経由で実行し、
+遅い上流呼び出しの待ち時間にワーカースレッドを占有しない。HTMLページは従来どおりFlask（main_app）で配信する。
+/api/historical の期間集計は結果を主に書き込むスケジューラーと同じFlaskプロセスに置き、ここでは扱わない
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from api_fetcher import VENUE_MAPPING, calculate_prediction
+from core.async_loop import create_session
+from core.metrics import get_metrics
+from core.race_list import build_race_list
+from core.result_update import save_results
+
+logger = logging.getLogger(__name__)
+
+# SQLiteアクセスの同時実行数（スレッドプールの上限）
+DB_WORKERS = 4
+# レース一覧の応答キャッシュ（Flask版と同じ5分）
+RACE_LIST_CACHE_SECONDS = 300
+
+
+class AsyncAPI:
+    """/api/* のASGIアプリケーション"""
+
+    def __init__(self, fetcher, accuracy_tracker_class, db_workers: int = DB_WORKERS):
+        self.fetcher = fetcher
+        self.AccuracyTracker = accuracy_tracker_class
+        self.db_workers = db_workers
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self._session = None
+        self._race_list_cache = {'data': None, 'timestamp': 0}
+        self._race_list_lock: Optional[asyncio.Lock] = None
+
+        # 上流取得はこのアプリのイベントループ上のセッションで行う
+        self.fetcher.session_provider = self.get_session
+
+        self.routes: List[Tuple[str, Tuple[str, ...], re.Pattern, Callable]] = []
+        self.add_route('/api/races', self.api_races)
+        self.add_route('/api/races/enhanced-prediction/<race_key>', self.api_enhanced_prediction)
+        self.add_route('/api/update-results', self.api_update_results, methods=('GET', 'POST'))
+        self.add_route('/api/update-results/<date>', self.api_update_results_for_date, methods=('GET', 'POST'))
+
+    def add_route(self, rule: str, handler: Callable, methods: Tuple[str, ...] = ('GET',)):
+        """Flask形式のルール（<name> は '/' を含まない1区間）でハンドラーを登録"""
+        pattern = re.compile('^' + re.sub(r'<(\w+)>', r'(?P<\1>[^/]+)', rule) + '$')
+        self.routes.append((rule, methods, pattern, handler))
+
+    # ---- 実行基盤 ----
+
+    async def get_session(self):
+        """このループ共通の aiohttp セッション（初回に作成）"""
+        if self._session is None or self._session.closed:
+            self._session = create_session()
+        return self._session
+
+    async def run_db(self, func: Callable, *args, **kwargs):
+        """SQLiteを使う処理を上限付きスレッドプールで実行（待ち時間をメトリクスに記録）"""
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=self.db_workers, thread_name_prefix='asgi-db')
+        queued = time.perf_counter()
+
+        def job():
+            get_metrics().observe('asgi_db_wait_seconds', time.perf_counter() - queued)
+            return func(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, job)
+
+    async def shutdown(self):
+        """セッションを閉じ、実行中のDB処理の完了を待ってスレッドプールを停止"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._db_executor is not None:
+            executor, self._db_executor = self._db_executor, None
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(executor.shutdown, wait=True))
+
+    # ---- ASGI ----
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        started = time.perf_counter()
+        status, payload, rule = await self._dispatch(scope)
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json; charset=utf-8'),
+                (b'content-length', str(len(body)).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+        metrics = get_metrics()
+        metrics.observe('http_request_seconds', time.perf_counter() - started, endpoint=rule)
+        metrics.inc('http_requests_total', endpoint=rule, status=f"{status // 100}xx")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info(f"ASGI API起動 (DBワーカー数={self.db_workers})")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                logger.info("ASGI API停止")
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope) -> Tuple[int, Dict, str]:
+        """パス・メソッドでハンドラーを選んで実行（例外は500のJSONにする）"""
+        path = scope['path']
+        method = scope['method']
+        query = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+        for rule, methods, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if method not in methods:
+                return 405, {'success': False, 'error': 'Method Not Allowed'}, rule
+            try:
+                status, payload = await handler(query, **match.groupdict())
+                return status, payload, rule
+            except Exception as e:
+                logger.error(f"ASGI APIエラー {path}: {e}")
+                return 500, {'success': False, 'error': str(e)}, rule
+        return 404, {'success': False, 'error': 'Not Found'}, 'unmatched'
+
+    # ---- ハンドラー ----
+
+    def _get_cached_race_list(self) -> Optional[Dict]:
+        age = time.time() - self._race_list_cache['timestamp']
+        hit = self._race_list_cache['data'] is not None and age < RACE_LIST_CACHE_SECONDS
+        get_metrics().cache_hit('api_race_list', hit)
+        return self._race_list_cache['data'] if hit else None
+
+    async def api_races(self, query):
+        """レース一覧API（同時に届いたキャッシュミスは1回の作成を共有）"""
+        cached = self._get_cached_race_list()
+        if cached:
+            return 200, cached
+
+        if self._race_list_lock is None:
+            self._race_list_lock = asyncio.Lock()
+        async with self._race_list_lock:
+            cached = self._race_list_cache['data'] if time.time() - self._race_list_cache['timestamp'] < RACE_LIST_CACHE_SECONDS else None
+            if cached:
+                return 200, cached
+
+            data = await self.fetcher.get_today_races_async()
+            if not data or 'programs' not in data:
+                return 200, {'success': False, 'error': 'レースデータを取得できませんでした'}
+
+            result = await self.run_db(build_race_list, data['programs'], self.AccuracyTracker)
+            self._race_list_cache = {'data': result, 'timestamp': time.time()}
+            return 200, result
+
+    async def _today_program(self, venue_id: int, race_number: int) -> Optional[Dict]:
+        """今日の出走表から該当レースを探す"""
+        data = await self.fetcher.get_today_races_async()
+        for program in (data or {}).get('programs', []):
+            if program.get('race_stadium_number') == venue_id and program.get('race_number') == race_number:
+                return program
+        return None
+
+    async def api_enhanced_prediction(self, query, race_key):
+        """強化予想API"""
+        parts = race_key.split('_')
+        if len(parts) < 2:
+            return 400, {'error': 'Invalid race key format'}
+        try:
+            venue_id = int(parts[0])
+            race_number = int(parts[1])
+            logger.info(f"強化予想API要求: {VENUE_MAPPING.get(venue_id)} {race_number}R")
+
+            tracker = await self.run_db(self.AccuracyTracker)
+            prediction = await self.run_db(tracker._generate_real_prediction, venue_id, race_number)
+
+            race_data = None
+            if not prediction:
+                # フォールバック: APIデータと組み合わせて再試行
+                race_data = await self._today_program(venue_id, race_number)
+                if race_data:
+                    prediction = await self.run_db(tracker._generate_real_prediction, venue_id, race_number, race_data)
+                else:
+                    logger.warning(f"API予想: レースデータ取得失敗 {VENUE_MAPPING.get(venue_id)} {race_number}R")
+
+            if not prediction and race_data:
+                # フォールバック: 出走表から直接計算
+                prediction = calculate_prediction(race_data)
+
+            if prediction:
+                return 200, {'success': True, 'prediction': prediction}
+            logger.warning("全ての予想手法が失敗しました")
+            return 200, {'success': False, 'message': 'データ取得に成功しましたが、予想計算ができませんでした'}
+
+        except Exception as e:
+            logger.error(f"予想API総合エラー: {e}")
+            return 500, {'error': '予想システムエラーが発生しました', 'reason': f'エラー詳細: {str(e)}'}
+
+    async def _update_today_results(self) -> int:
+        """今日の結果（キャッシュを通さず最新）と出走表を並行取得して保存"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        results, programs_data = await asyncio.gather(
+            self.fetcher.get_results_for_date_async(today), self.fetcher.get_today_races_async())
+        tracker = await self.run_db(self.AccuracyTracker)
+        programs = (programs_data or {}).get('programs', [])
+        return await self.run_db(save_results, tracker.db_path, results or [], programs, today)
+
+    async def api_update_results(self, query):
+        """結果データ更新API"""
+        try:
+            updated_count = await self._update_today_results()
+            # 更新した結果がレース一覧に反映されるようキャッシュを破棄
+            self._race_list_cache = {'data': None, 'timestamp': 0}
+            return 200, {'success': True, 'message': f'結果更新完了: {updated_count}件更新されました'}
+        except Exception as e:
+            logger.error(f"結果更新エラー: {e}")
+            return 200, {'success': False, 'error': str(e)}
+
+    async def api_update_results_for_date(self, query, date):
+        """指定日の結果データ更新API（BoatraceOpenAPIの結果は今日のみ取得対象）"""
+        try:
+            datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return 200, {'success': False, 'error': '無効な日付形式です (YYYY-MM-DD)'}
+
+        if date != datetime.now().strftime('%Y-%m-%d'):
+            logger.warning(f"{date}は今日ではないため、結果データの自動取得はスキップします")
+            return 200, {'success': True, 'message': f'{date}の結果更新完了: 0件更新されました'}
+        status, payload = await self.api_update_results(query)
+        if payload.get('success'):
+            payload['message'] = f"{date}の{payload['message']}"
+        return status, payload
+
+
+def create_asgi_application(db_workers: int = DB_WORKERS) -> AsyncAPI:
+    """フェッチャー・AccuracyTracker を読み込んでASGIアプリを作成"""
+    from core.component_initializer import _initialize_api_fetcher, _load_accuracy_tracker_class
+    fetcher = _initialize_api_fetcher()
+    if fetcher is None:
+        raise ImportError("APIフェッチャーが利用できません")
+    return AsyncAPI(fetcher, _load_accuracy_tracker_class(), db_workers)
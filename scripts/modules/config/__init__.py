@@ -11,7 +11,9 @@ from .logging_config import (
     get_logger, 
     log_system_info,
     log_error_with_context,
-    create_module_logger
+    create_module_logger,
+    SamplingFilter,
+    stop_logging
 )
 
 __version__ = "1.0.0"
@@ -29,7 +31,9 @@ __all__ = [
     'get_logger',
     'log_system_info',
     'log_error_with_context',
-    'create_module_logger'
+    'create_module_logger',
+    'SamplingFilter',
+    'stop_logging'
 ]
 
 def get_version():
@@ -24,9 +24,11 @@ class AppConfig:
             'JSONIFY_PRETTYPRINT_REGULAR': True
         },
         'database': {
-            'path': 'cache/comprehensive_kyotei.db'
+            'path': 'cache/comprehensive_kyotei.db',
+            'slow_query_ms': 100
         },
         'api': {
+            'base_url': 'https://boatraceopenapi.github.io',
             'programs_base_url': 'https://boatraceopenapi.github.io/programs/v2',
             'results_base_url': 'https://boatraceopenapi.github.io/results/v2',
             'cache_expiry': 300,
@@ -41,6 +43,30 @@ class AppConfig:
         'logs': {
             'directory': 'logs',
             'level': 'INFO'
+        },
+        'scheduler': {
+            'result_mode': 'event',  # 'event': 締切時刻ベース, 'hourly': 17時以降毎時
+            'result_delay_minutes': 10,
+            'result_backoff_minutes': 5,
+            'result_backoff_max_minutes': 60,
+            'result_max_attempts': 6,
+            'max_workers': 4,
+            'job_timeouts': {  # ジョブごとのタイムアウト秒数
+                'morning_data_collection': 1800,
+                'process_result_watch': 300,
+                'update_results_if_available': 300,
+                'update_accuracy_report': 600
+            }
+        },
+        'asgi': {
+            'host': '0.0.0.0',
+            'port': 5002,
+            'db_workers': 4  # SQLiteアクセスのスレッドプール上限
+        },
+        'tracing': {
+            'enabled': True,
+            'server_timing': True,  # Server-Timingヘッダーを付与
+            'slow_trace_capacity': 50  # 保持する遅いトレースの件数
         }
     }
     
@@ -81,6 +107,11 @@ class AppConfig:
         # 環境変数からの設定上書き
         if os.getenv('DATABASE_PATH'):
             config['path'] = os.getenv('DATABASE_PATH')
+        if os.getenv('SLOW_QUERY_MS'):
+            try:
+                config['slow_query_ms'] = float(os.getenv('SLOW_QUERY_MS'))
+            except ValueError:
+                pass
             
         return config
     
@@ -90,6 +121,10 @@ class AppConfig:
         config = cls.DEFAULT_CONFIG['api'].copy()
         
         # 環境変数からの設定上書き
+        if os.getenv('BOATRACE_API_BASE_URL'):
+            config['base_url'] = os.getenv('BOATRACE_API_BASE_URL').rstrip('/')
+            config['programs_base_url'] = f"{config['base_url']}/programs/v2"
+            config['results_base_url'] = f"{config['base_url']}/results/v2"
         if os.getenv('API_CACHE_EXPIRY'):
             try:
                 config['cache_expiry'] = int(os.getenv('API_CACHE_EXPIRY'))
@@ -109,6 +144,65 @@ class AppConfig:
             
         return config
     
+    @classmethod
+    def get_scheduler_config(cls) -> Dict[str, Any]:
+        """スケジューラー設定を取得"""
+        config = cls.DEFAULT_CONFIG['scheduler'].copy()
+        config['job_timeouts'] = dict(config['job_timeouts'])
+        
+        # 環境変数からの設定上書き
+        if os.getenv('RESULT_INGESTION_MODE') in ('event', 'hourly'):
+            config['result_mode'] = os.getenv('RESULT_INGESTION_MODE')
+        if os.getenv('RESULT_DELAY_MINUTES'):
+            try:
+                config['result_delay_minutes'] = int(os.getenv('RESULT_DELAY_MINUTES'))
+            except ValueError:
+                pass
+        if os.getenv('SCHEDULER_MAX_WORKERS'):
+            try:
+                config['max_workers'] = max(1, int(os.getenv('SCHEDULER_MAX_WORKERS')))
+            except ValueError:
+                pass
+                
+        return config
+    
+    @classmethod
+    def get_asgi_config(cls) -> Dict[str, Any]:
+        """ASGI版JSON API設定を取得"""
+        config = cls.DEFAULT_CONFIG['asgi'].copy()
+        
+        # 環境変数からの設定上書き
+        if os.getenv('ASGI_HOST'):
+            config['host'] = os.getenv('ASGI_HOST')
+        if os.getenv('ASGI_PORT'):
+            try:
+                config['port'] = int(os.getenv('ASGI_PORT'))
+            except ValueError:
+                pass
+        if os.getenv('ASGI_DB_WORKERS'):
+            try:
+                config['db_workers'] = max(1, int(os.getenv('ASGI_DB_WORKERS')))
+            except ValueError:
+                pass
+                
+        return config
+    
+    @classmethod
+    def get_tracing_config(cls) -> Dict[str, Any]:
+        """リクエストトレーシング設定を取得"""
+        config = cls.DEFAULT_CONFIG['tracing'].copy()
+        
+        # 環境変数からの設定上書き
+        if os.getenv('REQUEST_TRACING'):
+            config['enabled'] = os.getenv('REQUEST_TRACING', '1') == '1'
+        if os.getenv('SLOW_TRACE_CAPACITY'):
+            try:
+                config['slow_trace_capacity'] = int(os.getenv('SLOW_TRACE_CAPACITY'))
+            except ValueError:
+                pass
+                
+        return config
+    
     @classmethod
     def create_flask_app(cls) -> Flask:
         """Flaskアプリケーションを作成"""
@@ -148,7 +242,10 @@ class AppConfig:
             'database': cls.get_database_config(),
             'api': cls.get_api_config(),
             'cache': cls.get_cache_config(),
-            'logs': cls.DEFAULT_CONFIG['logs']
+            'logs': cls.DEFAULT_CONFIG['logs'],
+            'scheduler': cls.get_scheduler_config(),
+            'asgi': cls.get_asgi_config(),
+            'tracing': cls.get_tracing_config()
         }
 
 # 設定の初期化
@@ -5,10 +5,14 @@
 """
 
 import os
+import atexit
 import logging
 import logging.handlers
+import queue
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 class LoggingConfig:
     """ログ設定クラス"""
@@ -31,7 +35,10 @@ class LoggingConfig:
         'console_output': True,
         'file_output': True,
         'max_bytes': 10 * 1024 * 1024,  # 10MB
-        'backup_count': 5
+        'backup_count': 5,
+        'queue_output': True,  # ハンドラー出力をバックグラウンドスレッドで実行
+        'sample_burst': 5,  # sample_key 付きログを間隔あたり何件まで出力するか
+        'sample_interval': 60  # 秒
     }
     
     @classmethod
@@ -50,6 +57,28 @@ class LoggingConfig:
         """ログフォーマットを取得"""
         return os.getenv('LOG_FORMAT', cls.DEFAULT_SETTINGS['format'])
     
+    @classmethod
+    def use_queue(cls) -> bool:
+        """キュー経由のログ出力を使うか"""
+        if os.getenv('LOG_QUEUE'):
+            return os.getenv('LOG_QUEUE') == '1'
+        return cls.DEFAULT_SETTINGS['queue_output']
+    
+    @classmethod
+    def get_sampling_settings(cls) -> Dict[str, float]:
+        """ログ間引き設定を取得"""
+        settings = {
+            'burst': cls.DEFAULT_SETTINGS['sample_burst'],
+            'interval': cls.DEFAULT_SETTINGS['sample_interval']
+        }
+        for key, env_name in (('burst', 'LOG_SAMPLE_BURST'), ('interval', 'LOG_SAMPLE_INTERVAL')):
+            if os.getenv(env_name):
+                try:
+                    settings[key] = float(os.getenv(env_name))
+                except ValueError:
+                    pass
+        return settings
+    
     @classmethod
     def ensure_log_directory(cls):
         """ログディレクトリを作成"""
@@ -57,6 +86,65 @@ class LoggingConfig:
         os.makedirs(log_dir, exist_ok=True)
         return log_dir
 
+class SamplingFilter(logging.Filter):
+    """sample_key 付きのログをキーごとに間隔あたり burst 件までに間引く
+    （間引いた件数は次に出力されるログに付記する。sample_key のないログは常に通す）
+    判定はレコードごとに1回だけ行い、複数のハンドラーに付けても同じ結果を返す"""
+    
+    def __init__(self, burst: float = 5, interval: float = 60):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: Dict[str, list] = {}  # key -> [窓の開始時刻, 出力数, 間引き数]
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'sample_key', None)
+        if key is None or record.levelno >= logging.ERROR:
+            return True
+        decided = getattr(record, '_sampling_passed', None)
+        if decided is not None:
+            return decided
+        
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                record._sampling_passed = False
+                return False
+            window[1] += 1
+        record._sampling_passed = True
+        
+        if suppressed:
+            record.msg = f"{record.getMessage()} （前の{self.interval:.0f}秒間で同種ログ{suppressed}件を省略）"
+            record.args = None
+        return True
+    
+    def suppressed_counts(self) -> Dict[str, int]:
+        """現在の窓で間引いている件数"""
+        with self._lock:
+            return {key: window[2] for key, window in self._windows.items() if window[2]}
+
+
+# ロガー名ごとのキューリスナー
+_queue_listeners: Dict[str, logging.handlers.QueueListener] = {}
+
+
+def stop_logging():
+    """キューに残ったログを書き出してリスナーを停止"""
+    for name in list(_queue_listeners):
+        _queue_listeners.pop(name).stop()
+
+
+atexit.register(stop_logging)
+
+
 def setup_logging(logger_name: Optional[str] = None) -> logging.Logger:
     """ログ設定をセットアップ"""
     
@@ -69,7 +157,10 @@ def setup_logging(logger_name: Optional[str] = None) -> logging.Logger:
     else:
         logger = logging.getLogger()
     
-    # 既存ハンドラーをクリア
+    # 既存ハンドラー・リスナーをクリア
+    listener = _queue_listeners.pop(logger_name or '', None)
+    if listener:
+        listener.stop()
     logger.handlers.clear()
     
     # ログレベル設定
@@ -115,6 +206,27 @@ def setup_logging(logger_name: Optional[str] = None) -> logging.Logger:
         error_handler.setFormatter(formatter)
         logger.addHandler(error_handler)
     
+    # 高頻度ログの間引き
+    sampling = LoggingConfig.get_sampling_settings()
+    sampling_filter = SamplingFilter(sampling['burst'], sampling['interval'])
+    
+    # キュー経由でリクエストスレッドからファイルI/Oを切り離す
+    if LoggingConfig.use_queue() and logger.handlers:
+        handlers = list(logger.handlers)
+        logger.handlers.clear()
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(sampling_filter)
+        logger.addHandler(queue_handler)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queue_listeners[logger_name or ''] = listener
+    else:
+        # ロガー自身のフィルターは子ロガーから伝播したレコードに効かないため各ハンドラーに付ける
+        # （判定はレコード単位で1回なので、ハンドラー数だけ窓の件数が進むことはない）
+        for handler in logger.handlers:
+            handler.addFilter(sampling_filter)
+    
     return logger
 
 def get_logger(name: str) -> logging.Logger:
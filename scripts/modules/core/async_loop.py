@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+バックグラウンドのイベントループ
+プロセスごとに1本のイベントループ用スレッドと持続的な aiohttp セッションを保持し、
+同期処理（Flaskのリクエストハンドラーなど）からコルーチンを投入して Future で結果を受け取れるようにする。
+呼び出しごとのスレッド・ループ生成をなくし、終了時はセッションを閉じてからループを停止する
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+# aiohttp セッションの同時接続数とタイムアウト
+MAX_CONNECTIONS = 20
+MAX_CONNECTIONS_PER_HOST = 10
+REQUEST_TIMEOUT_SECONDS = 10
+# 停止時に実行中のタスクを待つ時間
+SHUTDOWN_TIMEOUT_SECONDS = 5
+
+
+def create_session():
+    """共通の接続数・タイムアウトで aiohttp セッションを作成（実行中のループ内で呼ぶ）"""
+    import aiohttp  # 非同期APIを使う経路でのみ読み込む
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST),
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+    )
+
+
+class AsyncLoopService:
+    """イベントループ用スレッド（1プロセス1本）"""
+
+    def __init__(self, name: str = 'async-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session = None
+        self._session_lock: Optional[asyncio.Lock] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _run(self, started: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._session_lock = asyncio.Lock()
+        started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """ループを起動（起動済みならそのまま、フォーク後の子プロセスでは作り直す）"""
+        if self.running:
+            return self._loop
+        with self._lock:
+            if self.running:
+                return self._loop
+            self._loop = asyncio.new_event_loop()
+            self._session = None
+            self._pid = os.getpid()
+            started = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(started,), name=self.name, daemon=True)
+            self._thread.start()
+            started.wait()
+            logger.info(f"イベントループスレッド起動: {self.name}")
+            return self._loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self.start()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """コルーチンをループに投入して Future を返す"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """コルーチンを投入して結果を待つ（タイムアウト時はタスクを取り消す）"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def get_session(self):
+        """ループ共通の aiohttp セッション（初回に作成、ループ内からのみ呼ぶ）"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                self._session = create_session()
+        return self._session
+
+    async def _close(self):
+        """セッションを閉じ、残っているタスクを取り消す"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SECONDS):
+        """セッションを閉じてループを停止（再度 submit すると起動し直す）"""
+        with self._lock:
+            if not self.running:
+                return
+            loop, thread = self._loop, self._thread
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"イベントループ終了処理エラー: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            self._loop = None
+            self._thread = None
+            logger.info(f"イベントループスレッド停止: {self.name}")
+
+
+_async_loop: Optional[AsyncLoopService] = None
+_async_loop_lock = threading.Lock()
+
+
+def get_async_loop() -> AsyncLoopService:
+    """プロセス共通のイベントループサービスを取得"""
+    global _async_loop
+    if _async_loop is None:
+        with _async_loop_lock:
+            if _async_loop is None:
+                _async_loop = AsyncLoopService()
+    return _async_loop
+
+
+def run_coroutine(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """同期処理からコルーチンを実行して結果を返す"""
+    return get_async_loop().run(coro, timeout)
+
+
+def shutdown_async_loop():
+    """プロセス終了時の停止処理"""
+    if _async_loop is not None:
+        _async_loop.shutdown()
+
+
+atexit.register(shutdown_async_loop)
@@ -8,36 +8,53 @@ import logging
 import sys
 import os
 
+from .component_registry import ComponentRegistry
+
 logger = logging.getLogger(__name__)
 
+def _ensure_path(path, prepend=False):
+    """sys.pathに未登録の場合のみ追加"""
+    if path not in sys.path:
+        if prepend:
+            sys.path.insert(0, path)
+        else:
+            sys.path.append(path)
+
 def initialize_components(app, logger):
     """システムコンポーネントを初期化"""
     try:
         # パスの追加
         current_dir = os.path.dirname(os.path.abspath(__file__))
         parent_dir = os.path.dirname(current_dir)
-        sys.path.append(parent_dir)
-        
-        # 各種コンポーネントの初期化
-        components = {}
-        
-        # APIフェッチャーの初期化
-        components['fetcher'] = _initialize_api_fetcher()
-        
-        # データベース関連の初期化
-        components['accuracy_tracker'], components['enhanced_predictor'] = _initialize_database_components()
+        _ensure_path(parent_dir)
+        
+        # フェッチャー・トラッカー・予想システムは初回アクセスまで初期化を遅延
+        registry = ComponentRegistry()
+        registry.register('fetcher', _initialize_api_fetcher)
+        registry.register('accuracy_tracker', _load_accuracy_tracker_class)
+        registry.register('enhanced_predictor', _load_enhanced_predictor_class)
+        
+        components = {
+            'registry': registry,
+            'fetcher': registry.proxy('fetcher'),
+            'accuracy_tracker': registry.proxy('accuracy_tracker'),
+            'enhanced_predictor': registry.proxy('enhanced_predictor')
+        }
         
-        # ルートハンドラーの初期化
-        components['route_handlers'] = _initialize_route_handlers(app, components)
+        # ルートはリクエスト受付前に登録が必要なため即時初期化
+        registry.register('route_handlers', lambda: _initialize_route_handlers(app, components))
+        components['route_handlers'] = registry.get('route_handlers')
         
-        # スケジューラーの初期化
-        components['scheduler'] = _initialize_scheduler(
+        # スケジューラーの初期化（APIルート登録を含む）
+        registry.register('scheduler', lambda: _initialize_scheduler(
+            app,
             components['fetcher'], 
             components['accuracy_tracker'], 
             components['enhanced_predictor']
-        )
+        ))
+        components['scheduler'] = registry.get('scheduler')
         
-        logger.info("[OK] 全コンポーネント初期化完了")
+        logger.info("[OK] 全コンポーネント初期化完了（フェッチャー・トラッカー・予想システムは遅延初期化）")
         return components
         
     except Exception as e:
@@ -56,66 +73,55 @@ def _initialize_api_fetcher():
         # フォールバック処理
         return None
 
-def _initialize_database_components():
-    """データベース関連コンポーネントの初期化"""
+def _load_accuracy_tracker_class():
+    """AccuracyTrackerクラスの読み込み"""
+    # 実際のAPIデータベースの AccuracyTracker を使用
     try:
-        # 実際のAPIデータベースの AccuracyTracker を使用
-        try:
-            # プロジェクトルートのsrcディレクトリを追加
-            component_dir = os.path.dirname(os.path.abspath(__file__))  # core/
-            modules_dir = os.path.dirname(component_dir)  # modules/
-            scripts_dir = os.path.dirname(modules_dir)  # scripts/
-            project_root = os.path.dirname(scripts_dir)  # kyotei/
-            src_path = os.path.join(project_root, 'src')
-            src_core_path = os.path.join(project_root, 'src', 'core')
+        # プロジェクトルートのsrcディレクトリを追加
+        component_dir = os.path.dirname(os.path.abspath(__file__))  # core/
+        modules_dir = os.path.dirname(component_dir)  # modules/
+        scripts_dir = os.path.dirname(modules_dir)  # scripts/
+        project_root = os.path.dirname(scripts_dir)  # kyotei/
+        
+        # パスの追加（優先順位を高く設定）
+        _ensure_path(os.path.join(project_root, 'src'), prepend=True)
+        _ensure_path(os.path.join(project_root, 'src', 'core'), prepend=True)
             
-            # パスの追加（優先順位を高く設定）
-            if src_path not in sys.path:
-                sys.path.insert(0, src_path)
-            if src_core_path not in sys.path:
-                sys.path.insert(0, src_core_path)
-                
-            from accuracy_tracker import AccuracyTracker
-            accuracy_tracker_class = AccuracyTracker
-            logger.info("実際のAccuracyTrackerを使用")
-        except ImportError as e:
-            logger.error(f"AccuracyTracker読み込み失敗: {e}")
-            # ダミーではなく、実際のAPIからデータ取得するクラスを作成
-            try:
-                from .real_api_tracker import RealAPITracker
-                accuracy_tracker_class = RealAPITracker
-                logger.info("実際のAPI取得システムを使用")
-            except ImportError as e2:
-                logger.error(f"RealAPITracker読み込み失敗: {e2}")
-                logger.error("実際のデータ取得システムが利用できません")
-                raise ImportError("ダミーデータの使用は禁止されています。実際のAPIデータ取得システムが必要です。")
-        
+        from accuracy_tracker import AccuracyTracker
+        logger.info("実際のAccuracyTrackerを使用")
+        return AccuracyTracker
+    except ImportError as e:
+        logger.error(f"AccuracyTracker読み込み失敗: {e}")
+        # ダミーではなく、実際のAPIからデータ取得するクラスを作成
+        try:
+            from .real_api_tracker import RealAPITracker
+            logger.info("実際のAPI取得システムを使用")
+            return RealAPITracker
+        except ImportError as e2:
+            logger.error(f"RealAPITracker読み込み失敗: {e2}")
+            logger.error("実際のデータ取得システムが利用できません")
+            raise ImportError("ダミーデータの使用は禁止されています。実際のAPIデータ取得システムが必要です。")
+
+def _load_enhanced_predictor_class():
+    """EnhancedPredictorクラスの読み込み"""
+    try:
+        from enhanced_predictor import EnhancedPredictor
+        logger.info("実際のEnhancedPredictorを使用")
+        return EnhancedPredictor
+    except ImportError:
+        # ダミーではなく、実際の予想アルゴリズムを使用
         try:
-            from enhanced_predictor import EnhancedPredictor
-            enhanced_predictor_class = EnhancedPredictor
-            logger.info("実際のEnhancedPredictorを使用")
+            from .real_predictor import RealEnhancedPredictor
+            logger.info("実際の予想アルゴリズムを使用")
+            return RealEnhancedPredictor
         except ImportError:
-            # ダミーではなく、実際の予想アルゴリズムを使用
-            try:
-                from .real_predictor import RealEnhancedPredictor
-                enhanced_predictor_class = RealEnhancedPredictor
-                logger.info("実際の予想アルゴリズムを使用")
-            except ImportError:
-                logger.error("実際の予想アルゴリズムが利用できません")
-                raise ImportError("ダミー予想システムの使用は禁止されています。実際の予想アルゴリズムが必要です。")
-        
-        return accuracy_tracker_class, enhanced_predictor_class
-        
-    except Exception as e:
-        logger.error(f"データベースコンポーネント初期化エラー: {e}")
-        raise
+            logger.error("実際の予想アルゴリズムが利用できません")
+            raise ImportError("ダミー予想システムの使用は禁止されています。実際の予想アルゴリズムが必要です。")
 
 def _initialize_route_handlers(app, components):
     """ルートハンドラーの初期化"""
     try:
-        import sys
-        import os
-        sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+        _ensure_path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         from routes.prediction_routes import PredictionRoutes
         from routes.basic_routes import BasicRoutes
         from routes.admin_routes import AdminRoutes
@@ -160,7 +166,7 @@ def _initialize_route_handlers(app, components):
                                  components['accuracy_tracker'])
         
         api_routes = APIRoutes(app, components['fetcher'], components['accuracy_tracker'])
-        core_routes = CoreRoutes(app, components['fetcher'])
+        core_routes = CoreRoutes(app, components['fetcher'], components['registry'])
         
         logger.info("[OK] ルートハンドラー初期化完了")
         
@@ -178,11 +184,12 @@ def _initialize_route_handlers(app, components):
         logger.error(f"ルートハンドラー初期化エラー: {e}")
         raise
 
-def _initialize_scheduler(fetcher, accuracy_tracker_class, enhanced_predictor_class):
+def _initialize_scheduler(app, fetcher, accuracy_tracker_class, enhanced_predictor_class):
     """スケジューラーの初期化"""
     try:
-        from scheduler_service import IntegratedScheduler
+        from scheduler_service import IntegratedScheduler, create_scheduler_routes
         scheduler = IntegratedScheduler(fetcher, accuracy_tracker_class, enhanced_predictor_class)
+        create_scheduler_routes(app, scheduler)
         logger.info("[OK] スケジューラー初期化完了")
         return scheduler
     except ImportError as e:
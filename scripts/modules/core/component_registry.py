@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+コンポーネントレジストリ
+重いインポートや初期化を初回アクセスまで遅延し、コンポーネントごとの初期化時間を記録する
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class LazyComponent:
+    """初回アクセス時に初期化されるコンポーネントの代理オブジェクト"""
+
+    def __init__(self, registry, name: str):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def _resolve(self):
+        target = self._registry.get(self._name)
+        if target is None:
+            raise RuntimeError(f"コンポーネントが利用できません: {self._name}")
+        return target
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._resolve(), attr, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = '初期化済み' if self._registry.is_initialized(self._name) else '未初期化'
+        return f"<LazyComponent {self._name} ({state})>"
+
+
+class ComponentRegistry:
+    """遅延初期化コンポーネントの登録・解決"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._init_times: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """コンポーネントのファクトリを登録（初期化はしない）"""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._init_times.pop(name, None)
+            self._errors.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """コンポーネントを取得（未初期化なら初期化）"""
+        if name in self._instances:
+            return self._instances[name]
+
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name not in self._factories:
+                raise KeyError(f"未登録のコンポーネント: {name}")
+
+            started = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"コンポーネント初期化エラー {name}: {e}")
+                raise
+            finally:
+                self._init_times[name] = time.perf_counter() - started
+
+            self._instances[name] = instance
+            logger.info(f"[OK] {name} 初期化完了 ({self._init_times[name] * 1000:.1f}ms)")
+            return instance
+
+    def proxy(self, name: str) -> LazyComponent:
+        """初回アクセスまで初期化を遅延する代理オブジェクト"""
+        return LazyComponent(self, name)
+
+    def is_initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def get_init_report(self) -> Dict[str, Dict]:
+        """コンポーネントごとの初期化状態と所要時間"""
+        with self._lock:
+            report = {}
+            for name in self._factories:
+                init_time = self._init_times.get(name)
+                report[name] = {
+                    'initialized': name in self._instances,
+                    'init_ms': round(init_time * 1000, 2) if init_time is not None else None,
+                    'error': self._errors.get(name)
+                }
+            return report
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+データ充足カレンダー
+日付ごとの予想・結果・レース情報の件数を data_calendar テーブルに保持し、
+条件を満たす日付をメモリ上のソート済み配列に持って前日・翌日の検索を二分探索で行う。
+予想・結果の書き込み（bump_data_version）を受けて該当日の件数だけ数え直す
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from .date_view import DATE_INDEXES, TODAY_TTL_SECONDS, _base_table, _tables, add_version_listener
+from .query_profiler import connect as sqlite_connect
+
+logger = logging.getLogger(__name__)
+
+# 前日・翌日の移動先にする日付の条件（予想・結果のあるレース数）
+MIN_PREDICTED_RACES = 10
+MIN_RESULT_RACES = 5
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS data_calendar (
+        race_date TEXT PRIMARY KEY,
+        predictions INTEGER NOT NULL,
+        results INTEGER NOT NULL,
+        race_info INTEGER NOT NULL,
+        updated_at TEXT
+    )
+'''
+
+
+def _is_complete(counts: Tuple[int, int, int]) -> bool:
+    predictions, results, _ = counts
+    return predictions >= MIN_PREDICTED_RACES and results >= MIN_RESULT_RACES
+
+
+class DataCalendar:
+    """日付別のデータ件数と、前日・翌日検索用の日付配列"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db_key = os.path.abspath(db_path)
+        self._counts: Dict[str, Tuple[int, int, int]] = {}
+        self._complete_dates: List[str] = []
+        self._loaded = False
+        self._dirty: Set[Optional[str]] = set()
+        self._today_checked = 0.0
+        self._lock = threading.Lock()
+        add_version_listener(self._on_version_bump)
+
+    def _on_version_bump(self, db_key: str, race_date: Optional[str]):
+        if db_key == self._db_key:
+            with self._lock:
+                self._dirty.add(race_date)
+
+    def _count_queries(self, cursor) -> List[str]:
+        """日付別のレース数を数えるクエリ（予想・結果・レース情報の順、なければ空）"""
+        tables = _tables(cursor)
+        base = _base_table(tables)
+        if base is None:
+            return []
+        for table in tables:
+            cursor.execute(DATE_INDEXES[table])
+        predicted = 'predicted_win IS NOT NULL' if 'predicted_win' in tables[base] else '1'
+        queries = [
+            f'SELECT race_date, COUNT(*) FROM {base} WHERE {predicted} AND {{where}} GROUP BY race_date',
+            'SELECT race_date, COUNT(*) FROM race_results WHERE winning_boat IS NOT NULL AND {where} GROUP BY race_date'
+        ]
+        if 'race_info' in tables:
+            queries.append('SELECT race_date, COUNT(*) FROM race_info WHERE {where} GROUP BY race_date')
+        return queries
+
+    def _recount(self, race_date: Optional[str] = None) -> Dict[str, Tuple[int, int, int]]:
+        """件数を数え直して data_calendar に保存（日付指定なしなら全日付）"""
+        if not os.path.exists(self.db_path):
+            return {}
+        counts: Dict[str, List[int]] = {}
+        if race_date:
+            counts[race_date] = [0, 0, 0]
+        with sqlite_connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(SCHEMA)
+            where = 'race_date = ?' if race_date else '1'
+            params = (race_date,) if race_date else ()
+            for column, query in enumerate(self._count_queries(cursor)):
+                cursor.execute(query.format(where=where), params)
+                for day, count in cursor.fetchall():
+                    counts.setdefault(day, [0, 0, 0])[column] = count
+
+            now = datetime.now().isoformat()
+            if race_date is None:
+                cursor.execute('DELETE FROM data_calendar')
+            cursor.executemany('''
+                INSERT OR REPLACE INTO data_calendar (race_date, predictions, results, race_info, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(day, *values, now) for day, values in counts.items() if any(values)])
+            # データのない日付は保持しない
+            cursor.executemany('DELETE FROM data_calendar WHERE race_date = ?',
+                               [(day,) for day, values in counts.items() if not any(values)])
+            conn.commit()
+        return {day: tuple(values) for day, values in counts.items() if any(values)}
+
+    def _load(self):
+        """保存済みのカレンダーを読み込む（未作成なら全日付を集計して作成）"""
+        counts = {}
+        if os.path.exists(self.db_path):
+            with sqlite_connect(self.db_path) as conn:
+                conn.execute(SCHEMA)
+                rows = conn.execute('SELECT race_date, predictions, results, race_info FROM data_calendar').fetchall()
+            counts = {row[0]: tuple(row[1:]) for row in rows}
+            if not counts:
+                counts = self._recount()
+                logger.info(f"データカレンダーを作成: {len(counts)}日分 ({self.db_path})")
+        self._counts = counts
+        self._complete_dates = sorted(day for day, values in counts.items() if _is_complete(values))
+        self._loaded = True
+
+    def _update_date(self, race_date: str):
+        """1日分を数え直し、条件を満たすかどうかで日付配列を更新"""
+        values = self._recount(race_date).get(race_date, (0, 0, 0))
+        if any(values):
+            self._counts[race_date] = values
+        else:
+            self._counts.pop(race_date, None)
+        index = bisect_left(self._complete_dates, race_date)
+        listed = index < len(self._complete_dates) and self._complete_dates[index] == race_date
+        if _is_complete(values) and not listed:
+            insort(self._complete_dates, race_date)
+        elif listed and not _is_complete(values):
+            del self._complete_dates[index]
+
+    def _sync(self):
+        """書き込みのあった日付を反映（当日分は他プロセスの書き込みに備えて一定時間ごとに数え直す）"""
+        if not self._loaded:
+            self._load()
+        now = time.time()
+        if now - self._today_checked >= TODAY_TTL_SECONDS:
+            self._today_checked = now
+            self._dirty.add(datetime.now().strftime('%Y-%m-%d'))
+        dirty, self._dirty = self._dirty, set()
+        if None in dirty:
+            self._counts = self._recount()
+            self._complete_dates = sorted(day for day, values in self._counts.items() if _is_complete(values))
+            return
+        for race_date in dirty:
+            self._update_date(race_date)
+
+    def previous_date(self, race_date: str) -> Optional[str]:
+        """データの揃った前の日付"""
+        with self._lock:
+            self._sync()
+            index = bisect_left(self._complete_dates, race_date)
+            return self._complete_dates[index - 1] if index > 0 else None
+
+    def next_date(self, race_date: str) -> Optional[str]:
+        """データの揃った次の日付"""
+        with self._lock:
+            self._sync()
+            index = bisect_right(self._complete_dates, race_date)
+            return self._complete_dates[index] if index < len(self._complete_dates) else None
+
+    def counts(self, race_date: str) -> Dict[str, int]:
+        """指定日の予想・結果・レース情報のレース数"""
+        with self._lock:
+            self._sync()
+            predictions, results, race_info = self._counts.get(race_date, (0, 0, 0))
+            return {'predictions': predictions, 'results': results, 'race_info': race_info}
+
+
+# DBごとのカレンダー
+_calendars: Dict[str, DataCalendar] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_data_calendar(db_path: str) -> DataCalendar:
+    """DBごとに共通のデータカレンダーを取得"""
+    key = os.path.abspath(db_path)
+    with _calendars_lock:
+        calendar = _calendars.get(key)
+        if calendar is None:
+            calendar = _calendars[key] = DataCalendar(db_path)
+        return calendar
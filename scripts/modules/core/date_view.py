@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+日付ビュー
+指定日のレースを予想・結果・レース情報と結合した一覧を1回のインデックス付きクエリで取得する。
+的中判定は型付きカラム（typed_schema）でSQL側で行い、各行は __slots__ の軽量オブジェクトで返す。
+取得結果は (日付, データ版数) 単位でキャッシュし、予想・結果の書き込み時に版数を上げて無効化する。
+版数はプロセス内でしか共有されないため、他プロセスの書き込みに備えて過去日も有効期限付きで保持する
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .metrics import get_metrics
+from .query_profiler import connect as sqlite_connect
+from .race_model import venue_name as lookup_venue_name
+from .typed_schema import ensure_typed_schema, positions_list
+
+logger = logging.getLogger(__name__)
+
+# 日付検索用のインデックス（テーブルが存在する場合のみ作成）
+DATE_INDEXES = {
+    'predictions': 'CREATE INDEX IF NOT EXISTS idx_predictions_date ON predictions (race_date, venue_id, race_number)',
+    'race_details': 'CREATE INDEX IF NOT EXISTS idx_race_details_date ON race_details (race_date, venue_id, race_number)',
+    'race_results': 'CREATE INDEX IF NOT EXISTS idx_race_results_date ON race_results (race_date, venue_id, race_number)',
+    'race_info': 'CREATE INDEX IF NOT EXISTS idx_race_info_date ON race_info (race_date, venue_id, race_number)'
+}
+
+
+class DateViewRow:
+    """日付ビューの1レース分"""
+
+    __slots__ = ('venue_id', 'race_number', 'venue_name', 'start_time', 'race_title',
+                 'predicted_win', 'predicted_place', 'confidence',
+                 'winning_boat', 'place_results', 'trifecta_result',
+                 'is_win_hit', 'is_place_hit', 'is_trifecta_hit')
+
+    def __init__(self, row: Tuple):
+        (self.venue_id, self.race_number, venue_name, self.start_time, self.race_title,
+         self.predicted_win, pred_pos1, pred_pos2, pred_pos3, self.confidence,
+         self.winning_boat, second_boat, third_boat, self.trifecta_result,
+         is_win_hit, is_place_hit, is_trifecta_hit) = row
+        self.venue_name = venue_name or lookup_venue_name(self.venue_id)
+        self.predicted_place = positions_list(pred_pos1, pred_pos2, pred_pos3)
+        self.place_results = positions_list(self.winning_boat, second_boat, third_boat)
+        self.is_win_hit = bool(is_win_hit)
+        self.is_place_hit = bool(is_place_hit)
+        self.is_trifecta_hit = bool(is_trifecta_hit)
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.venue_id, self.race_number
+
+    @property
+    def has_prediction(self) -> bool:
+        return self.predicted_win is not None
+
+    @property
+    def has_result(self) -> bool:
+        return self.winning_boat is not None
+
+
+class DateView:
+    """1日分のビュー（読み取り専用、会場・レース番号の索引付き）"""
+
+    __slots__ = ('race_date', 'rows', '_index')
+
+    def __init__(self, race_date: str, rows: List[DateViewRow]):
+        self.race_date = race_date
+        self.rows = tuple(rows)
+        self._index = {row.key: row for row in self.rows}
+
+    def get(self, venue_id: int, race_number: int) -> Optional[DateViewRow]:
+        return self._index.get((venue_id, race_number))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+# 当日分は他プロセスからの書き込みもあるため短時間で読み直す
+TODAY_TTL_SECONDS = 30
+# 過去日の結果は他プロセス（ASGI版・スケジューラー）が後から保存することもあるため期限付きで読み直す
+PAST_TTL_SECONDS = 300
+# キャッシュする日付ビューの上限
+MAX_CACHED_VIEWS = 64
+
+# DBごとの組み立て済みクエリ（テーブル構成はプロセス内で変わらない前提）
+_queries: Dict[Tuple[str, bool], str] = {}
+_queries_lock = threading.Lock()
+
+
+def _columns(cursor, table: str) -> Set[str]:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _coalesce(*expressions) -> str:
+    expressions = [expression for expression in expressions if expression]
+    if not expressions:
+        return 'NULL'
+    if len(expressions) == 1:
+        return expressions[0]
+    return f"COALESCE({', '.join(expressions)})"
+
+
+def _tables(cursor) -> Dict[str, Set[str]]:
+    """日付ビューで使うテーブルのカラム一覧（存在するもののみ）"""
+    tables = {table: _columns(cursor, table) for table in DATE_INDEXES}
+    return {table: columns for table, columns in tables.items() if columns}
+
+
+def _base_table(tables: Dict[str, Set[str]]) -> Optional[str]:
+    """予想の取得元（predictions、なければ race_details）"""
+    if 'race_results' not in tables:
+        return None
+    return 'predictions' if 'predictions' in tables else 'race_details' if 'race_details' in tables else None
+
+
+def _build_query(cursor, include_unpredicted: bool) -> Optional[str]:
+    """テーブル構成に合わせて日付ビューのクエリを組み立てる"""
+    tables = _tables(cursor)
+    for table in tables:
+        cursor.execute(DATE_INDEXES[table])
+
+    base = _base_table(tables)
+    if base is None:
+        return None
+    predicted, results, info = tables[base], tables['race_results'], tables.get('race_info', set())
+
+    def column(alias, columns, name):
+        return f'{alias}.{name}' if name in columns else None
+
+    select = ', '.join([
+        'k.venue_id', 'k.race_number',
+        _coalesce(column('p', predicted, 'venue_name'), column('r', results, 'venue_name')),
+        _coalesce(column('ri', info, 'start_time'), column('p', predicted, 'start_time'), column('p', predicted, 'race_time')),
+        _coalesce(column('ri', info, 'race_title'), column('p', predicted, 'race_title')),
+        'p.predicted_win', 'p.pred_pos1', 'p.pred_pos2', 'p.pred_pos3', 'p.confidence',
+        'r.winning_boat', 'r.second_boat', 'r.third_boat', _coalesce(column('r', results, 'trifecta_result')),
+        'p.predicted_win = r.winning_boat',
+        'p.predicted_win IN (r.winning_boat, r.second_boat, r.third_boat)',
+        'p.pred_pos1 = r.winning_boat AND p.pred_pos2 = r.second_boat AND p.pred_pos3 = r.third_boat'
+    ])
+
+    # 対象レース: 予想のあるレース（include_unpredicted なら結果のみのレースも含める）
+    keys = f'SELECT race_date, venue_id, race_number FROM {base} WHERE race_date = :date'
+    if include_unpredicted:
+        keys += ' UNION SELECT race_date, venue_id, race_number FROM race_results WHERE race_date = :date'
+
+    join = 'ON {alias}.race_date = k.race_date AND {alias}.venue_id = k.venue_id AND {alias}.race_number = k.race_number'
+    query = f'''
+        SELECT {select}
+        FROM ({keys}) k
+        LEFT JOIN {base} p {join.format(alias='p')}
+        LEFT JOIN race_results r {join.format(alias='r')}
+    '''
+    if info:
+        query += f"LEFT JOIN race_info ri {join.format(alias='ri')}\n"
+    return query + 'ORDER BY k.venue_id, k.race_number'
+
+
+def _query_date_view(db_path: str, race_date: str, include_unpredicted: bool) -> List[DateViewRow]:
+    """日付ビューをDBから取得"""
+    if not os.path.exists(db_path):
+        return []
+    ensure_typed_schema(db_path)
+
+    with sqlite_connect(db_path) as conn:
+        cursor = conn.cursor()
+        cache_key = (os.path.abspath(db_path), include_unpredicted)
+        query = _queries.get(cache_key)
+        if query is None:
+            with _queries_lock:
+                query = _build_query(cursor, include_unpredicted)
+                conn.commit()
+                if query:
+                    _queries[cache_key] = query
+        if query is None:
+            logger.warning(f"日付ビュー: 予想・結果テーブルがありません ({db_path})")
+            return []
+        cursor.execute(query, {'date': race_date})
+        return [DateViewRow(row) for row in cursor.fetchall()]
+
+
+def clear_query_cache():
+    """組み立て済みクエリを破棄（テーブル構成を変更した場合）"""
+    with _queries_lock:
+        _queries.clear()
+
+
+# ---- 全期間の読み出し ----
+
+# 全期間の一覧で1回に読む日数（日付のキーセットページング）
+PERIOD_PAGE_DAYS = 30
+
+
+def iter_dates(db_path: str, page_size: int = PERIOD_PAGE_DAYS) -> Iterator[str]:
+    """予想のある日付を新しい順に返す（前ページ最後の日付より前を読むキーセットページング）"""
+    if not os.path.exists(db_path):
+        return
+    with sqlite_connect(db_path) as conn:
+        base = _base_table(_tables(conn.cursor()))
+    if base is None:
+        return
+
+    last_date = None
+    while True:
+        with sqlite_connect(db_path) as conn:
+            if last_date is None:
+                rows = conn.execute(f'SELECT DISTINCT race_date FROM {base} ORDER BY race_date DESC LIMIT ?',
+                                    (page_size,)).fetchall()
+            else:
+                rows = conn.execute(f'SELECT DISTINCT race_date FROM {base} WHERE race_date < ? ORDER BY race_date DESC LIMIT ?',
+                                    (last_date, page_size)).fetchall()
+        for (race_date,) in rows:
+            yield race_date
+        if len(rows) < page_size:
+            return
+        last_date = rows[-1][0]
+
+
+def iter_period_views(db_path: str, page_size: int = PERIOD_PAGE_DAYS) -> Iterator[DateView]:
+    """全期間の日付ビューを新しい日付から1日ずつ返す（保持するのは1日分のみ）"""
+    for race_date in iter_dates(db_path, page_size):
+        # 一度しか読まない過去日でキャッシュを押し出さないよう直接取得する
+        yield DateView(race_date, _query_date_view(db_path, race_date, False))
+
+
+# ---- 日付ビューのキャッシュ ----
+
+_views: 'OrderedDict[Tuple[str, str, bool], Tuple[Tuple[int, int], float, DateView]]' = OrderedDict()
+_db_versions: Dict[str, int] = {}
+_date_versions: Dict[Tuple[str, str], int] = {}
+_views_lock = threading.Lock()
+# 版数更新の通知先（集計キャッシュなど、引数は DBの絶対パス と 日付）
+_version_listeners: List[Callable[[str, Optional[str]], None]] = []
+
+
+def _data_version(db_key: str, race_date: str) -> Tuple[int, int]:
+    return _db_versions.get(db_key, 0), _date_versions.get((db_key, race_date), 0)
+
+
+def bump_data_version(db_path: str, race_date: Optional[str] = None):
+    """予想・結果の書き込み後に呼ぶ（日付指定なしならDB全体を無効化）"""
+    db_key = os.path.abspath(db_path)
+    with _views_lock:
+        if race_date is None:
+            _db_versions[db_key] = _db_versions.get(db_key, 0) + 1
+        else:
+            _date_versions[(db_key, race_date)] = _date_versions.get((db_key, race_date), 0) + 1
+        listeners = list(_version_listeners)
+    for listener in listeners:
+        try:
+            listener(db_key, race_date)
+        except Exception as e:
+            logger.error(f"版数更新の通知エラー: {e}")
+
+
+def add_version_listener(listener: Callable[[str, Optional[str]], None]):
+    """予想・結果の書き込み（bump_data_version）の通知を受け取る"""
+    with _views_lock:
+        if listener not in _version_listeners:
+            _version_listeners.append(listener)
+
+
+def load_date_view(db_path: str, race_date: str, include_unpredicted: bool = False) -> DateView:
+    """指定日のビュー（データ版数が変わっていなければキャッシュを返す）"""
+    db_key = os.path.abspath(db_path)
+    cache_key = (db_key, race_date, include_unpredicted)
+    now = time.time()
+    ttl = TODAY_TTL_SECONDS if race_date >= datetime.now().strftime('%Y-%m-%d') else PAST_TTL_SECONDS
+
+    with _views_lock:
+        version = _data_version(db_key, race_date)
+        cached = _views.get(cache_key)
+        if cached and cached[0] == version and now - cached[1] < ttl:
+            _views.move_to_end(cache_key)
+            get_metrics().cache_hit('date_view', True)
+            return cached[2]
+
+    get_metrics().cache_hit('date_view', False)
+    view = DateView(race_date, _query_date_view(db_path, race_date, include_unpredicted))
+
+    with _views_lock:
+        # 取得中に書き込みがあった場合は古い版数のまま保存し、次回読み直す
+        _views[cache_key] = (version, now, view)
+        _views.move_to_end(cache_key)
+        while len(_views) > MAX_CACHED_VIEWS:
+            _views.popitem(last=False)
+    return view
+
+
+def get_date_view(db_path: str, race_date: str, include_unpredicted: bool = False) -> List[DateViewRow]:
+    """指定日の予想・結果を結合したレース一覧（会場・レース番号順）"""
+    return list(load_date_view(db_path, race_date, include_unpredicted).rows)
+
+
+def clear_date_views():
+    """日付ビューのキャッシュを破棄"""
+    with _views_lock:
+        _views.clear()
@@ -8,6 +8,8 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+from .race_model import Race
+
 logger = logging.getLogger(__name__)
 
 def format_race_data_for_api(races_data: List[Dict]) -> List[Dict]:
@@ -18,6 +20,9 @@ def format_race_data_for_api(races_data: List[Dict]) -> List[Dict]:
         
         formatted_races = []
         for race in races_data:
+            if isinstance(race, Race):
+                formatted_races.append(_format_race_model(race))
+                continue
             formatted_race = {
                 'venue_id': race.get('venue_id', 0),
                 'venue_name': race.get('venue_name', '不明'),
@@ -40,6 +45,22 @@ def format_race_data_for_api(races_data: List[Dict]) -> List[Dict]:
         logger.error(f"データフォーマットエラー: {e}")
         return []
 
+def _format_race_model(race: Race) -> Dict:
+    """解析済みレース（Race）をAPI用にフォーマット"""
+    return {
+        'venue_id': race.venue_id,
+        'venue_name': race.venue_name,
+        'race_number': race.race_number,
+        'race_title': race.title,
+        'start_time': race.closed_at_text or '',
+        'status': 'unknown',
+        'boats': [entrant.to_dict() for entrant in race.entrants],
+        'predictions': {},
+        'results': {},
+        'confidence': 0.0,
+        'formatted_time': _format_display_time(race.closed_at_text)
+    }
+
 def _format_display_time(time_str: Optional[str]) -> str:
     """表示用時間フォーマット"""
     if not time_str:
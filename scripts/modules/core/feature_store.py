@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+特徴量ストア
+結果取り込み時にレーサー別の直近成績・会場別のモーター・ボート成績・会場×コース別の1着率を
+差分更新し（1結果あたりO(1)）、予想時は出走表単位でまとめて参照できるようにメモリ上に保持する。
+Webアプリ（Flask）とASGI版の両プロセスが取り込むため、更新時は対象レースの集計行をDBから読み直してから加算する
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .query_profiler import connect as sqlite_connect
+
+logger = logging.getLogger(__name__)
+
+# 直近成績の対象レース数
+RECENT_WINDOW = 10
+COURSES = 6
+VENUES = 24
+RACES = 12
+EQUIPMENT_KINDS = ('motor', 'boat')
+
+# コース別1着率を会場・レース番号単位で使う最小レース数（不足時は会場全体→全国へ）
+MIN_VENUE_RACES = 100
+MIN_RACE_NUMBER_RACES = 60
+# 会場の信頼度補正（1コース1着率の全国差）の上下限
+VENUE_ADJUSTMENT_LIMIT = 0.10
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS racer_form (
+        racer_number INTEGER PRIMARY KEY,
+        form_data TEXT NOT NULL,
+        updated_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS equipment_stats (
+        venue_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        equipment_number INTEGER NOT NULL,
+        starts INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        top2 INTEGER NOT NULL,
+        top3 INTEGER NOT NULL,
+        updated_at TEXT,
+        PRIMARY KEY (venue_id, kind, equipment_number)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS venue_course_stats (
+        venue_id INTEGER NOT NULL,
+        race_number INTEGER NOT NULL,
+        course INTEGER NOT NULL,
+        starts INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        PRIMARY KEY (venue_id, race_number, course)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS feature_ingested_races (
+        race_date TEXT NOT NULL,
+        venue_id INTEGER NOT NULL,
+        race_number INTEGER NOT NULL,
+        ingested_at TEXT,
+        PRIMARY KEY (race_date, venue_id, race_number)
+    )
+    '''
+]
+
+
+def _default_db_path() -> str:
+    # core -> modules -> scripts -> (project_root)
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    return os.path.join(project_root, 'cache', 'comprehensive_kyotei.db')
+
+
+def _rate(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+class RacerForm:
+    """1レーサー分のローリング集計（窓から外れた値は合計から差し引く）"""
+
+    def __init__(self, window: int = RECENT_WINDOW):
+        self.places = deque(maxlen=window)  # 直近着順（失格・欠場は None）
+        self.start_timings = deque(maxlen=window)
+        self.finished = 0
+        self.place_sum = 0
+        self.wins = 0
+        self.top2 = 0
+        self.top3 = 0
+        self.st_sum = 0.0
+        self.starts = 0
+        self.course_starts = [0] * COURSES
+        self.course_wins = [0] * COURSES
+        self.last_race_date = None
+
+    def _count(self, place: Optional[int], sign: int):
+        if place is None:
+            return
+        self.finished += sign
+        self.place_sum += place * sign
+        self.wins += sign if place == 1 else 0
+        self.top2 += sign if place <= 2 else 0
+        self.top3 += sign if place <= 3 else 0
+
+    def add(self, place: Optional[int], course: Optional[int], start_timing: Optional[float], race_date: str):
+        """1レース分の結果を反映"""
+        if len(self.places) == self.places.maxlen:
+            self._count(self.places[0], -1)
+        self.places.append(place)
+        self._count(place, 1)
+
+        if start_timing is not None:
+            if len(self.start_timings) == self.start_timings.maxlen:
+                self.st_sum -= self.start_timings[0]
+            self.start_timings.append(start_timing)
+            self.st_sum += start_timing
+
+        self.starts += 1
+        if course and 1 <= course <= COURSES:
+            self.course_starts[course - 1] += 1
+            if place == 1:
+                self.course_wins[course - 1] += 1
+        self.last_race_date = race_date
+
+    def features(self) -> Dict:
+        """予想・学習用の特徴量"""
+        recent = len(self.places)
+        return {
+            'starts': self.starts,
+            'recent_starts': recent,
+            'recent_places': list(self.places),
+            'recent_avg_place': _rate(self.place_sum, self.finished),
+            'recent_win_rate': _rate(self.wins, recent),
+            'recent_top2_rate': _rate(self.top2, recent),
+            'recent_top3_rate': _rate(self.top3, recent),
+            'recent_avg_st': _rate(self.st_sum, len(self.start_timings)),
+            'course_win_rates': {
+                course + 1: _rate(self.course_wins[course], self.course_starts[course])
+                for course in range(COURSES)
+            },
+            'last_race_date': self.last_race_date
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'places': list(self.places),
+            'start_timings': list(self.start_timings),
+            'starts': self.starts,
+            'course_starts': self.course_starts,
+            'course_wins': self.course_wins,
+            'last_race_date': self.last_race_date
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, window: int = RECENT_WINDOW) -> 'RacerForm':
+        form = cls(window)
+        for place in data.get('places', [])[-window:]:
+            form.places.append(place)
+            form._count(place, 1)
+        for start_timing in data.get('start_timings', [])[-window:]:
+            form.start_timings.append(start_timing)
+            form.st_sum += start_timing
+        form.starts = data.get('starts', len(form.places))
+        form.course_starts = list(data.get('course_starts', [0] * COURSES))
+        form.course_wins = list(data.get('course_wins', [0] * COURSES))
+        form.last_race_date = data.get('last_race_date')
+        return form
+
+
+def _parse_boat(boat: Dict):
+    """結果データの1艇分から (レーサー番号, 着順, 進入コース, ST) を取り出す"""
+    racer_number = boat.get('racer_number')
+    place = boat.get('racer_place_number')
+    course = boat.get('racer_course_number')
+    start_timing = boat.get('racer_start_timing')
+    try:
+        place = int(place) if place else None
+        course = int(course) if course else None
+        start_timing = float(start_timing) if start_timing is not None else None
+    except (TypeError, ValueError):
+        place, course, start_timing = None, None, None
+    return racer_number, place, course, start_timing
+
+
+def program_boats_by_race(programs: Optional[List[Dict]]) -> Dict[Tuple[int, int], List[Dict]]:
+    """プログラムデータを (会場, レース番号) -> 出走艇 に索引化（結果にないモーター・ボート番号の補完用）"""
+    return {
+        (program.get('race_stadium_number'), program.get('race_number')): program.get('boats', [])
+        for program in programs or []
+    }
+
+
+def _equipment_numbers(boat: Dict, program_boats: Optional[List[Dict]]) -> Dict[str, Optional[int]]:
+    """結果の1艇分に対応するモーター・ボート番号（結果になければプログラムから補完）"""
+    numbers = {kind: boat.get(f'racer_assigned_{kind}_number') for kind in EQUIPMENT_KINDS}
+    if None in numbers.values() and program_boats:
+        boat_number = boat.get('racer_boat_number')
+        for program_boat in program_boats:
+            if program_boat.get('racer_boat_number') == boat_number:
+                for kind in EQUIPMENT_KINDS:
+                    if numbers[kind] is None:
+                        numbers[kind] = program_boat.get(f'racer_assigned_{kind}_number')
+                break
+    return numbers
+
+
+def _equipment_rates(stats: List[int]) -> Dict:
+    starts, wins, top2, top3 = stats
+    return {
+        'starts': starts,
+        'win_rate': _rate(wins, starts),
+        'top2_rate': _rate(top2, starts),
+        'top3_rate': _rate(top3, starts)
+    }
+
+
+class FeatureStore:
+    """結果から差分更新される特徴量のメモリキャッシュ（永続化は同じSQLiteに行う）"""
+
+    def __init__(self, db_path: Optional[str] = None, window: int = RECENT_WINDOW):
+        self.db_path = db_path or _default_db_path()
+        self.window = window
+        self._racers: Dict[int, RacerForm] = {}
+        self._equipment: Dict[Tuple[int, str, int], List[int]] = {}  # (会場, 種別, 番号) -> [出走, 1着, 2連対, 3連対]
+        # 会場×レース番号×コースの出走・1着数（密な配列）と、会場×コースの1着率（24×6、行0は全国）
+        self._course_starts = [0] * (VENUES * RACES * COURSES)
+        self._course_wins = [0] * (VENUES * RACES * COURSES)
+        self._venue_course_starts = [[0] * COURSES for _ in range(VENUES + 1)]
+        self._venue_course_wins = [[0] * COURSES for _ in range(VENUES + 1)]
+        self._venue_course_rates: List[Optional[List[float]]] = [None] * (VENUES + 1)
+        self._ingested = set()  # DBを使わない場合の取り込み済みレース
+        self._loaded = False
+        self._schema_ready = False
+        self._lock = threading.RLock()
+
+    # ---- 読み込み ----
+
+    def ensure_loaded(self):
+        """初回参照時に永続化済みの集計を読み込む（未作成なら結果履歴から構築）"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self.db_path):
+                logger.info(f"特徴量ストア: DB未作成のためメモリのみで開始 ({self.db_path})")
+                return
+            try:
+                with sqlite_connect(self.db_path) as conn:
+                    cursor = conn.cursor()
+                    self.ensure_schema(cursor)
+                    cursor.execute('SELECT racer_number, form_data FROM racer_form')
+                    for racer_number, form_data in cursor.fetchall():
+                        self._racers[racer_number] = RacerForm.from_dict(json.loads(form_data), self.window)
+                    cursor.execute('SELECT venue_id, kind, equipment_number, starts, wins, top2, top3 FROM equipment_stats')
+                    for venue_id, kind, number, starts, wins, top2, top3 in cursor.fetchall():
+                        self._equipment[(venue_id, kind, number)] = [starts, wins, top2, top3]
+                    cursor.execute('SELECT venue_id, race_number, course, starts, wins FROM venue_course_stats')
+                    for venue_id, race_number, course, starts, wins in cursor.fetchall():
+                        self._add_course_counts(venue_id, race_number, course, starts, wins)
+                    has_course_stats = any(self._course_starts)
+                    if not self._racers:
+                        self._backfill(cursor)
+                    elif not has_course_stats:
+                        self._backfill_course_stats(cursor)
+                    self._refresh_course_rates()
+                    conn.commit()
+                logger.info(f"特徴量ストア読み込み完了: レーサー{len(self._racers)}名, モーター・ボート{len(self._equipment)}件, "
+                            f"コース別集計{self._venue_course_starts[0][0]}レース")
+            except Exception as e:
+                logger.warning(f"特徴量ストア読み込みエラー: {e}")
+
+    def ensure_schema(self, cursor):
+        if self._schema_ready:
+            return
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        self._schema_ready = True
+
+    def _stored_results(self, cursor):
+        """保存済みの結果履歴 (日付, 会場, レース番号, 出走艇) を日付順に返す"""
+        cursor.execute('PRAGMA table_info(race_results)')
+        if 'result_data' not in {row[1] for row in cursor.fetchall()}:
+            return []
+        cursor.execute('''
+            SELECT race_date, venue_id, race_number, result_data FROM race_results
+            WHERE result_data IS NOT NULL
+            ORDER BY race_date, venue_id, race_number
+        ''')
+        races = []
+        for race_date, venue_id, race_number, result_data in cursor.fetchall():
+            try:
+                races.append((race_date, venue_id, race_number, json.loads(result_data).get('boats', [])))
+            except (TypeError, ValueError, AttributeError):
+                continue
+        return races
+
+    def _backfill(self, cursor) -> int:
+        """保存済みの結果履歴から集計を構築（初回のみ）"""
+        count = 0
+        for race_date, venue_id, race_number, boats in self._stored_results(cursor):
+            # 構築中はメモリの集計がDBと同じなので読み直さない
+            if self._ingest(cursor, race_date, venue_id, race_number, boats, None, reload=False):
+                count += 1
+        if count:
+            logger.info(f"特徴量ストア: 結果履歴{count}レースから構築")
+        return count
+
+    def _backfill_course_stats(self, cursor) -> int:
+        """コース別集計のみ未作成の場合に結果履歴から構築"""
+        count = 0
+        for race_date, venue_id, race_number, boats in self._stored_results(cursor):
+            for boat in boats:
+                _, place, course, _ = _parse_boat(boat)
+                self._add_course_counts(venue_id, race_number, course or boat.get('racer_boat_number'),
+                                        1, 1 if place == 1 else 0)
+            count += 1
+        cursor.executemany('''
+            INSERT OR REPLACE INTO venue_course_stats (venue_id, race_number, course, starts, wins)
+            VALUES (?, ?, ?, ?, ?)
+        ''', self._course_rows())
+        if count:
+            logger.info(f"特徴量ストア: 結果履歴{count}レースからコース別集計を構築")
+        return count
+
+    def _course_index(self, venue_id, race_number, course) -> Optional[int]:
+        try:
+            venue_id, race_number, course = int(venue_id), int(race_number), int(course)
+        except (TypeError, ValueError):
+            return None
+        if not (1 <= venue_id <= VENUES and 1 <= race_number <= RACES and 1 <= course <= COURSES):
+            return None
+        return ((venue_id - 1) * RACES + (race_number - 1)) * COURSES + (course - 1)
+
+    def _add_course_counts(self, venue_id, race_number, course, starts: int, wins: int) -> Optional[int]:
+        """会場×レース番号×コースの集計に加算（会場行・全国行も更新）"""
+        index = self._course_index(venue_id, race_number, course)
+        if index is None:
+            return None
+        self._course_starts[index] += starts
+        self._course_wins[index] += wins
+        for row in (int(venue_id), 0):
+            self._venue_course_starts[row][int(course) - 1] += starts
+            self._venue_course_wins[row][int(course) - 1] += wins
+        return index
+
+    def _course_rows(self, indexes: Optional[Iterable[int]] = None) -> List[Tuple]:
+        """永続化用の行（indexes 未指定なら出走のある全セル）"""
+        if indexes is None:
+            indexes = [i for i, starts in enumerate(self._course_starts) if starts]
+        rows = []
+        for index in indexes:
+            venue_index, course_index = divmod(index, COURSES)
+            venue_index, race_index = divmod(venue_index, RACES)
+            rows.append((venue_index + 1, race_index + 1, course_index + 1,
+                         self._course_starts[index], self._course_wins[index]))
+        return rows
+
+    def _refresh_course_rates(self, rows: Optional[Iterable[int]] = None):
+        """会場×コースの1着率を再計算（rows 未指定なら全会場と全国）"""
+        for row in (range(VENUES + 1) if rows is None else rows):
+            starts = self._venue_course_starts[row]
+            wins = self._venue_course_wins[row]
+            if starts[0] < (MIN_VENUE_RACES if row else 1):
+                self._venue_course_rates[row] = None
+                continue
+            self._venue_course_rates[row] = [
+                round(wins[course] / starts[course], 4) if starts[course] else 0.0
+                for course in range(COURSES)
+            ]
+
+    # ---- 更新 ----
+
+    def _reload_race(self, cursor, venue_id: int, race_number: int, boats: List[Dict],
+                     program_boats: Optional[List[Dict]]):
+        """レースに関係するレーサー・モーター・ボート・コース別の集計をDBの値に合わせる
+        （他プロセスが取り込んだ分をメモリに反映する）"""
+        racer_numbers = [racer_number for racer_number, _, _, _ in map(_parse_boat, boats) if racer_number]
+        if racer_numbers:
+            cursor.execute(f'''
+                SELECT racer_number, form_data FROM racer_form
+                WHERE racer_number IN ({', '.join('?' * len(racer_numbers))})
+            ''', racer_numbers)
+            for racer_number, form_data in cursor.fetchall():
+                self._racers[racer_number] = RacerForm.from_dict(json.loads(form_data), self.window)
+
+        for boat in boats:
+            for kind, number in _equipment_numbers(boat, program_boats).items():
+                if number is None:
+                    continue
+                cursor.execute('''
+                    SELECT starts, wins, top2, top3 FROM equipment_stats
+                    WHERE venue_id = ? AND kind = ? AND equipment_number = ?
+                ''', (venue_id, kind, number))
+                row = cursor.fetchone()
+                if row:
+                    self._equipment[(venue_id, kind, number)] = list(row)
+
+        cursor.execute('SELECT course, starts, wins FROM venue_course_stats WHERE venue_id = ? AND race_number = ?',
+                       (venue_id, race_number))
+        changed = False
+        for course, starts, wins in cursor.fetchall():
+            index = self._course_index(venue_id, race_number, course)
+            if index is None:
+                continue
+            delta_starts = starts - self._course_starts[index]
+            delta_wins = wins - self._course_wins[index]
+            if delta_starts or delta_wins:
+                self._add_course_counts(venue_id, race_number, course, delta_starts, delta_wins)
+                changed = True
+        if changed:
+            self._refresh_course_rates((int(venue_id), 0))
+
+    def ingest_race(self, cursor, race_date: str, venue_id: int, race_number: int, boats: List[Dict],
+                    program_boats: Optional[List[Dict]] = None) -> bool:
+        """1レース分の結果を反映（同じレースは一度だけ。cursor が None ならメモリのみ）"""
+        self.ensure_loaded()
+        return self._ingest(cursor, race_date, venue_id, race_number, boats, program_boats)
+
+    def _ingest(self, cursor, race_date: str, venue_id: int, race_number: int, boats: List[Dict],
+                program_boats: Optional[List[Dict]], reload: bool = True) -> bool:
+        key = (race_date, venue_id, race_number)
+        with self._lock:
+            if cursor is not None:
+                self.ensure_schema(cursor)
+                # 取り込み済み記録の INSERT で書き込みロックを取るため、以降の読み直しから保存までに
+                # 他プロセスの取り込みが割り込むことはない
+                cursor.execute('''
+                    INSERT OR IGNORE INTO feature_ingested_races (race_date, venue_id, race_number, ingested_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (race_date, venue_id, race_number, datetime.now().isoformat()))
+                inserted = cursor.rowcount == 1
+                if reload:
+                    self._reload_race(cursor, venue_id, race_number, boats, program_boats)
+                if not inserted:
+                    return False
+            elif key in self._ingested:
+                return False
+            else:
+                self._ingested.add(key)
+
+            now = datetime.now().isoformat()
+            updated = []
+            updated_equipment = []
+            updated_courses = []
+            for boat in boats:
+                racer_number, place, course, start_timing = _parse_boat(boat)
+                # 進入コースがなければ枠なりとみなす
+                index = self._add_course_counts(venue_id, race_number, course or boat.get('racer_boat_number'),
+                                                1, 1 if place == 1 else 0)
+                if index is not None:
+                    updated_courses.append(index)
+                if racer_number:
+                    form = self._racers.get(racer_number)
+                    if form is None:
+                        form = self._racers[racer_number] = RacerForm(self.window)
+                    form.add(place, course, start_timing, race_date)
+                    updated.append((racer_number, json.dumps(form.to_dict()), now))
+
+                for kind, number in _equipment_numbers(boat, program_boats).items():
+                    if number is None:
+                        continue
+                    stats = self._equipment.setdefault((venue_id, kind, number), [0, 0, 0, 0])
+                    stats[0] += 1
+                    if place:
+                        stats[1] += 1 if place == 1 else 0
+                        stats[2] += 1 if place <= 2 else 0
+                        stats[3] += 1 if place <= 3 else 0
+                    updated_equipment.append((venue_id, kind, number, *stats, now))
+
+            if cursor is not None and updated:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO racer_form (racer_number, form_data, updated_at)
+                    VALUES (?, ?, ?)
+                ''', updated)
+            if cursor is not None and updated_equipment:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO equipment_stats
+                    (venue_id, kind, equipment_number, starts, wins, top2, top3, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', updated_equipment)
+            if updated_courses:
+                self._refresh_course_rates((int(venue_id), 0))
+                if cursor is not None:
+                    cursor.executemany('''
+                        INSERT OR REPLACE INTO venue_course_stats (venue_id, race_number, course, starts, wins)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', self._course_rows(updated_courses))
+        return True
+
+    # ---- 参照 ----
+
+    def get_racer_features(self, racer_number: int) -> Optional[Dict]:
+        return self.get_card_features([racer_number]).get(racer_number)
+
+    def get_card_features(self, racer_numbers: Iterable[int]) -> Dict[int, Dict]:
+        """出走表単位の一括参照（集計のないレーサーは含めない）"""
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                racer_number: self._racers[racer_number].features()
+                for racer_number in racer_numbers
+                if racer_number in self._racers
+            }
+
+    def get_equipment_stats(self, venue_id: int, kind: str, number: int) -> Optional[Dict]:
+        """会場別のモーター・ボート成績（kind は 'motor' / 'boat'。集計がなければ None）"""
+        self.ensure_loaded()
+        stats = self._equipment.get((venue_id, kind, number))
+        return _equipment_rates(list(stats)) if stats else None
+
+    def get_course_win_rates(self, venue_id: int, race_number: Optional[int] = None) -> Optional[Dict[int, float]]:
+        """コース別1着率（レース番号別→会場全体の順に十分な件数があるものを返す。なければ None）"""
+        self.ensure_loaded()
+        if race_number is not None:
+            first = self._course_index(venue_id, race_number, 1)
+            if first is not None and self._course_starts[first] >= MIN_RACE_NUMBER_RACES:
+                return {
+                    course + 1: round(self._course_wins[first + course] / self._course_starts[first + course], 4)
+                    if self._course_starts[first + course] else 0.0
+                    for course in range(COURSES)
+                }
+        if not isinstance(venue_id, int) or not 1 <= venue_id <= VENUES:
+            return None
+        rates = self._venue_course_rates[venue_id]
+        return {course + 1: rate for course, rate in enumerate(rates)} if rates else None
+
+    def get_venue_confidence_adjustment(self, venue_id: int) -> Optional[float]:
+        """会場の信頼度補正（1コース1着率の全国平均との差。インが強い会場ほど高い）"""
+        self.ensure_loaded()
+        if not isinstance(venue_id, int) or not 1 <= venue_id <= VENUES:
+            return None
+        venue_rates = self._venue_course_rates[venue_id]
+        national_rates = self._venue_course_rates[0]
+        if not venue_rates or not national_rates:
+            return None
+        difference = venue_rates[0] - national_rates[0]
+        return round(max(-VENUE_ADJUSTMENT_LIMIT, min(VENUE_ADJUSTMENT_LIMIT, difference)), 4)
+
+    def get_status(self) -> Dict:
+        return {
+            'db_path': self.db_path,
+            'loaded': self._loaded,
+            'racers': len(self._racers),
+            'equipment': len(self._equipment),
+            'course_stat_races': self._venue_course_starts[0][0],
+            'window': self.window
+        }
+
+
+_feature_store = None
+_feature_store_lock = threading.Lock()
+
+
+def get_feature_store(db_path: Optional[str] = None) -> FeatureStore:
+    """プロセス共通の特徴量ストアを取得"""
+    global _feature_store
+    if _feature_store is None:
+        with _feature_store_lock:
+            if _feature_store is None:
+                _feature_store = FeatureStore(db_path)
+    return _feature_store
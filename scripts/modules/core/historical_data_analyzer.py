@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+履歴データ分析
+日付×会場×券種の的中数を累積和（プレフィックスサム）の配列で保持し、
+任意の期間・会場の集計を期間の長さによらず O(会場数) で返す。
+予想・結果の書き込み（bump_data_version）を受けて該当日だけ差分で更新する。
+他プロセスの書き込みは通知されないため、一定時間ごとに当日分を集計し直し、
+日付別の行数・最大rowidが変わった日付も差分で更新する
+"""
+
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .date_view import DATE_INDEXES, TODAY_TTL_SECONDS, _base_table, _tables, add_version_listener
+from .query_profiler import connect as sqlite_connect
+from .race_model import VENUE_NAMES
+from .typed_schema import ensure_typed_schema
+
+logger = logging.getLogger(__name__)
+
+# 集計項目（予想数・結果あり・単勝/複勝/3連単の的中数）
+METRICS = ('predictions', 'completed', 'win_hits', 'place_hits', 'trifecta_hits')
+# 会場番号をそのまま添字に使う（0 は未使用）
+VENUE_SLOTS = len(VENUE_NAMES)
+VENUE_IDS = tuple(range(1, VENUE_SLOTS))
+# 期間選択のプリセット（日数、None は全期間）
+PERIOD_PRESETS = (('直近7日', 7), ('直近30日', 30), ('直近90日', 90), ('全期間', None))
+
+_ROW_WIDTH = VENUE_SLOTS * len(METRICS)
+
+
+def _default_db_path() -> str:
+    # core -> modules -> scripts -> (project_root)
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    return os.path.join(project_root, 'cache', 'comprehensive_kyotei.db')
+
+
+def _rate(hits: int, total: int) -> float:
+    return round(hits / total * 100, 1) if total else 0.0
+
+
+def _summary(counts: List[int]) -> Dict:
+    """集計値を calculate_accuracy と同じ形式のサマリーに変換"""
+    predictions, completed, win_hits, place_hits, trifecta_hits = counts
+    return {
+        'total_predictions': predictions,
+        'completed_races': completed,
+        'pending_races': predictions - completed,
+        'win_hits': win_hits,
+        'win_accuracy': _rate(win_hits, predictions),
+        'place_hits': place_hits,
+        'place_accuracy': _rate(place_hits, predictions),
+        'trifecta_hits': trifecta_hits,
+        'trifecta_accuracy': _rate(trifecta_hits, predictions),
+        'completion_rate': _rate(completed, predictions)
+    }
+
+
+class RangeCube:
+    """日付×会場×集計項目の累積和
+
+    _prefix[(d * VENUE_SLOTS + venue) * len(METRICS) + metric] は _dates[:d] の合計。
+    期間 [start, end] の値は2行の差で求まる
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db_key = os.path.abspath(db_path)
+        self._dates: List[str] = []
+        self._prefix = array('q', [0] * _ROW_WIDTH)
+        self._built = False
+        self._dirty: Set[Optional[str]] = set()
+        # 日付 -> 予想・結果テーブルの (行数, 最大rowid)。他プロセスの書き込み検出用
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        add_version_listener(self._on_version_bump)
+
+    def _on_version_bump(self, db_key: str, race_date: Optional[str]):
+        if db_key == self._db_key:
+            with self._lock:
+                self._dirty.add(race_date)
+
+    def _query_counts(self, race_date: Optional[str] = None) -> Dict[str, Dict[int, Tuple[int, ...]]]:
+        """日付・会場別の集計値をDBから取得（日付指定時はその日のみ）"""
+        if not os.path.exists(self.db_path):
+            return {}
+        ensure_typed_schema(self.db_path)
+        with sqlite_connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            base = _base_table(_tables(cursor))
+            if base is None:
+                return {}
+            where = 'WHERE p.race_date = ?' if race_date else ''
+            cursor.execute(f'''
+                SELECT p.race_date, p.venue_id,
+                       COUNT(*),
+                       COUNT(r.race_date),
+                       COUNT(CASE WHEN p.predicted_win = r.winning_boat THEN 1 END),
+                       COUNT(CASE WHEN p.predicted_win IN (r.winning_boat, r.second_boat, r.third_boat) THEN 1 END),
+                       COUNT(CASE WHEN p.pred_pos1 = r.winning_boat AND p.pred_pos2 = r.second_boat
+                                       AND p.pred_pos3 = r.third_boat THEN 1 END)
+                FROM {base} p
+                LEFT JOIN race_results r ON p.race_date = r.race_date
+                                         AND p.venue_id = r.venue_id
+                                         AND p.race_number = r.race_number
+                {where}
+                GROUP BY p.race_date, p.venue_id
+            ''', (race_date,) if race_date else ())
+            days: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+            for row in cursor.fetchall():
+                if row[1] in VENUE_IDS:
+                    days.setdefault(row[0], {})[row[1]] = tuple(row[2:])
+            return days
+
+    def _date_signatures(self) -> Dict[str, Tuple[int, ...]]:
+        """日付別の予想・結果の行数と最大rowid（日付インデックスだけで数えられる）
+        INSERT OR REPLACE は行を入れ替えるため、件数が同じでも最大rowidが変わる"""
+        if not os.path.exists(self.db_path):
+            return {}
+        with sqlite_connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            tables = _tables(cursor)
+            base = _base_table(tables)
+            if base is None:
+                return {}
+            signatures: Dict[str, List[int]] = {}
+            for column, table in enumerate((base, 'race_results')):
+                cursor.execute(DATE_INDEXES[table])
+                cursor.execute(f'SELECT race_date, COUNT(*), MAX(rowid) FROM {table} GROUP BY race_date')
+                for race_date, count, max_rowid in cursor.fetchall():
+                    signatures.setdefault(race_date, [0, 0, 0, 0])[column * 2:column * 2 + 2] = [count, max_rowid]
+            conn.commit()
+        return {race_date: tuple(values) for race_date, values in signatures.items()}
+
+    def _check_external_writes(self):
+        """当日分と、行数・最大rowidの変わった日付を再集計の対象にする（TODAY_TTL_SECONDS ごと）"""
+        now = time.time()
+        if now - self._checked < TODAY_TTL_SECONDS:
+            return
+        self._checked = now
+        self._dirty.add(datetime.now().strftime('%Y-%m-%d'))
+        signatures = self._date_signatures()
+        for race_date in set(signatures) | set(self._signatures):
+            if signatures.get(race_date) != self._signatures.get(race_date):
+                self._dirty.add(race_date)
+        self._signatures = signatures
+
+    def _rebuild(self):
+        """全期間の累積和を作り直す"""
+        # 集計より先に取得し、集計中の書き込みは次回の確認で拾う
+        self._signatures = self._date_signatures()
+        self._checked = time.time()
+        days = self._query_counts()
+        dates = sorted(days)
+        prefix = array('q', [0] * (_ROW_WIDTH * (len(dates) + 1)))
+        width = len(METRICS)
+        for d, race_date in enumerate(dates):
+            row, next_row = d * _ROW_WIDTH, (d + 1) * _ROW_WIDTH
+            prefix[next_row:next_row + _ROW_WIDTH] = prefix[row:row + _ROW_WIDTH]
+            for venue_id, counts in days[race_date].items():
+                offset = next_row + venue_id * width
+                for m, value in enumerate(counts):
+                    prefix[offset + m] += value
+        self._dates = dates
+        self._prefix = prefix
+        self._built = True
+        logger.info(f"期間集計を作成: {len(dates)}日分 ({self.db_path})")
+
+    def _refresh_date(self, race_date: str) -> bool:
+        """1日分を差分更新（途中の日付が増えた場合は False を返し全体を作り直す）"""
+        counts = self._query_counts(race_date).get(race_date, {})
+        width = len(METRICS)
+        index = bisect_left(self._dates, race_date)
+        known = index < len(self._dates) and self._dates[index] == race_date
+
+        if not known:
+            if not counts:
+                return True
+            if index < len(self._dates):
+                return False
+            # 最新日の追加: 最終行の複製に当日分を加えた1行を足すだけ
+            last = len(self._dates) * _ROW_WIDTH
+            self._prefix.extend(self._prefix[last:last + _ROW_WIDTH])
+            self._dates.append(race_date)
+
+        # 当日分の変化量を以降の行に反映（当日が最新日なら1行のみ）
+        row, next_row = index * _ROW_WIDTH, (index + 1) * _ROW_WIDTH
+        delta = array('q', [0] * _ROW_WIDTH)
+        for venue_id in VENUE_IDS:
+            new = counts.get(venue_id, (0,) * width)
+            base = venue_id * width
+            for m in range(width):
+                old = self._prefix[next_row + base + m] - self._prefix[row + base + m]
+                delta[base + m] = new[m] - old
+        if any(delta):
+            for offset in range(next_row, len(self._prefix), _ROW_WIDTH):
+                for i, value in enumerate(delta):
+                    if value:
+                        self._prefix[offset + i] += value
+        return True
+
+    def _sync(self):
+        """未作成なら作成し、書き込みのあった日付（他プロセス分を含む）を反映"""
+        if not self._built:
+            self._dirty.clear()
+            self._rebuild()
+            return
+        self._check_external_writes()
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        if None in dirty:
+            self._rebuild()
+            return
+        for race_date in sorted(dirty):
+            if not self._refresh_date(race_date):
+                self._rebuild()
+                return
+
+    def available_range(self) -> Tuple[Optional[str], Optional[str]]:
+        """データのある最初と最後の日付"""
+        with self._lock:
+            self._sync()
+            if not self._dates:
+                return None, None
+            return self._dates[0], self._dates[-1]
+
+    def venue_counts(self, start_date: str, end_date: str,
+                     venue_ids: Optional[Iterable[int]] = None) -> Tuple[int, Dict[int, List[int]]]:
+        """期間内の日数と会場別の集計値（累積和の2行の差なので O(会場数)）"""
+        venues = [venue_id for venue_id in (venue_ids or VENUE_IDS) if venue_id in VENUE_IDS]
+        width = len(METRICS)
+        with self._lock:
+            self._sync()
+            start = bisect_left(self._dates, start_date)
+            end = bisect_right(self._dates, end_date)
+            if end <= start:
+                return 0, {}
+            high, low = end * _ROW_WIDTH, start * _ROW_WIDTH
+            result = {}
+            for venue_id in venues:
+                offset = venue_id * width
+                counts = [self._prefix[high + offset + m] - self._prefix[low + offset + m] for m in range(width)]
+                if counts[0]:
+                    result[venue_id] = counts
+            return end - start, result
+
+    def totals(self, start_date: str, end_date: str, venue_ids: Optional[Iterable[int]] = None) -> Tuple[int, List[int]]:
+        """期間内の日数と会場合計の集計値"""
+        days, counts = self.venue_counts(start_date, end_date, venue_ids)
+        totals = [0] * len(METRICS)
+        for venue in counts.values():
+            for m, value in enumerate(venue):
+                totals[m] += value
+        return days, totals
+
+
+# DBごとの期間集計
+_cubes: Dict[str, RangeCube] = {}
+_cubes_lock = threading.Lock()
+
+
+def get_range_cube(db_path: Optional[str] = None) -> RangeCube:
+    """DBごとに共通の期間集計を取得"""
+    db_path = db_path or _default_db_path()
+    key = os.path.abspath(db_path)
+    with _cubes_lock:
+        cube = _cubes.get(key)
+        if cube is None:
+            cube = _cubes[key] = RangeCube(db_path)
+        return cube
+
+
+class HistoricalDataAnalyzer:
+    """期間別の的中率・会場別成績レポート"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.cube = get_range_cube(db_path)
+
+    def generate_period_selector_data(self) -> Dict:
+        """期間選択用のデータ（データのある範囲とプリセット期間）"""
+        first_date, last_date = self.cube.available_range()
+        if first_date is None:
+            return {'available_range': {}, 'presets': []}
+
+        presets = []
+        for label, days in PERIOD_PRESETS:
+            start_date = first_date
+            if days is not None:
+                start = datetime.strptime(last_date, '%Y-%m-%d') - timedelta(days=days - 1)
+                start_date = max(first_date, start.strftime('%Y-%m-%d'))
+            presets.append({'label': label, 'start_date': start_date, 'end_date': last_date})
+
+        total_days, _ = self.cube.totals(first_date, last_date)
+        return {
+            'available_range': {'start_date': first_date, 'end_date': last_date, 'total_days': total_days},
+            'presets': presets
+        }
+
+    def get_accuracy_report_by_date_range(self, start_date: str, end_date: str,
+                                          venue_ids: Optional[Iterable[int]] = None) -> Dict:
+        """期間内の的中率サマリー"""
+        days, totals = self.cube.totals(start_date, end_date, venue_ids)
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': days,
+            'summary': _summary(totals)
+        }
+
+    def get_venue_performance_analysis(self, start_date: str, end_date: str,
+                                       venue_ids: Optional[Iterable[int]] = None) -> List[Dict]:
+        """期間内の会場別成績（単勝的中率の高い順）"""
+        _, counts = self.cube.venue_counts(start_date, end_date, venue_ids)
+        venues = [
+            dict(venue_id=venue_id, venue_name=VENUE_NAMES[venue_id], **_summary(venue_counts))
+            for venue_id, venue_counts in counts.items()
+        ]
+        venues.sort(key=lambda venue: (-venue['win_accuracy'], venue['venue_id']))
+        return venues
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+タイマースケジューラー
+優先度キュー（ヒープ）で次の実行時刻まで待機し、ジョブをワーカープールへ投入する。
+ジョブごとに同時実行数の上限とタイムアウトを持ち、実行時間などの統計を記録する
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    """パーセンタイル値（最近傍法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ScheduledJob:
+    """スケジュール済みジョブ"""
+
+    def __init__(self, name: str, func: Callable, interval: Optional[float] = None,
+                 daily_at: Optional[str] = None, run_at: Optional[datetime] = None,
+                 max_concurrency: int = 1, timeout: Optional[float] = None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.daily_at = daily_at
+        self.run_at = run_at
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self.next_run: Optional[datetime] = None
+        self.cancelled = False
+
+        # 実行統計（同名ジョブの再登録時はスケジューラーが保持する統計を引き継ぐ）
+        self.stats = {
+            'running': 0,
+            'runs': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'skipped': 0,
+            'last_started': None,
+            'last_duration': None,
+            'durations': deque(maxlen=100),
+            'lags': deque(maxlen=100)
+        }
+
+    def compute_next_run(self, now: datetime) -> Optional[datetime]:
+        """次回実行時刻を計算（単発ジョブは初回のみ）"""
+        if self.run_at is not None:
+            return self.run_at if self.next_run is None else None
+        if self.interval is not None:
+            return now + timedelta(seconds=self.interval)
+        if self.daily_at is not None:
+            hour, minute = (int(part) for part in self.daily_at.split(':'))
+            candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if candidate <= now:
+                candidate += timedelta(days=1)
+            return candidate
+        return None
+
+    def get_stats(self) -> Dict:
+        """ジョブ統計"""
+        stats = self.stats
+        durations = list(stats['durations'])
+        lags = list(stats['lags'])
+        return {
+            'name': self.name,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'running': stats['running'],
+            'max_concurrency': self.max_concurrency,
+            'timeout_seconds': self.timeout,
+            'runs': stats['runs'],
+            'failures': stats['failures'],
+            'timeouts': stats['timeouts'],
+            'skipped': stats['skipped'],
+            'last_started': stats['last_started'].isoformat() if stats['last_started'] else None,
+            'last_duration_ms': round(stats['last_duration'] * 1000, 1) if stats['last_duration'] is not None else None,
+            'duration_p50_ms': round(_percentile(durations, 50) * 1000, 1) if durations else None,
+            'duration_p95_ms': round(_percentile(durations, 95) * 1000, 1) if durations else None,
+            'avg_dispatch_lag_ms': round(sum(lags) / len(lags) * 1000, 1) if lags else None
+        }
+
+
+class TimerScheduler:
+    """ヒープベースのタイマースケジューラー"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.jobs: Dict[str, ScheduledJob] = {}
+        # ジョブ名ごとの統計（単発ジョブが実行後に jobs から外れても残す）
+        self._stats: Dict[str, Dict] = {}
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running_runs = {}  # 実行ID -> (job, 開始monotonic時刻, タイムアウト検出済み)
+        self._run_ids = itertools.count()
+        self._queued = 0
+        self.is_running = False
+
+    # ---- ジョブ登録 ----
+
+    def every(self, seconds: float, func: Callable, name: Optional[str] = None, **options) -> ScheduledJob:
+        """一定間隔で実行するジョブを登録"""
+        return self._add(ScheduledJob(name or func.__name__, func, interval=seconds, **options))
+
+    def daily(self, at: str, func: Callable, name: Optional[str] = None, **options) -> ScheduledJob:
+        """毎日指定時刻（HH:MM）に実行するジョブを登録"""
+        return self._add(ScheduledJob(name or func.__name__, func, daily_at=at, **options))
+
+    def once(self, when: datetime, func: Callable, name: Optional[str] = None, **options) -> ScheduledJob:
+        """指定時刻に1回だけ実行するジョブを登録（同名ジョブは置き換え）"""
+        return self._add(ScheduledJob(name or func.__name__, func, run_at=when, **options))
+
+    def cancel(self, name: str):
+        """ジョブを取り消し"""
+        with self._condition:
+            job = self.jobs.pop(name, None)
+            if job:
+                job.cancelled = True
+                self._condition.notify()
+
+    def clear(self):
+        """全ジョブを取り消し"""
+        with self._condition:
+            for job in self.jobs.values():
+                job.cancelled = True
+            self.jobs.clear()
+            self._heap.clear()
+            self._condition.notify()
+
+    def _add(self, job: ScheduledJob) -> ScheduledJob:
+        with self._condition:
+            previous = self.jobs.get(job.name)
+            if previous:
+                previous.cancelled = True
+            job.stats = self._stats.setdefault(job.name, job.stats)
+            self.jobs[job.name] = job
+            job.next_run = job.compute_next_run(datetime.now())
+            if job.next_run is not None:
+                heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+            self._condition.notify()
+        return job
+
+    # ---- 実行制御 ----
+
+    def start(self):
+        """ディスパッチスレッドを開始"""
+        with self._condition:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler-job')
+        self._thread = threading.Thread(target=self._dispatch_loop, name='scheduler-dispatch', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = False):
+        """ディスパッチを停止"""
+        with self._condition:
+            self.is_running = False
+            self._condition.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _dispatch_loop(self):
+        """次の実行時刻まで待機してジョブを投入"""
+        while True:
+            with self._condition:
+                if not self.is_running:
+                    return
+                now = datetime.now()
+                self._check_timeouts()
+
+                due_jobs = []
+                while self._heap and self._heap[0][0] <= now:
+                    scheduled_at, _, job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        continue
+                    due_jobs.append((job, scheduled_at))
+                    job.next_run = job.compute_next_run(now)
+                    if job.next_run is not None:
+                        heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+                    elif self.jobs.get(job.name) is job:
+                        del self.jobs[job.name]
+
+                for job, scheduled_at in due_jobs:
+                    self._submit(job, scheduled_at, now)
+
+                self._condition.wait(timeout=self._wait_seconds(datetime.now()))
+
+    def _wait_seconds(self, now: datetime) -> Optional[float]:
+        """次に起床すべきまでの秒数（次のジョブ・タイムアウト判定の早い方）"""
+        candidates = []
+        if self._heap:
+            candidates.append(max(0.0, (self._heap[0][0] - now).total_seconds()))
+        monotonic_now = time.monotonic()
+        for job, started, timed_out in self._running_runs.values():
+            if job.timeout and not timed_out:
+                candidates.append(max(0.0, started + job.timeout - monotonic_now))
+        return min(candidates) if candidates else None
+
+    def _submit(self, job: ScheduledJob, scheduled_at: datetime, now: datetime):
+        """同時実行数の上限を確認してワーカープールへ投入"""
+        if job.stats['running'] >= job.max_concurrency:
+            job.stats['skipped'] += 1
+            logger.warning(f"ジョブ実行スキップ（同時実行上限）: {job.name}")
+            return
+
+        job.stats['running'] += 1
+        self._queued += 1
+        run_id = next(self._run_ids)
+        lag = (now - scheduled_at).total_seconds()
+        self._executor.submit(self._run_job, job, run_id, lag)
+
+    def _run_job(self, job: ScheduledJob, run_id: int, lag: float):
+        """ワーカースレッドでジョブを実行し統計を記録"""
+        started = time.monotonic()
+        with self._condition:
+            self._queued -= 1
+            self._running_runs[run_id] = (job, started, False)
+            job.stats['last_started'] = datetime.now()
+            job.stats['lags'].append(lag)
+            self._condition.notify()
+
+        failed = False
+        try:
+            job.func()
+        except Exception as e:
+            failed = True
+            logger.error(f"ジョブ実行エラー {job.name}: {e}")
+        finally:
+            duration = time.monotonic() - started
+            with self._condition:
+                _, _, timed_out = self._running_runs.pop(run_id, (job, started, False))
+                stats = job.stats
+                if not timed_out:
+                    stats['running'] -= 1
+                stats['runs'] += 1
+                stats['failures'] += 1 if failed else 0
+                stats['last_duration'] = duration
+                stats['durations'].append(duration)
+            metrics = get_metrics()
+            metrics.observe('scheduler_job_seconds', duration, job=job.name)
+            if failed:
+                metrics.inc('scheduler_job_failures_total', job=job.name)
+
+    def _check_timeouts(self):
+        """タイムアウトしたジョブの同時実行枠を解放（スレッド自体は強制終了できない）"""
+        monotonic_now = time.monotonic()
+        for run_id, (job, started, timed_out) in list(self._running_runs.items()):
+            if job.timeout and not timed_out and monotonic_now - started > job.timeout:
+                self._running_runs[run_id] = (job, started, True)
+                job.stats['running'] -= 1
+                job.stats['timeouts'] += 1
+                logger.warning(f"ジョブタイムアウト: {job.name} ({job.timeout}秒超過)")
+
+    # ---- 状態 ----
+
+    def next_run(self) -> Optional[datetime]:
+        """次のジョブ実行時刻"""
+        with self._condition:
+            upcoming = [entry[0] for entry in self._heap if not entry[2].cancelled]
+            return min(upcoming) if upcoming else None
+
+    def get_status(self) -> Dict:
+        """キュー深さとジョブ統計"""
+        with self._condition:
+            next_run = self.next_run()
+            return {
+                'is_running': self.is_running,
+                'max_workers': self.max_workers,
+                'queue_depth': sum(1 for entry in self._heap if not entry[2].cancelled),
+                'waiting_for_worker': self._queued,
+                'running_jobs': len(self._running_runs),
+                'next_run': next_run.isoformat() if next_run else None,
+                'jobs': [job.get_stats() for job in self.jobs.values()]
+            }
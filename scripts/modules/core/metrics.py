@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+メトリクスレジストリ
+カウンター・ゲージ・直近ウィンドウのレイテンシ分布（p50/p95/p99）をプロセス内で集計する。
+記録はスレッドごとのシャードに書き込むためロック不要で、集計時にのみシャードを統合する。
+終了したスレッドのシャードは新しいシャードの作成時・集計時に退避先へ畳み込み、シャード数を生存スレッド数に抑える
+"""
+
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# 分布の保持設定
+WINDOW_SECONDS = 300
+SAMPLES_PER_SHARD = 2048
+
+# メトリクスの説明（Prometheus の HELP 行）
+METRIC_HELP = {
+    'http_request_seconds': 'エンドポイント別リクエスト処理時間',
+    'http_requests_total': 'エンドポイント別リクエスト数',
+    'upstream_fetch_seconds': '上流API取得時間',
+    'upstream_fetch_bytes_total': '上流API取得バイト数',
+    'upstream_fetch_errors_total': '上流API取得エラー数',
+    'cache_requests_total': 'キャッシュ別ヒット・ミス数',
+    'sqlite_query_seconds': 'SQLiteクエリ時間',
+    'scheduler_job_seconds': 'スケジューラージョブ実行時間',
+    'scheduler_job_failures_total': 'スケジューラージョブ失敗数'
+}
+
+
+def _key(name: str, labels: Dict) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Prometheus のラベル表記"""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Shard:
+    """スレッドごとの記録領域（所有スレッドのみが書き込む）"""
+
+    def __init__(self, thread: threading.Thread):
+        self.thread_ref = weakref.ref(thread)
+        self.counters: Dict[MetricKey, float] = {}
+        self.hist_count: Dict[MetricKey, int] = {}
+        self.hist_sum: Dict[MetricKey, float] = {}
+        self.samples: Dict[MetricKey, deque] = {}
+
+    def is_alive(self) -> bool:
+        thread = self.thread_ref()
+        return thread is not None and thread.is_alive()
+
+
+class MetricsRegistry:
+    """プロセス内メトリクスレジストリ"""
+
+    def __init__(self, window_seconds: int = WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.started_at = time.time()
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(threading.current_thread())  # 終了したスレッドの集計先
+        self._gauges: Dict[MetricKey, float] = {}
+        self._collectors: List[Callable[['MetricsRegistry'], None]] = []
+        self._lock = threading.Lock()
+
+    # ---- 記録 ----
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                # リクエストごとにスレッドが入れ替わっても集計なしで増え続けないよう、ここでも畳み込む
+                self._prune()
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _prune(self):
+        """終了したスレッドのシャードを退避先に畳み込む（ロック内で呼ぶ）"""
+        alive = []
+        for shard in self._shards:
+            if shard.is_alive():
+                alive.append(shard)
+            else:
+                self._fold(shard)
+        self._shards = alive
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """カウンターを加算"""
+        counters = self._shard().counters
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """ゲージを設定"""
+        self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """分布に値を記録"""
+        shard = self._shard()
+        key = _key(name, labels)
+        shard.hist_count[key] = shard.hist_count.get(key, 0) + 1
+        shard.hist_sum[key] = shard.hist_sum.get(key, 0.0) + value
+        samples = shard.samples.get(key)
+        if samples is None:
+            samples = shard.samples[key] = deque(maxlen=SAMPLES_PER_SHARD)
+        samples.append((time.monotonic(), value))
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """処理時間（秒）を分布に記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def cache_hit(self, cache: str, hit: bool):
+        """キャッシュのヒット・ミスを記録"""
+        self.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def register_collector(self, collector: Callable[['MetricsRegistry'], None]):
+        """集計直前に呼ばれるゲージ更新関数を登録"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    # ---- 集計 ----
+
+    def _merged(self):
+        """全シャードを統合（終了スレッドのシャードは退避先に畳み込む）"""
+        for collector in list(self._collectors):
+            try:
+                collector(self)
+            except Exception as e:
+                logger.warning(f"メトリクス収集エラー: {e}")
+
+        counters: Dict[MetricKey, float] = {}
+        hist_count: Dict[MetricKey, int] = {}
+        hist_sum: Dict[MetricKey, float] = {}
+        samples: Dict[MetricKey, List[float]] = {}
+        cutoff = time.monotonic() - self.window_seconds
+
+        def accumulate(shard):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, value in list(shard.hist_count.items()):
+                hist_count[key] = hist_count.get(key, 0) + value
+                hist_sum[key] = hist_sum.get(key, 0.0) + shard.hist_sum.get(key, 0.0)
+            for key, window in list(shard.samples.items()):
+                recent = [value for ts, value in list(window) if ts >= cutoff]
+                samples.setdefault(key, []).extend(recent)
+
+        with self._lock:
+            self._prune()
+            # 退避先は他スレッドのシャード作成時にも書き込まれるためロック内で読む
+            accumulate(self._retired)
+            shards = list(self._shards)
+
+        for shard in shards:
+            accumulate(shard)
+
+        return counters, dict(self._gauges), hist_count, hist_sum, samples
+
+    def _fold(self, shard: _Shard):
+        retired = self._retired
+        for key, value in shard.counters.items():
+            retired.counters[key] = retired.counters.get(key, 0) + value
+        for key, value in shard.hist_count.items():
+            retired.hist_count[key] = retired.hist_count.get(key, 0) + value
+            retired.hist_sum[key] = retired.hist_sum.get(key, 0.0) + shard.hist_sum.get(key, 0.0)
+        for key, window in shard.samples.items():
+            target = retired.samples.get(key)
+            if target is None:
+                target = retired.samples[key] = deque(maxlen=SAMPLES_PER_SHARD)
+            target.extend(window)
+
+    def snapshot(self) -> Dict:
+        """JSON形式の集計結果"""
+        counters, gauges, hist_count, hist_sum, samples = self._merged()
+
+        histograms = []
+        for key in sorted(hist_count):
+            name, labels = key
+            ordered = sorted(samples.get(key, []))
+            histograms.append({
+                'name': name,
+                'labels': dict(labels),
+                'count': hist_count[key],
+                'sum': round(hist_sum[key], 6),
+                'window_count': len(ordered),
+                'p50': _percentile(ordered, 50),
+                'p95': _percentile(ordered, 95),
+                'p99': _percentile(ordered, 99)
+            })
+
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'window_seconds': self.window_seconds,
+            'counters': [{'name': k[0], 'labels': dict(k[1]), 'value': v} for k, v in sorted(counters.items())],
+            'gauges': [{'name': k[0], 'labels': dict(k[1]), 'value': v} for k, v in sorted(gauges.items())],
+            'histograms': histograms
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus テキスト形式（分布は summary として出力）"""
+        counters, gauges, hist_count, hist_sum, samples = self._merged()
+        lines = []
+        emitted = set()
+
+        def header(name, metric_type):
+            if name in emitted:
+                return
+            emitted.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for key in sorted(hist_count):
+            name, labels = key
+            header(name, 'summary')
+            ordered = sorted(samples.get(key, []))
+            for quantile, percent in (('0.5', 50), ('0.95', 95), ('0.99', 99)):
+                value = _percentile(ordered, percent)
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels + (('quantile', quantile),))} {value}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist_sum[key]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist_count[key]}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """全メトリクスを破棄（テスト用）"""
+        with self._lock:
+            self._shards = []
+            self._retired = _Shard(threading.current_thread())
+            self._gauges = {}
+            self._local = threading.local()
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """プロセス共通のメトリクスレジストリを取得"""
+    return _metrics
+
+
+def init_request_metrics(app):
+    """Flaskアプリにエンドポイント別のリクエストメトリクスを登録"""
+    from flask import request
+
+    @app.before_request
+    def _start_request_timer():
+        request.environ['kyotei.request_start'] = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        start = request.environ.get('kyotei.request_start')
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            _metrics.observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            _metrics.inc('http_requests_total', endpoint=endpoint, status=f"{response.status_code // 100}xx")
+        return response
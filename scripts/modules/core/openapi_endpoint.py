@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+BoatraceOpenAPI の接続先
+programs/v2・results/v2 のURLを一か所で組み立てる。接続先は AppConfig の api.base_url
+（環境変数 BOATRACE_API_BASE_URL）で切り替えられ、ローカルの再生サーバー（openapi_replay）も指定できる
+"""
+
+import os
+from datetime import datetime
+from typing import Optional
+
+DEFAULT_BASE_URL = 'https://boatraceopenapi.github.io'
+
+# 起動時に設定された接続先（未設定なら環境変数・既定値）
+_base_url: Optional[str] = None
+
+
+def set_base_url(url: Optional[str]):
+    """接続先を設定（None で環境変数・既定値に戻す）"""
+    global _base_url
+    _base_url = url.rstrip('/') if url else None
+
+
+def get_base_url() -> str:
+    """現在の接続先"""
+    if _base_url:
+        return _base_url
+    return os.getenv('BOATRACE_API_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
+
+
+def programs_base_url() -> str:
+    return f"{get_base_url()}/programs/v2"
+
+
+def results_base_url() -> str:
+    return f"{get_base_url()}/results/v2"
+
+
+def _date_key(date: Optional[str]) -> str:
+    """'YYYY-MM-DD' を 'YYYYMMDD' に変換（None・今日は 'today'）"""
+    if not date or date == 'today' or date == datetime.now().strftime('%Y-%m-%d'):
+        return 'today'
+    return date.replace('-', '')
+
+
+def programs_url(date: Optional[str] = None) -> str:
+    """出走表のURL（日付なし・今日は today.json）"""
+    return f"{programs_base_url()}/{_date_key(date)}.json"
+
+
+def results_url(date: Optional[str] = None) -> str:
+    """結果のURL（日付なし・今日は today.json）"""
+    return f"{results_base_url()}/{_date_key(date)}.json"
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+BoatraceOpenAPI の記録・再生
+programs/v2・results/v2 の実レスポンスを日付単位のJSONファイルに記録し、ローカルのHTTPサーバーで再生する。
+遅延・ゆらぎ・エラー注入・ETag（If-None-Match で 304）に対応し、ベンチマークや負荷試験をオフラインで再現できる
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('programs', 'results')
+# /programs/v2/today.json, /results/v2/20250831.json
+_PATH_PATTERN = re.compile(r'^/(programs|results)/v2/(today|\d{8})\.json$')
+
+
+def _default_fixtures_dir() -> str:
+    # core -> modules -> scripts -> (project_root)
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    return os.path.join(project_root, 'data', 'openapi_fixtures')
+
+
+class ReplayStore:
+    """記録済みレスポンス（<directory>/<kind>/<YYYYMMDD>.json）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or _default_fixtures_dir()
+        self._bodies: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, date_key: str) -> str:
+        return os.path.join(self.directory, kind, f'{date_key}.json')
+
+    def record(self, kind: str, date: str, body: bytes) -> str:
+        """レスポンス本文を保存（date は YYYY-MM-DD または YYYYMMDD）"""
+        if kind not in KINDS:
+            raise ValueError(f"不明な種別: {kind}")
+        path = self._path(kind, date.replace('-', ''))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        with self._lock:
+            self._bodies.pop((kind, date.replace('-', '')), None)
+        logger.info(f"OpenAPIレスポンスを記録: {path} ({len(body)} bytes)")
+        return path
+
+    def import_cache_file(self, cache_path: str) -> Optional[str]:
+        """既存の取得キャッシュ（cache/boatrace_openapi_cache.json 形式）を出走表として取り込む"""
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+        date, data = cache.get('date'), cache.get('data')
+        if not date or not isinstance(data, dict):
+            logger.warning(f"取り込めないキャッシュ形式: {cache_path}")
+            return None
+        kind = 'results' if 'results' in data else 'programs'
+        return self.record(kind, date, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def dates(self, kind: str) -> List[str]:
+        """記録済みの日付（YYYYMMDD、昇順）"""
+        directory = os.path.join(self.directory, kind)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(directory) if re.match(r'^\d{8}\.json$', name))
+
+    def get(self, kind: str, date_key: str) -> Optional[Tuple[bytes, str]]:
+        """本文とETag（読み込んだ本文はメモリに保持）"""
+        key = (kind, date_key)
+        with self._lock:
+            cached = self._bodies.get(key)
+        if cached:
+            return cached
+        path = self._path(kind, date_key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            body = f.read()
+        entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        with self._lock:
+            self._bodies[key] = entry
+        return entry
+
+
+class ReplayConfig:
+    """再生時の遅延・エラー注入の設定"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, today: Optional[str] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.today = today.replace('-', '') if today else None  # today.json に使う日付（未指定なら最新の記録）
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        """今回の応答遅延（秒）"""
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """記録済みレスポンスを返すハンドラー（server.store / server.config を使用）"""
+
+    server_version = 'KyoteiOpenAPIReplay/1.0'
+
+    def do_GET(self):
+        store, config, stats = self.server.store, self.server.config, self.server.stats
+        with self.server.stats_lock:
+            stats['requests'] += 1
+
+        delay = config.delay()
+        if delay:
+            time.sleep(delay)
+
+        match = _PATH_PATTERN.match(self.path.split('?', 1)[0])
+        if not match:
+            self._send(404, b'{"error": "not found"}', 'not_found')
+            return
+        if config.should_fail():
+            self._send(config.error_status, b'{"error": "injected"}', 'errors')
+            return
+
+        kind, date_key = match.groups()
+        if date_key == 'today':
+            recorded = store.dates(kind)
+            date_key = config.today or (recorded[-1] if recorded else '')
+        entry = store.get(kind, date_key)
+        if entry is None:
+            self._send(404, b'{"error": "not recorded"}', 'not_found')
+            return
+
+        body, etag = entry
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', 'not_modified', etag)
+            return
+        self._send(200, body, 'ok', etag)
+
+    def _send(self, status: int, body: bytes, counter: str, etag: Optional[str] = None):
+        with self.server.stats_lock:
+            self.server.stats[counter] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"OpenAPI再生: {self.address_string()} {format % args}")
+
+
+def create_replay_server(store: ReplayStore, config: Optional[ReplayConfig] = None,
+                         host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """再生サーバーを作成（port=0 なら空いているポート、server.base_url が接続先）"""
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.store = store
+    server.config = config or ReplayConfig()
+    server.stats = {'requests': 0, 'ok': 0, 'not_modified': 0, 'errors': 0, 'not_found': 0}
+    server.stats_lock = threading.Lock()
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+
+def start_replay_server(store: ReplayStore, config: Optional[ReplayConfig] = None,
+                        host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """再生サーバーをバックグラウンドスレッドで起動（停止は server.shutdown()）"""
+    server = create_replay_server(store, config, host, port)
+    thread = threading.Thread(target=server.serve_forever, name='openapi-replay', daemon=True)
+    thread.start()
+    logger.info(f"OpenAPI再生サーバー起動: {server.base_url}")
+    return server
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SQLiteクエリプロファイラー
+接続・カーソルをラップして全ステートメントの実行時間を計測し、しきい値を超えたものを
+正規化SQLとパラメータ型付きでログ出力する。初めて遅延を検出したステートメントは
+EXPLAIN QUERY PLAN を取得し、ステートメント別の集計を管理画面に提供する
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .request_tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """SQLを正規化（空白の統一・リテラルのプレースホルダー化・IN句の集約）"""
+    normalized = _WHITESPACE.sub(' ', sql).strip()
+    normalized = _STRING_LITERAL.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    return normalized
+
+
+def param_shape(params) -> Optional[object]:
+    """バインドパラメータの型のみを記録（値はログに残さない）"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    try:
+        return [type(value).__name__ for value in params]
+    except TypeError:
+        return type(params).__name__
+
+
+class QueryStatsRegistry:
+    """ステートメント別の実行統計"""
+
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS, max_statements: int = 500):
+        self.slow_query_ms = slow_query_ms
+        self.max_statements = max_statements
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, normalized: str, duration_ms: float, params) -> bool:
+        """実行時間を記録し、初めて遅延した場合はTrueを返す（実行計画の取得契機）"""
+        is_slow = duration_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._stats.get(normalized)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    return False
+                stats = self._stats[normalized] = {
+                    'sql': normalized,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'slow_count': 0,
+                    'last_slow_at': None,
+                    'param_shape': None,
+                    'query_plan': None
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            if not is_slow:
+                return False
+            first_slow = stats['slow_count'] == 0
+            stats['slow_count'] += 1
+            stats['last_slow_at'] = datetime.now().isoformat()
+            stats['param_shape'] = param_shape(params)
+        return first_slow
+
+    def set_query_plan(self, normalized: str, plan: List[str]):
+        with self._lock:
+            if normalized in self._stats:
+                self._stats[normalized]['query_plan'] = plan
+
+    def get_stats(self, sort_by: str = 'total_ms', limit: Optional[int] = None, slow_only: bool = False) -> List[Dict]:
+        """集計結果（平均時間付き）"""
+        with self._lock:
+            rows = [dict(stats) for stats in self._stats.values()]
+        if slow_only:
+            rows = [row for row in rows if row['slow_count']]
+        for row in rows:
+            row['avg_ms'] = round(row['total_ms'] / row['count'], 3) if row['count'] else 0.0
+            row['total_ms'] = round(row['total_ms'], 3)
+            row['max_ms'] = round(row['max_ms'], 3)
+        rows.sort(key=lambda row: row.get(sort_by) or 0, reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _default_threshold() -> float:
+    try:
+        return float(os.getenv('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+    except ValueError:
+        return DEFAULT_SLOW_QUERY_MS
+
+
+_query_stats = QueryStatsRegistry(_default_threshold())
+
+
+def get_query_stats() -> QueryStatsRegistry:
+    """プロセス共通のクエリ統計を取得"""
+    return _query_stats
+
+
+def _explain(connection: sqlite3.Connection, sql: str, params) -> List[str]:
+    """EXPLAIN QUERY PLAN を取得（計測対象外のカーソルで実行）"""
+    cursor = sqlite3.Cursor(connection)
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params if params is not None else ())
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """実行時間を計測するカーソル"""
+
+    def _timed(self, method, sql, params, many=False):
+        normalized = normalize_sql(sql)
+        start = time.perf_counter()
+        try:
+            with span('sql', 'db', normalized[:200]):
+                if params is None:
+                    return method(sql)
+                return method(sql, params)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            stats = _query_stats
+            bound = None if many else params
+            first_slow = stats.record(normalized, duration_ms, bound)
+            if duration_ms >= stats.slow_query_ms:
+                logger.warning(f"遅いSQL ({duration_ms:.1f}ms): {normalized} params={param_shape(bound)}")
+            if first_slow and not many and normalized.split(' ', 1)[0].upper() in ('SELECT', 'WITH'):
+                try:
+                    plan = _explain(self.connection, sql, params)
+                    stats.set_query_plan(normalized, plan)
+                    logger.warning(f"実行計画: {' / '.join(plan)}")
+                except sqlite3.Error as e:
+                    logger.debug(f"実行計画取得失敗: {e}")
+
+    def execute(self, sql, parameters=None):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters, many=True)
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """ProfilingCursor を返す接続"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    # Connection.execute 系は内部で素のカーソルを生成するため明示的に委譲する
+    def execute(self, sql, parameters=None):
+        cursor = self.cursor()
+        return cursor.execute(sql) if parameters is None else cursor.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, **kwargs) -> sqlite3.Connection:
+    """計測付きのSQLite接続（sqlite3.connect と同じ引数）"""
+    kwargs.setdefault('factory', ProfilingConnection)
+    return sqlite3.connect(database, **kwargs)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+レース一覧の組み立て
+当日の出走表に予想・結果・終了判定を付けて /api/races の応答を作る。
+Flask版（APIRoutes）とASGI版（asgi_api）で共通。SQLiteを読むため、非同期側ではスレッドプールから呼ぶ
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .date_view import get_date_view
+from .race_model import get_races
+from .race_timeline import get_race_timeline
+
+logger = logging.getLogger(__name__)
+
+
+def _load_saved_rows(db_path: str, race_date: str):
+    """日付ビューから保存済みの予想・結果を1回のクエリで取得"""
+    prediction_data = {}
+    result_data = {}
+    for row in get_date_view(db_path, race_date, include_unpredicted=True):
+        key = f"{row.venue_id}_{row.race_number}"
+
+        if row.has_prediction:
+            predicted_place = row.predicted_place or [row.predicted_win]
+            prediction_data[key] = {
+                'predicted_win': row.predicted_win,
+                'predicted_place': predicted_place,
+                'confidence': row.confidence or 0.5
+            }
+
+        if row.has_result:
+            result_data[key] = {
+                'winning_boat': row.winning_boat,
+                'place_results': row.place_results
+            }
+    return prediction_data, result_data
+
+
+def build_race_list(programs: List[Dict], accuracy_tracker_class, current_time: Optional[datetime] = None) -> Dict:
+    """出走表からレース一覧の応答を作成"""
+    from api_fetcher import normalize_prediction_data
+
+    races = []
+    current_time = current_time or datetime.now()
+    race_date = current_time.strftime('%Y-%m-%d')
+
+    # データベースから予想データと結果データを取得
+    prediction_data = {}
+    result_data = {}
+    try:
+        tracker = accuracy_tracker_class()
+        prediction_data, result_data = _load_saved_rows(tracker.db_path, race_date)
+    except Exception as e:
+        logger.warning(f"予想・結果データ取得エラー: {e}")
+
+    # 締切時刻はスナップショット単位で一度だけ解析
+    timeline = get_race_timeline(programs)
+
+    # レース単位のログは件数のみ集計し、完了時に1行で出力
+    log_counts = {'results': 0, 'missing_results': 0, 'predictions': 0, 'prediction_failures': 0}
+
+    # プログラムはスナップショット単位で一度だけ解析
+    for race in get_races(programs):
+        venue_name = race.venue_name
+        start_time = race.closed_at_text or '未定'
+        venue_id = race.venue_id
+        race_number = race.race_number
+        race_key = f"{venue_id}_{race_number}"
+
+        # レース状態を判定
+        is_finished = timeline.is_finished(venue_id, race_number, current_time)
+
+        # 予想データと結果データを追加（結果は終了判定に関係なく常に確認）
+        old_prediction = prediction_data.get(race_key)
+        result = result_data.get(race_key)
+
+        if result:
+            log_counts['results'] += 1
+            logger.debug(f"結果データ確認: {venue_name} {race_number}R -> 勝利={result['winning_boat']}, 複勝={result.get('place_results', [])}")
+        elif is_finished:
+            log_counts['missing_results'] += 1
+            logger.warning(f"結果データ未取得: {venue_name} {race_number}R (終了済み {start_time})",
+                           extra={'sample_key': 'api_races.missing_result'})
+
+        # 常に実際のレーサーデータを使用した予想システムを使用
+        prediction = None
+        try:
+            tracker = accuracy_tracker_class()
+            prediction_result = tracker._generate_real_prediction(venue_id, race_number, race_date=race_date)
+
+            if prediction_result:
+                log_counts['predictions'] += 1
+                logger.debug(f"実際レーサーデータ予想成功 {venue_name} {race_number}R: 推奨={prediction_result.get('recommended_win')}")
+                prediction = normalize_prediction_data(prediction_result)
+            else:
+                log_counts['prediction_failures'] += 1
+                logger.warning(f"実際レーサーデータ予想失敗 {venue_name} {race_number}R",
+                               extra={'sample_key': 'api_races.prediction_failure'})
+                # フォールバック：古い予想データを使用
+                if old_prediction:
+                    logger.debug(f"フォールバック: データベース予想使用 {venue_name} {race_number}R")
+                    prediction = normalize_prediction_data(old_prediction)
+
+        except Exception as e:
+            logger.error(f"実際レーサーデータ予想システムエラー {venue_name} {race_number}R: {e}")
+            # フォールバック：古い予想データを使用
+            if old_prediction:
+                logger.debug(f"エラーフォールバック: データベース予想使用 {venue_name} {race_number}R")
+                prediction = normalize_prediction_data(old_prediction)
+
+        races.append({
+            'venue_id': venue_id,
+            'venue_name': venue_name,
+            'race_number': race_number,
+            'start_time': start_time,
+            'race_title': race.title,
+            'race_id': race.race_id,
+            'is_finished': is_finished,
+            'prediction': prediction,
+            'result': result
+        })
+
+    # ソート: 未終了レースを時刻順で先に、終了レースを後に
+    races.sort(key=lambda race: timeline.sort_key(
+        race['venue_id'], race['race_number'], race['is_finished'], current_time))
+
+    logger.info(f"レース一覧作成: {len(races)}件のレース "
+                f"(結果あり={log_counts['results']}, 結果未取得={log_counts['missing_results']}, "
+                f"予想成功={log_counts['predictions']}, 予想失敗={log_counts['prediction_failures']})")
+
+    return {
+        'success': True,
+        'races': races,
+        'total_races': len(races),
+        'timestamp': current_time.isoformat()
+    }
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+レースモデル
+BoatraceOpenAPI のプログラムデータを一度だけ解析し、型付きの軽量オブジェクト（__slots__）に変換する。
+フィールド名の揺れ（racer_boat_number / boat_number、racer_national_top_1_percent / win_rate など）は
+ここで吸収し、各モジュールは属性を直接参照する
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import get_metrics
+from .race_timeline import parse_race_time
+
+logger = logging.getLogger(__name__)
+
+# 会場名（インデックス = 会場番号）
+VENUE_NAMES = (
+    '不明',
+    '桐生', '戸田', '江戸川', '平和島', '多摩川', '浜名湖',
+    '蒲郡', '常滑', '津', '三国', 'びわこ', '住之江',
+    '尼崎', '鳴門', '丸亀', '児島', '宮島', '徳山',
+    '下関', '若松', '芦屋', '福岡', '唐津', '大村'
+)
+
+# 級別（racer_class_number）
+RACER_CLASSES = {1: 'A1', 2: 'A2', 3: 'B1', 4: 'B2'}
+_CLASS_NUMBERS = {name: number for number, name in RACER_CLASSES.items()}
+
+
+def venue_name(venue_id: Optional[int]) -> str:
+    """会場番号から会場名を取得"""
+    if isinstance(venue_id, int) and 0 < venue_id < len(VENUE_NAMES):
+        return VENUE_NAMES[venue_id]
+    return '不明'
+
+
+def _int(value, default: Optional[int] = None) -> Optional[int]:
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(value, default: Optional[float] = None) -> Optional[float]:
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _first(data: Dict, *keys):
+    """最初に値のあるキーの値（旧形式のキー名に対応）"""
+    for key in keys:
+        value = data.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+class Entrant:
+    """出走艇（1艇分）"""
+
+    __slots__ = (
+        'boat_number', 'racer_number', 'name', 'class_number', 'branch_number',
+        'age', 'weight', 'flying_count', 'late_count', 'average_st',
+        'national_win_rate', 'national_top2_rate', 'national_top3_rate',
+        'local_win_rate', 'local_top2_rate', 'local_top3_rate',
+        'motor_number', 'motor_top2_rate', 'motor_top3_rate',
+        'assigned_boat_number', 'boat_top2_rate', 'boat_top3_rate'
+    )
+
+    def __init__(self, boat_number: int, racer_number: Optional[int] = None, name: str = '不明', **fields):
+        self.boat_number = boat_number
+        self.racer_number = racer_number
+        self.name = name
+        for slot in self.__slots__[3:]:
+            setattr(self, slot, fields.get(slot))
+
+    @classmethod
+    def from_program(cls, boat: Dict, default_boat_number: int = 0) -> 'Entrant':
+        """プログラムの boats 要素から生成"""
+        class_number = _int(boat.get('racer_class_number'))
+        if class_number is None:
+            class_number = _CLASS_NUMBERS.get(boat.get('racer_rank'))
+        return cls(
+            boat_number=_int(_first(boat, 'racer_boat_number', 'boat_number'), default_boat_number),
+            racer_number=_int(boat.get('racer_number')),
+            name=_first(boat, 'racer_name', 'name') or '不明',
+            class_number=class_number,
+            branch_number=_int(boat.get('racer_branch_number')),
+            age=_int(boat.get('racer_age')),
+            weight=_float(boat.get('racer_weight')),
+            flying_count=_int(boat.get('racer_flying_count'), 0),
+            late_count=_int(boat.get('racer_late_count'), 0),
+            average_st=_float(_first(boat, 'racer_average_start_timing', 'average_st')),
+            national_win_rate=_float(_first(boat, 'racer_national_top_1_percent', 'win_rate')),
+            national_top2_rate=_float(boat.get('racer_national_top_2_percent')),
+            national_top3_rate=_float(boat.get('racer_national_top_3_percent')),
+            local_win_rate=_float(_first(boat, 'racer_local_top_1_percent', 'local_win_rate')),
+            local_top2_rate=_float(boat.get('racer_local_top_2_percent')),
+            local_top3_rate=_float(boat.get('racer_local_top_3_percent')),
+            motor_number=_int(_first(boat, 'racer_assigned_motor_number', 'motor_number')),
+            motor_top2_rate=_float(_first(boat, 'racer_assigned_motor_top_2_percent', 'motor_2_rate')),
+            motor_top3_rate=_float(boat.get('racer_assigned_motor_top_3_percent')),
+            assigned_boat_number=_int(boat.get('racer_assigned_boat_number')),
+            boat_top2_rate=_float(_first(boat, 'racer_assigned_boat_top_2_percent', 'boat_2_rate')),
+            boat_top3_rate=_float(boat.get('racer_assigned_boat_top_3_percent'))
+        )
+
+    @property
+    def racer_class(self) -> Optional[str]:
+        return RACER_CLASSES.get(self.class_number)
+
+    def to_dict(self) -> Dict:
+        """APIレスポンス用（BoatraceOpenAPI と同じキー名）"""
+        return {
+            'racer_boat_number': self.boat_number,
+            'racer_name': self.name,
+            'racer_number': self.racer_number,
+            'racer_class_number': self.class_number,
+            'racer_branch_number': self.branch_number,
+            'racer_age': self.age,
+            'racer_weight': self.weight,
+            'racer_flying_count': self.flying_count,
+            'racer_late_count': self.late_count,
+            'racer_average_start_timing': self.average_st,
+            'racer_national_top_1_percent': self.national_win_rate,
+            'racer_national_top_2_percent': self.national_top2_rate,
+            'racer_national_top_3_percent': self.national_top3_rate,
+            'racer_local_top_1_percent': self.local_win_rate,
+            'racer_local_top_2_percent': self.local_top2_rate,
+            'racer_local_top_3_percent': self.local_top3_rate,
+            'racer_assigned_motor_number': self.motor_number,
+            'racer_assigned_motor_top_2_percent': self.motor_top2_rate,
+            'racer_assigned_motor_top_3_percent': self.motor_top3_rate,
+            'racer_assigned_boat_number': self.assigned_boat_number,
+            'racer_assigned_boat_top_2_percent': self.boat_top2_rate,
+            'racer_assigned_boat_top_3_percent': self.boat_top3_rate
+        }
+
+
+class Race:
+    """1レース分の出走表"""
+
+    __slots__ = ('race_date', 'venue_id', 'race_number', 'closed_at', 'closed_at_text',
+                 'grade_number', 'title', 'subtitle', 'distance', 'entrants')
+
+    def __init__(self, venue_id: int, race_number: int, entrants: Tuple[Entrant, ...] = (),
+                 race_date: Optional[str] = None, closed_at_text: Optional[str] = None,
+                 grade_number: Optional[int] = None, title: str = '', subtitle: str = '',
+                 distance: Optional[int] = None):
+        self.venue_id = venue_id
+        self.race_number = race_number
+        self.entrants = entrants
+        self.race_date = race_date
+        self.closed_at_text = closed_at_text
+        self.closed_at: Optional[datetime] = parse_race_time(closed_at_text)
+        self.grade_number = grade_number
+        self.title = title
+        self.subtitle = subtitle
+        self.distance = distance
+
+    @classmethod
+    def from_program(cls, program: Dict) -> 'Race':
+        """プログラム（today.json の programs 要素）から生成"""
+        boats = program.get('boats') or program.get('racers') or []
+        entrants = tuple(
+            Entrant.from_program(boat, index + 1)
+            for index, boat in enumerate(boats) if isinstance(boat, dict)
+        )
+        return cls(
+            venue_id=_int(_first(program, 'race_stadium_number', 'venue_id'), 0),
+            race_number=_int(program.get('race_number'), 0),
+            entrants=entrants,
+            race_date=program.get('race_date'),
+            closed_at_text=_first(program, 'race_closed_at', 'start_time'),
+            grade_number=_int(program.get('race_grade_number')),
+            title=program.get('race_title') or '',
+            subtitle=program.get('race_subtitle') or '',
+            distance=_int(program.get('race_distance'))
+        )
+
+    @property
+    def venue_name(self) -> str:
+        return venue_name(self.venue_id)
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.venue_id, self.race_number
+
+    @property
+    def race_id(self) -> str:
+        return f"{self.venue_id:02d}_{self.race_number:02d}"
+
+    def entrant(self, boat_number: int) -> Optional[Entrant]:
+        for entrant in self.entrants:
+            if entrant.boat_number == boat_number:
+                return entrant
+        return None
+
+    def racer_numbers(self) -> List[int]:
+        return [entrant.racer_number for entrant in self.entrants if entrant.racer_number]
+
+    def to_dict(self) -> Dict:
+        """APIレスポンス用（BoatraceOpenAPI と同じキー名）"""
+        return {
+            'race_date': self.race_date,
+            'race_stadium_number': self.venue_id,
+            'race_number': self.race_number,
+            'race_closed_at': self.closed_at_text,
+            'race_grade_number': self.grade_number,
+            'race_title': self.title,
+            'race_subtitle': self.subtitle,
+            'race_distance': self.distance,
+            'boats': [entrant.to_dict() for entrant in self.entrants]
+        }
+
+
+def as_race(race) -> Optional[Race]:
+    """Race はそのまま、プログラム辞書は解析して返す"""
+    if isinstance(race, Race):
+        return race
+    if isinstance(race, dict):
+        return Race.from_program(race)
+    return None
+
+
+def parse_programs(programs: List[Dict]) -> List[Race]:
+    """プログラム一覧を解析（不正な要素は除外）"""
+    races = []
+    for program in programs or []:
+        if not isinstance(program, dict):
+            continue
+        try:
+            races.append(Race.from_program(program))
+        except Exception as e:
+            logger.warning(f"プログラム解析エラー: {e}")
+    return races
+
+
+# スナップショット単位の解析結果キャッシュ
+_races_cache = {'fingerprint': None, 'races': None}
+_races_lock = threading.Lock()
+
+
+def _programs_fingerprint(programs: List[Dict]) -> Tuple:
+    """プログラムスナップショットの内容（レース・出走艇の全項目。再取得で選手・モーター・勝率が
+    変わっていれば一致しない。キーの並びが変わった場合も再解析するだけで誤りにはならない）"""
+    return tuple(
+        (tuple(item for item in program.items() if item[0] != 'boats'),
+         tuple(tuple(boat.items()) for boat in program.get('boats') or () if isinstance(boat, dict)))
+        for program in programs or [] if isinstance(program, dict)
+    )
+
+
+def get_races(programs: List[Dict]) -> List[Race]:
+    """プログラムスナップショットに対応する解析済みレース一覧（同一内容なら再解析しない）"""
+    fingerprint = _programs_fingerprint(programs)
+    with _races_lock:
+        if _races_cache['fingerprint'] == fingerprint and _races_cache['races'] is not None:
+            get_metrics().cache_hit('race_model', True)
+            return _races_cache['races']
+
+    get_metrics().cache_hit('race_model', False)
+    races = parse_programs(programs)
+    with _races_lock:
+        _races_cache['fingerprint'] = fingerprint
+        _races_cache['races'] = races
+    logger.debug(f"プログラム解析: {len(races)}レース")
+    return races
+
+
+def clear_races_cache():
+    """解析済みレースのキャッシュをクリア"""
+    with _races_lock:
+        _races_cache['fingerprint'] = None
+        _races_cache['races'] = None
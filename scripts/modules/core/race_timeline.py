@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+レースタイムライン
+プログラムスナップショット単位で締切時刻を一度だけ解析し、
+ソート済み配列とbisectで「次のレース」「終了済みレース」を高速に判定する
+"""
+
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 締切時刻のフォーマット（BoatraceOpenAPI race_closed_at）
+RACE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 締切から終了とみなすまでの時間
+FINISH_GRACE_MINUTES = 15
+
+# 未定・不明を表す値
+UNDETERMINED_TIMES = ('未定', '不明', '')
+
+RaceKey = Tuple[int, int]
+
+
+@lru_cache(maxsize=4096)
+def parse_race_time(time_str: Optional[str]) -> Optional[datetime]:
+    """締切時刻文字列を解析（結果をメモ化）"""
+    if not time_str or time_str in UNDETERMINED_TIMES:
+        return None
+    try:
+        return datetime.strptime(time_str, RACE_TIME_FORMAT)
+    except (ValueError, TypeError):
+        return None
+
+
+class RaceTimeline:
+    """締切時刻順に並べたレースの索引"""
+
+    def __init__(self, programs: List[Dict], finish_grace_minutes: int = FINISH_GRACE_MINUTES):
+        self.finish_grace = timedelta(minutes=finish_grace_minutes)
+        self.closed_at: Dict[RaceKey, Optional[datetime]] = {}
+        self.undetermined: List[RaceKey] = []
+
+        entries = []
+        for program in programs or []:
+            try:
+                key = (program['race_stadium_number'], program['race_number'])
+            except (KeyError, TypeError):
+                continue
+            race_time = parse_race_time(program.get('race_closed_at'))
+            self.closed_at[key] = race_time
+            if race_time is None:
+                self.undetermined.append(key)
+            else:
+                entries.append((race_time, key))
+
+        entries.sort()
+        # bisect用の締切時刻配列と、同じ順序のレースキー配列
+        self.close_times: List[datetime] = [entry[0] for entry in entries]
+        self.keys: List[RaceKey] = [entry[1] for entry in entries]
+
+    def __len__(self) -> int:
+        return len(self.closed_at)
+
+    def get_closed_at(self, venue_id: int, race_number: int) -> Optional[datetime]:
+        """レースの締切時刻を取得"""
+        return self.closed_at.get((venue_id, race_number))
+
+    def is_finished(self, venue_id: int, race_number: int, current_time: datetime) -> bool:
+        """レース終了判定（締切から15分経過で終了とみなす）"""
+        race_time = self.closed_at.get((venue_id, race_number))
+        if race_time is None:
+            return False
+        return current_time > race_time + self.finish_grace
+
+    def finished_count(self, current_time: datetime) -> int:
+        """時刻tまでに終了したレース数"""
+        return bisect.bisect_left(self.close_times, current_time - self.finish_grace)
+
+    def finished_keys(self, current_time: datetime) -> Set[RaceKey]:
+        """時刻tまでに終了したレースのキー集合"""
+        return set(self.keys[:self.finished_count(current_time)])
+
+    def live_keys(self, current_time: datetime) -> List[RaceKey]:
+        """締切済みだが終了前（進行中）のレースキー"""
+        start = self.finished_count(current_time)
+        end = bisect.bisect_left(self.close_times, current_time)
+        return self.keys[start:end]
+
+    def upcoming_keys(self, current_time: datetime) -> List[RaceKey]:
+        """締切前のレースキー（締切時刻順）"""
+        return self.keys[bisect.bisect_left(self.close_times, current_time):]
+
+    def next_race(self, current_time: datetime) -> Optional[Tuple[datetime, RaceKey]]:
+        """時刻t以降で最初に締切を迎えるレース"""
+        index = bisect.bisect_left(self.close_times, current_time)
+        if index >= len(self.close_times):
+            return None
+        return self.close_times[index], self.keys[index]
+
+    def sort_key(self, venue_id: int, race_number: int, is_finished: bool,
+                 current_time: datetime) -> Tuple[int, int, int]:
+        """レース一覧用ソートキー（未終了を時刻順で先、終了済みを後）"""
+        race_time = self.closed_at.get((venue_id, race_number))
+        return race_sort_key(race_time, venue_id, is_finished, current_time)
+
+
+def race_sort_key(race_time: Optional[datetime], venue_id: int, is_finished: bool,
+                  current_time: datetime) -> Tuple[int, int, int]:
+    """解析済み時刻からソートキーを計算"""
+    if race_time is None:
+        return (3, 9999, venue_id)  # 未定レースは最後
+
+    time_minutes = race_time.hour * 60 + race_time.minute
+    if is_finished:
+        # 2時間以上経過した終了レースは最下位
+        elapsed_minutes = (current_time - race_time).total_seconds() / 60
+        return (4 if elapsed_minutes > 120 else 2, time_minutes, venue_id)
+    # 未来のレースは最上位、進行中はその次
+    return (0 if current_time < race_time else 1, time_minutes, venue_id)
+
+
+# スナップショット単位のタイムラインキャッシュ
+_timeline_cache = {'fingerprint': None, 'timeline': None}
+_timeline_lock = threading.Lock()
+
+
+def _programs_fingerprint(programs: List[Dict]) -> Tuple:
+    """プログラムスナップショットの識別子（締切時刻の文字列比較のみ）"""
+    return tuple(
+        (program.get('race_stadium_number'), program.get('race_number'), program.get('race_closed_at'))
+        for program in programs or []
+    )
+
+
+def get_race_timeline(programs: List[Dict]) -> RaceTimeline:
+    """プログラムスナップショットに対応するタイムラインを取得（同一内容なら再構築しない）"""
+    fingerprint = _programs_fingerprint(programs)
+    with _timeline_lock:
+        if _timeline_cache['fingerprint'] == fingerprint and _timeline_cache['timeline'] is not None:
+            get_metrics().cache_hit('race_timeline', True)
+            return _timeline_cache['timeline']
+
+    get_metrics().cache_hit('race_timeline', False)
+    timeline = RaceTimeline(programs)
+    with _timeline_lock:
+        _timeline_cache['fingerprint'] = fingerprint
+        _timeline_cache['timeline'] = timeline
+    logger.debug(f"レースタイムライン構築: {len(timeline)}レース")
+    return timeline
+
+
+def clear_race_timeline_cache():
+    """タイムラインキャッシュをクリア"""
+    with _timeline_lock:
+        _timeline_cache['fingerprint'] = None
+        _timeline_cache['timeline'] = None
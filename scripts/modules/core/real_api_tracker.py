@@ -6,11 +6,15 @@
 
 import requests
 import json
-import sqlite3
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from .openapi_endpoint import get_base_url
+from .query_profiler import connect as sqlite_connect
+from .date_view import bump_data_version, get_date_view
+from .typed_schema import ensure_typed_schema, positions_list, prediction_columns, save_entrants
+
 logger = logging.getLogger(__name__)
 
 class RealAPITracker:
@@ -18,7 +22,7 @@ class RealAPITracker:
     
     def __init__(self):
         self.db_path = 'cache/accuracy_tracker.db'
-        self.api_base_url = 'https://boatraceopenapi.github.io'
+        self.api_base_url = get_base_url()
         self.venue_mapping = self._get_venue_mapping()  # 属性として追加
         self._ensure_database()
     
@@ -34,7 +38,7 @@ class RealAPITracker:
     def _ensure_database(self):
         """データベースの初期化"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # 予想データテーブル
@@ -68,6 +72,9 @@ class RealAPITracker:
                 ''')
                 
                 conn.commit()
+            
+            # 予想順位・着順の型付きカラム（既存行は初回のみ移行）
+            ensure_typed_schema(self.db_path)
                 
         except Exception as e:
             logger.error(f"データベース初期化エラー: {e}")
@@ -99,22 +106,19 @@ class RealAPITracker:
         
         try:
             # データベースから結果を確認
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT venue_id, race_number, race_date, winning_boat, 
-                           place_results, venue_name
+                           second_boat, third_boat, venue_name
                     FROM race_results
                     WHERE venue_id = ? AND race_number = ? AND race_date = ?
                 ''', (venue_id, race_number, date))
                 
                 row = cursor.fetchone()
                 if row:
-                    venue_id, race_number, race_date, winning_boat, place_results, venue_name = row
-                    try:
-                        place_list = json.loads(place_results) if place_results else []
-                    except:
-                        place_list = []
+                    venue_id, race_number, race_date, winning_boat, second_boat, third_boat, venue_name = row
+                    place_list = positions_list(winning_boat, second_boat, third_boat)
                     
                     return {
                         'venue_id': venue_id,
@@ -160,128 +164,95 @@ class RealAPITracker:
         logger.info(f"的中率計算（DB使用）: {date}")
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # 指定日の予想データを取得
-                cursor.execute('''
-                    SELECT p.id, p.race_date, p.venue_id, p.venue_name, p.race_number,
-                           p.predicted_win, p.predicted_place, p.confidence, p.prediction_data,
-                           r.actual_results, r.is_hit, r.is_place_hit, r.is_trifecta_hit
-                    FROM predictions p
-                    LEFT JOIN results r ON p.venue_id = r.venue_id 
-                                       AND p.race_number = r.race_number 
-                                       AND p.race_date = r.date_str
-                    WHERE p.race_date = ?
-                    ORDER BY p.venue_id, p.race_number
-                ''', (date,))
-                
-                prediction_data = cursor.fetchall()
-                
-                if not prediction_data:
-                    logger.warning(f"指定日の予想データが見つかりません: {date}")
-                    return self._empty_accuracy_data(date)
-                
-                # データの処理
-                races = []
-                total_predictions = len(prediction_data)
-                completed_races = 0
-                win_hits = 0
-                place_hits = 0
-                trifecta_hits = 0
-                
-                for row in prediction_data:
-                    (pred_id, race_date, venue_id, venue_name, race_number,
-                     predicted_win, predicted_place_str, confidence, prediction_data_json,
-                     actual_results, is_hit, is_place_hit, is_trifecta_hit) = row
-                    
-                    # 予想データをパース
-                    try:
-                        predicted_place = json.loads(predicted_place_str) if predicted_place_str else []
-                    except:
-                        predicted_place = []
-                    
-                    # 結果があるかチェック
-                    has_result = actual_results is not None
-                    if has_result:
-                        completed_races += 1
-                        if is_hit:
-                            win_hits += 1
-                        if is_place_hit:
-                            place_hits += 1
-                        if is_trifecta_hit:
-                            trifecta_hits += 1
-                    
-                    # ヒット状況の表示
-                    if has_result:
-                        if is_hit:
-                            hit_status = '◯'
-                        elif is_place_hit:
-                            hit_status = '△'  
-                        else:
-                            hit_status = '×'
+            # 指定日の予想・結果（的中判定はSQL側で実施済み）
+            view = get_date_view(self.db_path, date)
+            
+            if not view:
+                logger.warning(f"指定日の予想データが見つかりません: {date}")
+                return self._empty_accuracy_data(date)
+            
+            # データの処理
+            races = []
+            total_predictions = len(view)
+            completed_races = 0
+            win_hits = 0
+            place_hits = 0
+            trifecta_hits = 0
+            
+            for row in view:
+                # 結果があるかチェック
+                has_result = row.has_result
+                if has_result:
+                    completed_races += 1
+                    if row.is_win_hit:
+                        win_hits += 1
+                    if row.is_place_hit:
+                        place_hits += 1
+                    if row.is_trifecta_hit:
+                        trifecta_hits += 1
+                
+                # ヒット状況の表示
+                if has_result:
+                    if row.is_win_hit:
+                        hit_status = '◯'
+                    elif row.is_place_hit:
+                        hit_status = '△'  
                     else:
-                        hit_status = '待'
-                    
-                    # 実際の結果をパース
-                    actual_results_list = []
-                    if actual_results:
-                        try:
-                            actual_results_list = json.loads(actual_results) if isinstance(actual_results, str) else actual_results
-                        except:
-                            actual_results_list = []
-                
-                    # レース情報の構築
-                    race_info = {
-                        'venue_id': venue_id,
-                        'venue_name': venue_name,
-                        'race_number': race_number,
-                        'race_date': race_date,
-                        'start_time': '未定',  # 時間データが不足している場合
-                        'race_title': f'第{race_number}レース',
-                        'confidence': confidence or 0.5,
-                        'prediction': {
-                            'predicted_win': predicted_win,
-                            'predicted_place': predicted_place,
-                            'confidence': confidence or 0.5
-                        },
-                        'result': actual_results_list if has_result else None,
-                        'is_win_hit': is_hit,
-                        'is_place_hit': is_place_hit,  
-                        'is_trifecta_hit': is_trifecta_hit,
-                        'has_result': has_result,
-                        'status': 'completed' if has_result else 'pending',
-                        'predicted_win': predicted_win,
-                        'predicted_place': predicted_place,
-                        'winning_boat': actual_results_list[0] if actual_results_list else None,
-                        'place_results': actual_results_list[:3] if actual_results_list else None,
-                        'hit_status': hit_status
-                    }
-                    races.append(race_info)
-                
-                # 統計計算
-                win_accuracy = (win_hits / completed_races * 100) if completed_races > 0 else 0
-                place_accuracy = (place_hits / completed_races * 100) if completed_races > 0 else 0
-                trifecta_accuracy = (trifecta_hits / completed_races * 100) if completed_races > 0 else 0
-                
-                logger.info(f"的中率計算完了（DB使用）: {date} - 予想{total_predictions}件（完了{completed_races}件）, 単勝:{win_accuracy:.1f}%, 複勝:{place_accuracy:.1f}%")
+                        hit_status = '×'
+                else:
+                    hit_status = '待'
                 
-                return {
-                    'summary': {
-                        'total_predictions': total_predictions,
-                        'completed_races': completed_races,
-                        'pending_races': total_predictions - completed_races,
-                        'win_hits': win_hits,
-                        'win_accuracy': round(win_accuracy, 1),
-                        'place_hits': place_hits,
-                        'place_accuracy': round(place_accuracy, 1),
-                        'trifecta_hits': trifecta_hits,
-                        'trifecta_accuracy': round(trifecta_accuracy, 1),
-                        'completion_rate': round((completed_races / total_predictions * 100), 1) if total_predictions > 0 else 0
+                # レース情報の構築
+                race_info = {
+                    'venue_id': row.venue_id,
+                    'venue_name': row.venue_name,
+                    'race_number': row.race_number,
+                    'race_date': date,
+                    'start_time': '未定',  # 時間データが不足している場合
+                    'race_title': f'第{row.race_number}レース',
+                    'confidence': row.confidence or 0.5,
+                    'prediction': {
+                        'predicted_win': row.predicted_win,
+                        'predicted_place': row.predicted_place,
+                        'confidence': row.confidence or 0.5
                     },
-                    'races': races,
-                    'venues': self.venue_mapping
+                    'result': row.place_results if has_result else None,
+                    'is_win_hit': row.is_win_hit,
+                    'is_place_hit': row.is_place_hit,  
+                    'is_trifecta_hit': row.is_trifecta_hit,
+                    'has_result': has_result,
+                    'status': 'completed' if has_result else 'pending',
+                    'predicted_win': row.predicted_win,
+                    'predicted_place': row.predicted_place,
+                    'winning_boat': row.winning_boat,
+                    'place_results': row.place_results if has_result else None,
+                    'hit_status': hit_status
                 }
+                races.append(race_info)
+            
+            # 統計計算
+            win_accuracy = (win_hits / completed_races * 100) if completed_races > 0 else 0
+            place_accuracy = (place_hits / completed_races * 100) if completed_races > 0 else 0
+            trifecta_accuracy = (trifecta_hits / completed_races * 100) if completed_races > 0 else 0
+            
+            logger.info(f"的中率計算完了（DB使用）: {date} - 予想{total_predictions}件（完了{completed_races}件）, 単勝:{win_accuracy:.1f}%, 複勝:{place_accuracy:.1f}%")
+            
+            return {
+                'summary': {
+                    'total_predictions': total_predictions,
+                    'completed_races': completed_races,
+                    'pending_races': total_predictions - completed_races,
+                    'win_hits': win_hits,
+                    'win_accuracy': round(win_accuracy, 1),
+                    'place_hits': place_hits,
+                    'place_accuracy': round(place_accuracy, 1),
+                    'trifecta_hits': trifecta_hits,
+                    'trifecta_accuracy': round(trifecta_accuracy, 1),
+                    'completion_rate': round((completed_races / total_predictions * 100), 1) if total_predictions > 0 else 0
+                },
+                'races': races,
+                'venues': self.venue_mapping
+            }
             
         except Exception as e:
             logger.error(f"的中率計算エラー: {e}")
@@ -478,105 +449,54 @@ class RealAPITracker:
     def _get_historical_races(self, date: str) -> List[Dict]:
         """過去の日付のレースデータを取得（APIとデータベースを統合）"""
         try:
-            # データベースから予想・結果データを取得
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 予想データを取得（race_detailsテーブルから）
-            cursor.execute('''SELECT venue_id, race_number, prediction_data
-                             FROM race_details 
-                             WHERE race_date = ? 
-                             ORDER BY venue_id, race_number''', (date,))
-            predictions = cursor.fetchall()
-            
-            # 結果データを取得（race_resultsテーブルから）
-            cursor.execute('''SELECT venue_id, race_number, winning_boat, place_results, trifecta_result
-                             FROM race_results 
-                             WHERE race_date = ? 
-                             ORDER BY venue_id, race_number''', (date,))
-            results = cursor.fetchall()
-            
-            conn.close()
-            
-            # データベースデータから直接レース一覧を構築
+            # 予想・結果を結合した日付ビューから直接レース一覧を構築
             races = []
-            venue_mapping = self._get_venue_mapping()
             
-            # 予想データをベースにレース一覧を作成
-            for pred in predictions:
-                venue_id = pred[0]
-                race_number = pred[1]
+            for row in get_date_view(self.db_path, date):
+                venue_id = row.venue_id
+                race_number = row.race_number
                 
                 race_info = {
                     'race_stadium_number': venue_id,
-                    'venue_name': venue_mapping.get(venue_id, f'会場{venue_id}'),
+                    'venue_name': row.venue_name,
                     'race_number': race_number,
                     'race_date': date,
                     'race_title': f'第{race_number}レース',
                     'start_time': '不明',
-                    'confidence': 0.0,
+                    'confidence': row.confidence or 0.0,
                     'has_api_data': False  # 過去データなのでAPIデータなし
                 }
                 
-                # 現在のprediction（pred）から予想データを解析
-                prediction = None
-                try:
-                    prediction_json = json.loads(pred[2]) if pred[2] else {}
-                    prediction = {
-                        'predicted_win': prediction_json.get('recommended_win'),
-                        'predicted_place': prediction_json.get('recommended_place', []),
-                        'confidence': prediction_json.get('confidence', 0.0)
-                    }
-                    race_info['confidence'] = prediction_json.get('confidence', 0.0)
-                except (json.JSONDecodeError, IndexError):
-                    logger.warning(f"予想データ解析失敗: {pred}")
-                    prediction = {
-                        'predicted_win': None,
-                        'predicted_place': [],
-                        'confidence': 0.0,
-                        'is_historical': True
-                    }
-                
-                
+                prediction = {
+                    'predicted_win': row.predicted_win,
+                    'predicted_place': row.predicted_place,
+                    'confidence': row.confidence or 0.0
+                }
                 race_info['prediction'] = prediction
                 
-                # 結果データを追加（race_resultsテーブルから）
-                result = None
-                for res in results:
-                    if res[0] == venue_id and res[1] == race_number:
-                        winning_boat = res[2]
-                        place_results = json.loads(res[3]) if res[3] else []
-                        trifecta_result = res[4]
-                        
-                        result = {
-                            'venue_id': venue_id,
-                            'venue_name': venue_mapping.get(venue_id, f'会場{venue_id}'),
-                            'race_number': race_number,
-                            'race_date': date,
-                            'winning_boat': winning_boat,
-                            'place_results': place_results,
-                            'trifecta_result': trifecta_result,
-                            'status': 'found'
-                        }
-                        
-                        # 的中判定
-                        if prediction and prediction.get('predicted_win'):
-                            race_info['is_win_hit'] = (str(winning_boat) == str(prediction['predicted_win']))
-                            race_info['is_place_hit'] = str(winning_boat) in [str(p) for p in prediction.get('predicted_place', [])]
-                        else:
-                            race_info['is_win_hit'] = False
-                            race_info['is_place_hit'] = False
-                        
-                        race_info['is_trifecta_hit'] = False  # 三連単判定は複雑なので一旦False
-                        race_info['has_result'] = True
-                        race_info['status'] = 'completed'
-                        break
-                
-                if not result:
+                if row.has_result:
+                    result = {
+                        'venue_id': venue_id,
+                        'venue_name': row.venue_name,
+                        'race_number': race_number,
+                        'race_date': date,
+                        'winning_boat': row.winning_boat,
+                        'place_results': row.place_results,
+                        'trifecta_result': row.trifecta_result,
+                        'status': 'found'
+                    }
+                    
+                    # 的中判定（SQL側で判定済み）
+                    race_info['is_win_hit'] = row.is_win_hit
+                    race_info['is_place_hit'] = row.is_place_hit
+                    race_info['is_trifecta_hit'] = False  # 三連単判定は複雑なので一旦False
+                    race_info['has_result'] = True
+                    race_info['status'] = 'completed'
+                else:
                     # 結果データがない場合
                     result = {
                         'venue_id': venue_id,
-                        'venue_name': venue_mapping.get(venue_id, f'会場{venue_id}'),
+                        'venue_name': row.venue_name,
                         'race_number': race_number,
                         'race_date': date,
                         'winning_boat': None,
@@ -600,8 +520,6 @@ class RealAPITracker:
                 
                 races.append(race_info)
             
-            races.sort(key=lambda x: (x['race_stadium_number'], x['race_number']))
-            
             logger.info(f"過去のレース統合取得成功: {date} ({len(races)}レース)")
             return races
             
@@ -711,20 +629,23 @@ class RealAPITracker:
                                result_data: Dict):
         """レース結果をデータベースに保存"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR REPLACE INTO race_results 
-                    (venue_id, race_number, race_date, venue_name, winning_boat, 
+                    (venue_id, race_number, race_date, venue_name, winning_boat, second_boat, third_boat,
                      place_results, trifecta_result, result_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     venue_id, race_number, date, venue_name, winning_boat,
+                    place_results[1] if len(place_results) > 1 else None,
+                    place_results[2] if len(place_results) > 2 else None,
                     json.dumps(place_results), 
                     json.dumps(place_results[:3]) if len(place_results) >= 3 else json.dumps([]),
                     json.dumps(result_data)
                 ))
                 conn.commit()
+            bump_data_version(self.db_path, date)
                 
         except Exception as e:
             logger.error(f"レース結果保存エラー: {e}")
@@ -774,17 +695,21 @@ class RealAPITracker:
             venue_name = self.venue_mapping.get(venue_id, f'会場{venue_id}')
             race_title = race_data.get('race_title', f'第{race_number}レース')
             
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR REPLACE INTO race_details 
                     (race_date, venue_id, venue_name, race_number, start_time, race_title, 
-                     race_data, boats_data, prediction_data, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     race_data, boats_data, prediction_data, created_at,
+                     predicted_win, confidence, pred_pos1, pred_pos2, pred_pos3)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (race_date, venue_id, venue_name, race_number, start_time, race_title,
                       json.dumps(race_data), json.dumps(race_data.get('boats', [])), 
-                      json.dumps(prediction_data), datetime.now().isoformat()))
+                      json.dumps(prediction_data), datetime.now().isoformat())
+                     + prediction_columns(prediction_data))
+                save_entrants(cursor, race_date, race_data)
                 conn.commit()
+            bump_data_version(self.db_path, race_date)
             
             logger.info(f"レース詳細保存: {venue_name} {race_number}R (発走: {start_time})")
             return True
@@ -799,7 +724,7 @@ class RealAPITracker:
             date = datetime.now().strftime('%Y-%m-%d')
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 # 正しいスキーマに基づいてクエリ修正
                 cursor.execute('''
@@ -852,7 +777,7 @@ class RealAPITracker:
     def get_all_races_by_date(self, date_str: str) -> List[Dict]:
         """指定日付のすべてのレースを取得"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT DISTINCT rd.venue_id, rd.race_number, rd.race_title, 
@@ -9,26 +9,37 @@ import requests
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .feature_store import get_feature_store
+from .openapi_endpoint import get_base_url
+from .race_model import Entrant, as_race
+
 logger = logging.getLogger(__name__)
 
+# 直近成績を実力評価に反映する最小出走数
+MIN_RECENT_STARTS = 3
+# 会場別モーター・ボート成績を使う最小出走数
+MIN_EQUIPMENT_STARTS = 5
+
 class RealEnhancedPredictor:
     """実際の競艇理論に基づく予想システム"""
     
     def __init__(self):
-        self.api_base_url = 'https://boatraceopenapi.github.io'
+        self.api_base_url = get_base_url()
+        self.feature_store = get_feature_store()
         logger.info("実際の予想システム初期化完了")
     
-    def calculate_prediction_from_program(self, race_program: Dict) -> Dict:
-        """レースプログラムデータから予想を計算"""
+    def calculate_prediction_from_program(self, race_program) -> Dict:
+        """レースプログラムデータ（辞書または解析済み Race）から予想を計算"""
         try:
-            venue_id = race_program.get('race_stadium_number', 1)
-            race_number = race_program.get('race_number', 1)
+            race = as_race(race_program)
+            venue_id = race.venue_id or 1
+            race_number = race.race_number or 1
             
             # コース別勝率分析
-            course_win_rates = self._calculate_course_win_rates(venue_id)
+            course_win_rates = self._calculate_course_win_rates(venue_id, race_number)
             
             # レーサー分析（プログラムデータから）
-            racers_analysis = self._analyze_racers_from_program(race_program)
+            racers_analysis = self._analyze_racers_from_program(race)
             
             # 最終予想計算
             predictions = self._calculate_final_predictions(
@@ -57,7 +68,7 @@ class RealEnhancedPredictor:
                 return None  # ダミーデータではなくエラーを返す
             
             # コース別勝率分析
-            course_win_rates = self._calculate_course_win_rates(venue_id)
+            course_win_rates = self._calculate_course_win_rates(venue_id, race_number)
             
             # レーサー分析（API から取得可能な範囲で）
             racers_analysis = self._analyze_racers(race_data)
@@ -102,8 +113,11 @@ class RealEnhancedPredictor:
             logger.error(f"レースデータ取得エラー: {e}")
             return None
     
-    def _calculate_course_win_rates(self, venue_id: int) -> Dict[int, float]:
-        """会場別コース勝率（実際の競艇統計に基づく）"""
+    def _calculate_course_win_rates(self, venue_id: int, race_number: Optional[int] = None) -> Dict[int, float]:
+        """会場別コース勝率（結果から集計した会場×コース表。集計不足時は既定値）"""
+        rates = self.feature_store.get_course_win_rates(venue_id, race_number)
+        if rates:
+            return rates
         
         # 実際の競艇場の特性を反映したコース別勝率
         venue_characteristics = {
@@ -128,43 +142,36 @@ class RealEnhancedPredictor:
         
         return venue_characteristics.get(venue_id, default_rates)
     
-    def _analyze_racers_from_program(self, race_program: Dict) -> List[Dict]:
+    def _analyze_racers_from_program(self, race_program) -> List[Dict]:
         """レースプログラムからレーサー分析（実際のAPIデータに基づく）"""
-        racers = []
+        race = as_race(race_program)
+        if race is None:
+            return []
         
-        # プログラムから出走表データを取得
-        boats = race_program.get('boats', [])
+        # 直近成績は出走表単位で一括取得
+        recent_forms = self.feature_store.get_card_features(race.racer_numbers())
         
-        for i, boat in enumerate(boats):
-            racer_number = i + 1
-            
-            # APIから実際のレーサー情報を取得
-            racer_name = '不明'
-            racer_rank = None
-            win_rate = None
-            local_win_rate = None
-            
-            if boat and isinstance(boat, dict):
-                racer_name = boat.get('racer_name', '不明')
-                racer_rank = boat.get('racer_rank')  # A1, A2, B1, B2など
-                win_rate = boat.get('win_rate')  # 勝率
-                local_win_rate = boat.get('local_win_rate')  # 当地勝率
+        racers = []
+        for entrant in race.entrants:
+            course = entrant.boat_number
+            recent_form = recent_forms.get(entrant.racer_number)
             
             # 実際のデータに基づくレーサー分析
             racer_analysis = {
-                'number': racer_number,
-                'name': racer_name,
-                'course': racer_number,
-                'motor_number': boat.get('motor_number', racer_number),
-                'boat_number': boat.get('boat_number', racer_number),
-                'racer_rank': racer_rank,
+                'number': course,
+                'name': entrant.name,
+                'course': course,
+                'motor_number': entrant.motor_number,
+                'boat_number': entrant.assigned_boat_number,
+                'racer_rank': entrant.racer_class,
                 
                 # 実際の競艇理論に基づく分析
-                'base_strength': self._calculate_base_strength(racer_number),
-                'racer_ability': self._analyze_racer_ability(boat),
-                'motor_performance': self._analyze_motor_performance_real(boat, racer_number),
-                'boat_performance': self._analyze_boat_performance_real(boat, racer_number),
-                'course_advantage': self._calculate_course_advantage(racer_number),
+                'base_strength': self._calculate_base_strength(course),
+                'racer_ability': self._blend_recent_form(self._analyze_racer_ability(entrant), recent_form),
+                'recent_form': recent_form,
+                'motor_performance': self._analyze_motor_performance_real(entrant, race.venue_id),
+                'boat_performance': self._analyze_boat_performance_real(entrant, race.venue_id),
+                'course_advantage': self._calculate_course_advantage(course),
                 'prediction_score': 0.0
             }
             
@@ -173,10 +180,15 @@ class RealEnhancedPredictor:
             
             # テンプレート互換性のため追加属性を設定
             racer_analysis['prediction'] = racer_analysis['prediction_score']
-            racer_analysis['win_rate'] = win_rate or max(10, 60 - (racer_number-1) * 8)
-            racer_analysis['local_win_rate'] = local_win_rate or max(8, 55 - (racer_number-1) * 7)
-            racer_analysis['place_rate'] = max(20, 80 - (racer_number-1) * 10)
-            racer_analysis['average_st'] = round(0.15 + (racer_number-1) * 0.02, 3)
+            racer_analysis['win_rate'] = entrant.national_win_rate or max(10, 60 - (course-1) * 8)
+            racer_analysis['local_win_rate'] = entrant.local_win_rate or max(8, 55 - (course-1) * 7)
+            racer_analysis['place_rate'] = entrant.national_top2_rate or max(20, 80 - (course-1) * 10)
+            if recent_form and recent_form['recent_avg_st'] is not None:
+                racer_analysis['average_st'] = recent_form['recent_avg_st']
+            elif entrant.average_st is not None:
+                racer_analysis['average_st'] = entrant.average_st
+            else:
+                racer_analysis['average_st'] = round(0.15 + (course-1) * 0.02, 3)
             
             racers.append(racer_analysis)
         
@@ -185,53 +197,9 @@ class RealEnhancedPredictor:
         
         return racers
     
-    def _analyze_racers(self, race_data: Dict) -> List[Dict]:
+    def _analyze_racers(self, race_data) -> List[Dict]:
         """レーサー分析（利用可能データに基づく）"""
-        racers = []
-        
-        # APIから取得可能なレーサー情報を分析
-        boats = race_data.get('boats', [])
-        
-        for i, boat in enumerate(boats):
-            racer_number = i + 1
-            
-            # APIからレーサー名を取得（正しいフィールド名使用）
-            racer_name = '不明'
-            if boat and isinstance(boat, dict):
-                racer_name = boat.get('racer_name', '不明')
-            
-            # 基本レーサー分析
-            racer_analysis = {
-                'number': racer_number,
-                'name': racer_name,  # 実際のAPIデータから取得
-                'course': racer_number,
-                'motor_number': boat.get('motor_number', racer_number),
-                'boat_number': boat.get('boat_number', racer_number),
-                
-                # 実際の分析要素
-                'base_strength': self._calculate_base_strength(racer_number),
-                'motor_performance': self._analyze_motor_performance_real(boat, racer_number),
-                'boat_performance': self._analyze_boat_performance_real(boat, racer_number),
-                'course_advantage': self._calculate_course_advantage(racer_number),
-                'prediction_score': 0.0
-            }
-            
-            # 総合予想スコア計算
-            racer_analysis['prediction_score'] = self._calculate_prediction_score(racer_analysis)
-            
-            # テンプレート互換性のため追加属性を設定
-            racer_analysis['prediction'] = racer_analysis['prediction_score']
-            racer_analysis['win_rate'] = max(10, 60 - (racer_number-1) * 8)
-            racer_analysis['local_win_rate'] = max(8, 55 - (racer_number-1) * 7)
-            racer_analysis['place_rate'] = max(20, 80 - (racer_number-1) * 10)
-            racer_analysis['average_st'] = round(0.15 + (racer_number-1) * 0.02, 3)
-            
-            racers.append(racer_analysis)
-        
-        # 予想スコア順にソート
-        racers.sort(key=lambda x: x['prediction_score'], reverse=True)
-        
-        return racers
+        return self._analyze_racers_from_program(race_data)
     
     def _calculate_base_strength(self, course: int) -> float:
         """基本的な艇の強さ（コース別）"""
@@ -241,24 +209,14 @@ class RealEnhancedPredictor:
         }
         return base_strengths.get(course, 0.5)
     
-    def _analyze_racer_ability(self, boat_data: Dict) -> float:
+    def _analyze_racer_ability(self, entrant: Optional[Entrant]) -> float:
         """レーサー実力分析（APIデータベース）"""
-        if not boat_data:
+        if entrant is None:
             return 0.5
         
-        # 実際のAPIデータから勝率を取得
-        win_rate = boat_data.get('win_rate')
-        racer_rank = boat_data.get('racer_rank', '')
-        
-        # 勝率が取得できた場合は、それを0-1の範囲に正規化
-        if win_rate is not None:
-            try:
-                rate = float(win_rate)
-                # 勝率を0-1の範囲に正規化（競艇の勝率は通常0-30%程度）
-                normalized_rate = min(1.0, max(0.0, rate / 30.0))
-                return normalized_rate
-            except (ValueError, TypeError):
-                pass
+        # 全国勝率（通常2-8点）を0-1の範囲に正規化
+        if entrant.national_win_rate is not None:
+            return min(1.0, max(0.0, entrant.national_win_rate / 10.0))
         
         # ランク別の基本実力（A1が最高、B2が最低）
         rank_abilities = {
@@ -268,56 +226,43 @@ class RealEnhancedPredictor:
             'B2': 0.40
         }
         
-        return rank_abilities.get(racer_rank, 0.5)
+        return rank_abilities.get(entrant.racer_class, 0.5)
+    
+    def _blend_recent_form(self, ability: float, recent_form: Optional[Dict]) -> float:
+        """直近成績（2連対率）を実力評価に反映"""
+        if not recent_form or recent_form['recent_starts'] < MIN_RECENT_STARTS:
+            return ability
+        if recent_form['recent_top2_rate'] is None:
+            return ability
+        return ability * 0.7 + recent_form['recent_top2_rate'] * 0.3
     
-    def _analyze_motor_performance_real(self, boat_data: Dict, racer_number: int = 1) -> float:
+    def _analyze_motor_performance_real(self, entrant: Optional[Entrant], venue_id: Optional[int] = None) -> float:
         """モーター性能分析（実際のデータベース）"""
-        if not boat_data:
+        if entrant is None:
             return 0.5
-        
-        motor_number = boat_data.get('motor_number', racer_number)
-        motor_2_rate = boat_data.get('motor_2_rate')  # モーター2連率
-        
-        # 実際のモーター2連率が取得できた場合
-        if motor_2_rate is not None:
-            try:
-                rate = float(motor_2_rate)
-                # 2連率を0-1の範囲に正規化（通常20-50%程度）
-                normalized_rate = min(1.0, max(0.0, (rate - 20) / 30.0))
-                return normalized_rate
-            except (ValueError, TypeError):
-                pass
-        
-        # フォールバック: モーター番号から統計的推定
-        # 実際の競艇場では特定のモーター番号が好成績の場合がある
-        motor_hash = hash(f"motor_{motor_number}") % 100
-        base_performance = 0.3 + (motor_hash / 100) * 0.4  # 0.3-0.7の範囲
-        
-        return base_performance
+        return self._analyze_equipment_performance(entrant.motor_top2_rate, entrant.motor_number, venue_id, 'motor')
     
-    def _analyze_boat_performance_real(self, boat_data: Dict, racer_number: int = 1) -> float:
+    def _analyze_boat_performance_real(self, entrant: Optional[Entrant], venue_id: Optional[int] = None) -> float:
         """ボート性能分析（実際のデータベース）"""
-        if not boat_data:
+        if entrant is None:
             return 0.5
-        
-        boat_number = boat_data.get('boat_number', racer_number)
-        boat_2_rate = boat_data.get('boat_2_rate')  # ボート2連率
-        
-        # 実際のボート2連率が取得できた場合
-        if boat_2_rate is not None:
-            try:
-                rate = float(boat_2_rate)
-                # 2連率を0-1の範囲に正規化
-                normalized_rate = min(1.0, max(0.0, (rate - 20) / 30.0))
-                return normalized_rate
-            except (ValueError, TypeError):
-                pass
-        
-        # フォールバック: ボート番号から統計的推定  
-        boat_hash = hash(f"boat_{boat_number}") % 100
-        base_performance = 0.3 + (boat_hash / 100) * 0.3  # 0.3-0.6の範囲
-        
-        return base_performance
+        return self._analyze_equipment_performance(entrant.boat_top2_rate, entrant.assigned_boat_number, venue_id, 'boat')
+    
+    def _analyze_equipment_performance(self, rate: Optional[float], number: Optional[int],
+                                       venue_id: Optional[int], kind: str) -> float:
+        """モーター・ボートの2連率を0-1に正規化（出走表の値 → 会場別集計 → 中立値の順）"""
+        # 会場別の結果集計から2連率を算出
+        if rate is None and venue_id is not None and number is not None:
+            stats = self.feature_store.get_equipment_stats(venue_id, kind, number)
+            if stats and stats['starts'] >= MIN_EQUIPMENT_STARTS:
+                rate = stats['top2_rate'] * 100
+        
+        if rate is not None:
+            # 2連率を0-1の範囲に正規化（通常20-50%程度）
+            return min(1.0, max(0.0, (rate - 20) / 30.0))
+        
+        # データがない場合は中立値（プロセス間で同じ値になるよう固定）
+        return 0.5
     
     def _calculate_course_advantage(self, course: int) -> float:
         """コース有利度"""
@@ -396,17 +341,19 @@ class RealEnhancedPredictor:
         else:
             base_confidence = 0.5
         
-        # 会場による信頼度調整（拡張版）
-        venue_adjustment = {
-            1: 0.05,   # 桐生: やや高信頼
-            2: 0.08,   # 戸田: 高信頼（1コース強い）
-            3: -0.10,  # 江戸川: 荒れやすいため低信頼
-            4: 0.03,   # 平和島: やや高信頼
-            11: -0.05, # びわこ: やや荒れやすい
-            12: 0.02,  # 住之江: やや高信頼
-            16: -0.08, # 児島: 荒れやすい
-            21: 0.06   # 芦屋: 高信頼
-        }.get(venue_id, 0.0)
+        # 会場による信頼度調整（結果集計から算出。集計不足時は既定値）
+        venue_adjustment = self.feature_store.get_venue_confidence_adjustment(venue_id)
+        if venue_adjustment is None:
+            venue_adjustment = {
+                1: 0.05,   # 桐生: やや高信頼
+                2: 0.08,   # 戸田: 高信頼（1コース強い）
+                3: -0.10,  # 江戸川: 荒れやすいため低信頼
+                4: 0.03,   # 平和島: やや高信頼
+                11: -0.05, # びわこ: やや荒れやすい
+                12: 0.02,  # 住之江: やや高信頼
+                16: -0.08, # 児島: 荒れやすい
+                21: 0.06   # 芦屋: 高信頼
+            }.get(venue_id, 0.0)
         
         # 最終信頼度（30%-90%の範囲）
         confidence = max(0.30, min(0.90, base_confidence + venue_adjustment))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+リクエストトレーシング
+リクエスト内の各フェーズ・上流API呼び出し・DBアクセスをスパンとして記録し、
+Server-Timing ヘッダーとして返す。遅いトレース上位N件を保持して管理画面から参照できるようにする
+"""
+
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar('kyotei_request_trace', default=None)
+_METRIC_NAME_PATTERN = re.compile(r'[^A-Za-z0-9_\-]')
+
+# Server-Timing ヘッダーに載せる最大メトリクス数
+MAX_SERVER_TIMING_METRICS = 20
+# 上流取得・DBアクセスを内部で行う呼び出しを囲むスパンの種別
+# （内側の upstream / db スパンと時間が重なるため、遅いトレースの内訳にのみ記録する）
+HANDLER_KIND = 'handler'
+
+
+class RequestTrace:
+    """1リクエスト分のスパン記録"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now()
+        self.status = None
+        self.duration_ms = None
+        self.spans: List[Dict] = []
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def add_span(self, name: str, kind: str, start: float, end: float, depth: int, detail: Optional[str] = None):
+        self.spans.append({
+            'name': name,
+            'kind': kind,
+            'offset_ms': round((start - self._start) * 1000, 2),
+            'duration_ms': round((end - start) * 1000, 2),
+            'depth': depth,
+            'detail': detail
+        })
+
+    def finish(self, status: Optional[int] = None) -> float:
+        if self.duration_ms is None:
+            self.status = status
+            self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+        return self.duration_ms
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダー値（同名スパンは合算、handler スパンは内側のスパンと重複するため除く）"""
+        totals: Dict[str, List] = {}
+        for span in self.spans:
+            if span['kind'] == HANDLER_KIND:
+                continue
+            entry = totals.setdefault(span['name'], [0.0, 0])
+            entry[0] += span['duration_ms']
+            entry[1] += 1
+
+        ordered = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:MAX_SERVER_TIMING_METRICS]
+        metrics = []
+        for name, (duration, count) in ordered:
+            metric = f"{_METRIC_NAME_PATTERN.sub('_', name)};dur={duration:.1f}"
+            if count > 1:
+                metric += f';desc="x{count}"'
+            metrics.append(metric)
+        if self.duration_ms is not None:
+            metrics.append(f"total;dur={self.duration_ms:.1f}")
+        return ', '.join(metrics)
+
+    def to_dict(self) -> Dict:
+        return {
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': self.duration_ms,
+            'spans': list(self.spans)
+        }
+
+
+class SlowTraceBuffer:
+    """遅いトレース上位N件を保持（最小ヒープで最速のものから入れ替え）"""
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, trace: RequestTrace):
+        if trace.duration_ms is None or self.capacity <= 0:
+            return
+        entry = (trace.duration_ms, next(self._counter), trace)
+        with self._lock:
+            self.recorded += 1
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            elif trace.duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            entries = sorted(self._heap, key=lambda e: e[0], reverse=True)
+        if limit:
+            entries = entries[:limit]
+        return [entry[2].to_dict() for entry in entries]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+            self.recorded = 0
+
+
+_trace_buffer = SlowTraceBuffer()
+
+
+def get_trace_buffer() -> SlowTraceBuffer:
+    """遅いトレースのバッファを取得"""
+    return _trace_buffer
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, kind: str = 'phase', detail: Optional[str] = None):
+    """スパンを記録（トレース中でなければ記録しない。DBスパン＝ステートメント単位はメトリクスにも記録）"""
+    trace = _current_trace.get()
+    record_metric = kind == 'db'
+    if trace is None and not record_metric:
+        yield
+        return
+
+    if trace is not None:
+        depth = trace._depth
+        trace._depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if trace is not None:
+            trace._depth = depth
+            trace.add_span(name, kind, start, end, depth, detail)
+        if record_metric:
+            get_metrics().observe('sqlite_query_seconds', end - start, query=name)
+
+
+def traced(name: str, kind: str = 'phase'):
+    """関数呼び出しをスパンとして記録するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(method: str, path: str) -> RequestTrace:
+    trace = RequestTrace(method, path)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    _current_trace.set(None)
+
+
+def init_request_tracing(app, capacity: int = 50, server_timing: bool = True):
+    """Flaskアプリにトレーシングのフックを登録"""
+    from flask import request
+
+    _trace_buffer.capacity = capacity
+
+    @app.before_request
+    def _start_request_trace():
+        start_trace(request.method, request.path)
+
+    @app.after_request
+    def _finish_request_trace(response):
+        trace = current_trace()
+        if trace is not None:
+            trace.finish(response.status_code)
+            if server_timing:
+                response.headers['Server-Timing'] = trace.server_timing()
+            _trace_buffer.record(trace)
+        return response
+
+    @app.teardown_request
+    def _clear_request_trace(exc):
+        trace = current_trace()
+        if trace is not None and trace.duration_ms is None:
+            trace.finish(500)
+            _trace_buffer.record(trace)
+        end_trace()
+
+    logger.info(f"リクエストトレーシング有効化（遅いトレース上位{capacity}件を保持）")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+当日結果の保存
+BoatraceOpenAPI の results（着順）を race_results と特徴量ストアに書き込み、日付ビューの版を更新する。
+Flask版（AdminRoutes）・ASGI版（asgi_api）・スケジューラー（締切後の結果取得）で共通。取得（HTTP）は呼び出し側が行う
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .date_view import bump_data_version
+from .feature_store import get_feature_store, program_boats_by_race
+from .query_profiler import connect as sqlite_connect
+from .race_model import venue_name as lookup_venue_name
+
+logger = logging.getLogger(__name__)
+
+# race_results に書き込む列（DBごとに存在する列だけを使う）
+RESULT_COLUMNS = ('race_date', 'venue_id', 'venue_name', 'race_number', 'winning_boat', 'second_boat', 'third_boat',
+                  'trifecta_result', 'place_results', 'result_data', 'raw_result_data', 'fetched_at')
+
+
+def _place_results(boats: List[Dict]) -> List[Optional[int]]:
+    """1-3着の艇番（不明な順位は None）"""
+    place_results = [None, None, None]
+    for boat in boats:
+        place = boat.get('racer_place_number')
+        boat_num = boat.get('racer_boat_number')
+        if place and place <= 3:
+            place_results[place-1] = boat_num
+    return place_results
+
+
+def write_results(cursor, db_path: str, results: List[Dict], program_index: Optional[Dict] = None,
+                  race_date: Optional[str] = None, complete_only: bool = False) -> List[Tuple[Dict, List[int], int]]:
+    """結果を race_results と特徴量ストアに書き込み、保存したレースの (結果, 1-3着, 行ID) を返す
+    （1着が決まっていれば保存、complete_only なら3着まで確定したもののみ。commit は呼び出し側で行う）"""
+    race_date = race_date or datetime.now().strftime('%Y-%m-%d')
+    feature_store = get_feature_store(db_path)
+    # 初回の読み込みは別接続で行うため、書き込みロックを取る前に済ませる
+    feature_store.ensure_loaded()
+    cursor.execute('PRAGMA table_info(race_results)')
+    existing = {row[1] for row in cursor.fetchall()}
+    columns = [column for column in RESULT_COLUMNS if column in existing]
+    insert = f'''
+        INSERT OR REPLACE INTO race_results ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+    '''
+    now = datetime.now().isoformat()
+
+    saved = []
+    for race in results:
+        venue_id = race.get('race_stadium_number')
+        race_number = race.get('race_number')
+        try:
+            boats = race.get('boats', [])
+            place_results = _place_results(boats)
+            if place_results[0] is None or (complete_only and None in place_results):
+                continue
+
+            # 三連単結果作成（不明な順位はNullで保存）
+            values = {
+                'race_date': race_date,
+                'venue_id': venue_id,
+                'venue_name': lookup_venue_name(venue_id),
+                'race_number': race_number,
+                'winning_boat': place_results[0],
+                'second_boat': place_results[1],
+                'third_boat': place_results[2],
+                'trifecta_result': f"{place_results[0]}-{place_results[1] or 'N'}-{place_results[2] or 'N'}",
+                'place_results': json.dumps(place_results),
+                'result_data': json.dumps(race, ensure_ascii=False),
+                'raw_result_data': '{"auto_updated": true}',
+                'fetched_at': now
+            }
+            cursor.execute(insert, [values[column] for column in columns])
+            result_id = cursor.lastrowid
+
+            # レーサー別の直近成績・会場別モーター・ボート成績を差分更新
+            feature_store.ingest_race(cursor, race_date, venue_id, race_number, boats,
+                                      (program_index or {}).get((venue_id, race_number)))
+            saved.append((race, place_results, result_id))
+        except Exception as e:
+            logger.warning(f"結果処理エラー {venue_id}-{race_number}: {e}")
+            continue
+    return saved
+
+
+def save_results(db_path: str, results: List[Dict], programs: Optional[List[Dict]] = None,
+                 race_date: Optional[str] = None) -> int:
+    """着順が確定したレースの結果を保存して件数を返す"""
+    race_date = race_date or datetime.now().strftime('%Y-%m-%d')
+    with sqlite_connect(db_path) as conn:
+        saved = write_results(conn.cursor(), db_path, results, program_boats_by_race(programs or []), race_date)
+        conn.commit()
+
+    updated_count = len(saved)
+    if updated_count > 0:
+        bump_data_version(db_path, race_date)
+        logger.info(f"実際の結果を自動更新: {updated_count}件")
+    else:
+        logger.info("更新対象のレース結果がありませんでした")
+    return updated_count
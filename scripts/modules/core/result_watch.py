@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+結果取得ウォッチキュー
+各レースの締切時刻から結果取得時刻を計画し、同じ分に締め切るレースはまとめて取得する。
+結果が未反映のレースは指数バックオフで再試行する
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+RaceKey = Tuple[int, int]
+
+
+class ResultWatchQueue:
+    """締切時刻ベースの結果取得スケジュール"""
+
+    def __init__(self, first_delay_minutes: int = 10, backoff_minutes: int = 5,
+                 backoff_max_minutes: int = 60, max_attempts: int = 6):
+        self.first_delay = timedelta(minutes=first_delay_minutes)
+        self.backoff_minutes = backoff_minutes
+        self.backoff_max_minutes = backoff_max_minutes
+        self.max_attempts = max_attempts
+
+        # 取得待ちレース -> 試行回数
+        self._pending: Dict[RaceKey, int] = {}
+        # (取得予定時刻, 連番, レースキー一覧)
+        self._heap: List[Tuple[datetime, int, List[RaceKey]]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def clear(self):
+        """計画をすべて破棄"""
+        with self._lock:
+            self._pending.clear()
+            self._heap.clear()
+
+    def plan(self, timeline, done_keys: Iterable[RaceKey] = ()) -> int:
+        """タイムラインから結果取得を計画（締切が同じ分のレースは1回の取得にまとめる）"""
+        done = set(done_keys)
+        batches: Dict[datetime, List[RaceKey]] = {}
+        for close_time, key in zip(timeline.close_times, timeline.keys):
+            if key in done or key in self._pending:
+                continue
+            due = close_time.replace(second=0, microsecond=0) + self.first_delay
+            batches.setdefault(due, []).append(key)
+
+        with self._lock:
+            for due, keys in batches.items():
+                for key in keys:
+                    self._pending[key] = 0
+                heapq.heappush(self._heap, (due, next(self._counter), keys))
+
+        planned = sum(len(keys) for keys in batches.values())
+        if planned:
+            logger.info(f"結果取得計画: {planned}レース / {len(batches)}回の取得")
+        return planned
+
+    def next_due(self) -> Optional[datetime]:
+        """次の取得予定時刻"""
+        with self._lock:
+            self._drop_stale_heads()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, current_time: datetime) -> Set[RaceKey]:
+        """取得時刻を迎えたレースを取り出す（期限到来分はすべて1回の取得に合流）"""
+        due_keys: Set[RaceKey] = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= current_time:
+                _, _, keys = heapq.heappop(self._heap)
+                due_keys.update(key for key in keys if key in self._pending)
+        return due_keys
+
+    def mark_done(self, keys: Iterable[RaceKey]):
+        """結果取得済みのレースを計画から外す"""
+        with self._lock:
+            for key in keys:
+                self._pending.pop(key, None)
+
+    def reschedule(self, keys: Iterable[RaceKey], current_time: datetime) -> int:
+        """結果未反映のレースを指数バックオフで再計画"""
+        batches: Dict[datetime, List[RaceKey]] = {}
+        with self._lock:
+            for key in keys:
+                if key not in self._pending:
+                    continue
+                attempt = self._pending[key] + 1
+                if attempt >= self.max_attempts:
+                    self._pending.pop(key)
+                    logger.warning(f"結果取得を断念: {key[0]}_{key[1]} ({attempt}回試行)")
+                    continue
+                self._pending[key] = attempt
+                delay = min(self.backoff_max_minutes, self.backoff_minutes * (2 ** (attempt - 1)))
+                due = current_time.replace(second=0, microsecond=0) + timedelta(minutes=delay)
+                batches.setdefault(due, []).append(key)
+
+            for due, batch in batches.items():
+                heapq.heappush(self._heap, (due, next(self._counter), batch))
+
+        return sum(len(batch) for batch in batches.values())
+
+    def _drop_stale_heads(self):
+        """取得済みレースだけになった先頭エントリを除去"""
+        while self._heap and not any(key in self._pending for key in self._heap[0][2]):
+            heapq.heappop(self._heap)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+予想・結果の型付きカラム
+予想順位（pred_pos1..3）と着順（winning_boat/second_boat/third_boat）を整数カラムに持ち、
+出走時点のレーサー情報は race_entrants テーブルに保存する。
+既存行のJSON・カンマ区切り文字列は初回に一度だけ移行し、以降の集計・一覧ではPython側で解析しない。
+predictions の pred_pos1..3 は三連単予想（predicted_trifecta）があればそれを、なければ predicted_place を使う。
+predictions は外部の書き込みもあるため、追加・更新時はトリガーで、取りこぼしはプロセス起動時の補完で埋める
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from .query_profiler import connect as sqlite_connect
+from .race_model import as_race
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = 'typed_positions_v1'
+# 旧実装の三連単判定は predicted_trifecta で行っていたため、移行済みDBにも後から反映する
+TRIFECTA_MIGRATION_NAME = 'typed_trifecta_v1'
+
+# 既存テーブルに追加する型付きカラム
+TYPED_COLUMNS = {
+    'predictions': (
+        ('pred_pos1', 'INTEGER'), ('pred_pos2', 'INTEGER'), ('pred_pos3', 'INTEGER')
+    ),
+    'race_details': (
+        ('predicted_win', 'INTEGER'), ('confidence', 'REAL'),
+        ('pred_pos1', 'INTEGER'), ('pred_pos2', 'INTEGER'), ('pred_pos3', 'INTEGER')
+    ),
+    'race_results': (
+        ('winning_boat', 'INTEGER'), ('second_boat', 'INTEGER'), ('third_boat', 'INTEGER')
+    )
+}
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS race_entrants (
+        race_date TEXT NOT NULL,
+        venue_id INTEGER NOT NULL,
+        race_number INTEGER NOT NULL,
+        boat_number INTEGER NOT NULL,
+        racer_number INTEGER,
+        racer_name TEXT,
+        class_number INTEGER,
+        average_st REAL,
+        national_win_rate REAL,
+        national_top2_rate REAL,
+        local_win_rate REAL,
+        motor_number INTEGER,
+        motor_top2_rate REAL,
+        assigned_boat_number INTEGER,
+        boat_top2_rate REAL,
+        PRIMARY KEY (race_date, venue_id, race_number, boat_number)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name TEXT PRIMARY KEY,
+        applied_at TEXT
+    )
+    '''
+]
+
+# プロセス内で移行確認済みのDB
+_ready_paths: Set[str] = set()
+_ready_lock = threading.Lock()
+
+
+def parse_positions(value) -> List[int]:
+    """JSON配列・カンマ区切り・ハイフン区切り・リストの艇番を整数リストに変換"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('['):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                return []
+        else:
+            value = text.replace('-', ',').split(',')
+    if isinstance(value, int):
+        value = [value]
+    positions = []
+    for item in value if isinstance(value, (list, tuple)) else []:
+        try:
+            positions.append(int(item))
+        except (TypeError, ValueError):
+            continue
+    return positions
+
+
+def top3(value) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """1-3位の艇番（不足分は None）"""
+    positions = parse_positions(value)[:3]
+    return tuple(positions + [None] * (3 - len(positions)))
+
+
+def prediction_columns(prediction: Optional[Dict]) -> Tuple:
+    """予想結果から (predicted_win, confidence, pred_pos1, pred_pos2, pred_pos3) を作成"""
+    prediction = prediction or {}
+    place = prediction.get('recommended_place') or prediction.get('predicted_place')
+    predicted_win = prediction.get('recommended_win') or prediction.get('predicted_win')
+    positions = top3(place)
+    try:
+        predicted_win = int(predicted_win) if predicted_win is not None else positions[0]
+    except (TypeError, ValueError):
+        predicted_win = positions[0]
+    confidence = prediction.get('confidence')
+    return (predicted_win, float(confidence) if isinstance(confidence, (int, float)) else None) + positions
+
+
+def positions_list(*positions) -> List[int]:
+    """型付きカラムの値から艇番リストを作成（None は除外）"""
+    return [position for position in positions if position is not None]
+
+
+def save_entrants(cursor, race_date: str, race_data) -> int:
+    """出走表のレーサー情報を race_entrants に保存"""
+    race = as_race(race_data)
+    if race is None or not race.entrants:
+        return 0
+    rows = [
+        (race_date, race.venue_id, race.race_number, entrant.boat_number, entrant.racer_number,
+         entrant.name, entrant.class_number, entrant.average_st, entrant.national_win_rate,
+         entrant.national_top2_rate, entrant.local_win_rate, entrant.motor_number,
+         entrant.motor_top2_rate, entrant.assigned_boat_number, entrant.boat_top2_rate)
+        for entrant in race.entrants
+    ]
+    cursor.executemany('''
+        INSERT OR REPLACE INTO race_entrants
+        (race_date, venue_id, race_number, boat_number, racer_number, racer_name, class_number,
+         average_st, national_win_rate, national_top2_rate, local_win_rate, motor_number,
+         motor_top2_rate, assigned_boat_number, boat_top2_rate)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+def _table_columns(cursor, table: str) -> Set[str]:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_typed_columns(cursor) -> Dict[str, Set[str]]:
+    """既存テーブルに不足している型付きカラムを追加し、テーブルごとのカラム一覧を返す"""
+    tables = {}
+    for table, columns in TYPED_COLUMNS.items():
+        existing = _table_columns(cursor, table)
+        if not existing:
+            continue
+        for column, column_type in columns:
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+                existing.add(column)
+        tables[table] = existing
+    return tables
+
+
+def _prediction_positions(predicted_place, predicted_trifecta=None) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """予想順位（3艇そろった三連単予想を優先し、なければ predicted_place）"""
+    positions = top3(predicted_trifecta)
+    return positions if None not in positions else top3(predicted_place)
+
+
+def _fill_prediction_positions(cursor, tables: Dict[str, Set[str]]) -> int:
+    """pred_pos1..3 が未設定の予想行を埋める（何度実行しても同じ結果）"""
+    columns = tables.get('predictions', ())
+    if 'predicted_place' not in columns:
+        return 0
+    trifecta = 'predicted_trifecta' if 'predicted_trifecta' in columns else 'NULL'
+    cursor.execute(f'''
+        SELECT rowid, predicted_place, {trifecta} FROM predictions
+        WHERE pred_pos1 IS NULL AND (predicted_place IS NOT NULL OR {trifecta} IS NOT NULL)
+    ''')
+    rows = [_prediction_positions(predicted_place, predicted_trifecta) + (rowid,)
+            for rowid, predicted_place, predicted_trifecta in cursor.fetchall()]
+    rows = [row for row in rows if row[0] is not None]
+    cursor.executemany('UPDATE predictions SET pred_pos1 = ?, pred_pos2 = ?, pred_pos3 = ? WHERE rowid = ?', rows)
+    return len(rows)
+
+
+def _position_triggers(columns: Set[str]) -> List[str]:
+    """予想行の追加・更新時に pred_pos1..3 を埋めるトリガー
+    （艇番は1桁なので、区切り記号を除いた数字列の1-3文字目を順位とする。'N' などは NULL）"""
+    if 'predicted_place' not in columns:
+        return []
+    source = 'NEW.predicted_place'
+    watched = 'predicted_place'
+    if 'predicted_trifecta' in columns:
+        source = ("CASE WHEN NEW.predicted_trifecta GLOB '*[1-6]*[1-6]*[1-6]*' "
+                  "THEN NEW.predicted_trifecta ELSE NEW.predicted_place END")
+        watched += ', predicted_trifecta'
+    digits = source
+    for symbol in ('[', ']', ' ', ',', '-'):
+        digits = f"replace({digits}, '{symbol}', '')"
+    assignments = ', '.join(
+        f'pred_pos{position} = NULLIF(CAST(substr({digits}, {position}, 1) AS INTEGER), 0)'
+        for position in (1, 2, 3)
+    )
+    update = f'UPDATE predictions SET {assignments} WHERE rowid = NEW.rowid;'
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS predictions_positions_insert AFTER INSERT ON predictions
+        WHEN NEW.pred_pos1 IS NULL
+        BEGIN {update} END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS predictions_positions_update AFTER UPDATE OF {watched} ON predictions
+        BEGIN {update} END
+        '''
+    ]
+
+
+def _migrate_rows(cursor, tables: Dict[str, Set[str]]) -> Dict[str, int]:
+    """既存行のJSON・文字列を型付きカラムに移行"""
+    counts = {}
+
+    if 'predicted_place' in tables.get('predictions', ()):
+        counts['predictions'] = _fill_prediction_positions(cursor, tables)
+
+    details = tables.get('race_details', ())
+    if 'prediction_data' in details:
+        race_column = 'race_data' if 'race_data' in details else 'NULL'
+        cursor.execute(f'''
+            SELECT rowid, race_date, prediction_data, {race_column} FROM race_details
+            WHERE pred_pos1 IS NULL AND prediction_data IS NOT NULL
+        ''')
+        rows = []
+        entrants = 0
+        for rowid, race_date, prediction_data, race_data in cursor.fetchall():
+            try:
+                prediction = json.loads(prediction_data)
+            except (TypeError, ValueError):
+                continue
+            rows.append(prediction_columns(prediction if isinstance(prediction, dict) else None) + (rowid,))
+            if race_data:
+                try:
+                    entrants += save_entrants(cursor, race_date, json.loads(race_data))
+                except (TypeError, ValueError):
+                    pass
+        cursor.executemany('''
+            UPDATE race_details SET predicted_win = ?, confidence = ?, pred_pos1 = ?, pred_pos2 = ?, pred_pos3 = ?
+            WHERE rowid = ?
+        ''', rows)
+        counts['race_details'] = len(rows)
+        counts['race_entrants'] = entrants
+
+    if 'place_results' in tables.get('race_results', ()):
+        cursor.execute('SELECT rowid, place_results FROM race_results WHERE second_boat IS NULL AND place_results IS NOT NULL')
+        rows = [top3(place_results) + (rowid,) for rowid, place_results in cursor.fetchall()]
+        cursor.executemany('''
+            UPDATE race_results SET winning_boat = COALESCE(winning_boat, ?), second_boat = ?, third_boat = ?
+            WHERE rowid = ?
+        ''', rows)
+        counts['race_results'] = len(rows)
+
+    return counts
+
+
+def _migrate_trifecta(cursor, tables: Dict[str, Set[str]]) -> Dict[str, int]:
+    """三連単予想（predicted_trifecta）が3艇そろっている行は pred_pos1..3 をそれで上書き"""
+    if 'predicted_trifecta' not in tables.get('predictions', ()):
+        return {}
+    cursor.execute('SELECT rowid, predicted_trifecta FROM predictions WHERE predicted_trifecta IS NOT NULL')
+    rows = [positions + (rowid,) for rowid, predicted_trifecta in cursor.fetchall()
+            for positions in [top3(predicted_trifecta)] if None not in positions]
+    cursor.executemany('UPDATE predictions SET pred_pos1 = ?, pred_pos2 = ?, pred_pos3 = ? WHERE rowid = ?', rows)
+    return {'predictions_trifecta': len(rows)}
+
+
+# 適用順の移行（名前ごとに一度だけ実行）
+MIGRATIONS = (
+    (MIGRATION_NAME, _migrate_rows),
+    (TRIFECTA_MIGRATION_NAME, _migrate_trifecta)
+)
+
+
+def ensure_typed_schema(db_path: str) -> Optional[Dict[str, int]]:
+    """型付きカラムと race_entrants を用意し、未移行なら既存行を一度だけ移行（プロセス内では初回のみ確認）"""
+    key = os.path.abspath(db_path)
+    if key in _ready_paths:
+        return None
+    with _ready_lock:
+        if key in _ready_paths:
+            return None
+        if not os.path.exists(db_path):
+            return None
+        try:
+            with sqlite_connect(db_path) as conn:
+                cursor = conn.cursor()
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                tables = _add_typed_columns(cursor)
+
+                counts = None
+                for name, migrate in MIGRATIONS:
+                    cursor.execute('SELECT 1 FROM schema_migrations WHERE name = ?', (name,))
+                    if cursor.fetchone() is not None:
+                        continue
+                    counts = dict(counts or {}, **migrate(cursor, tables))
+                    cursor.execute('INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)',
+                                   (name, datetime.now().isoformat()))
+                if counts is not None:
+                    logger.info(f"型付きカラムへの移行完了: {db_path} {counts}")
+
+                # 移行後に追加された予想行（トリガー作成前の外部書き込み）を補完し、以降はトリガーで埋める
+                filled = _fill_prediction_positions(cursor, tables)
+                if filled:
+                    logger.info(f"予想順位の未設定行を補完: {db_path} {filled}件")
+                for statement in _position_triggers(tables.get('predictions', set())):
+                    cursor.execute(statement)
+                conn.commit()
+            _ready_paths.add(key)
+            return counts
+        except Exception as e:
+            logger.error(f"型付きカラム移行エラー: {e}")
+            return None
@@ -5,6 +5,7 @@ Flaskアプリケーションの初期化と起動を管理
 """
 
 import sys
+import time
 import logging
 from datetime import datetime
 
@@ -12,10 +13,16 @@ from datetime import datetime
 from config.app_config import AppConfig
 from config.logging_config import setup_logging, get_logger
 from core.component_initializer import initialize_components
+from core.metrics import init_request_metrics
+from core.openapi_endpoint import set_base_url
+from core.query_profiler import get_query_stats
+from core.request_tracing import init_request_tracing
 
 def create_application():
     """Flaskアプリケーションを作成"""
     try:
+        started = time.perf_counter()
+        
         # ログ設定の初期化
         setup_logging()
         logger = get_logger(__name__)
@@ -23,6 +30,20 @@ def create_application():
         # Flaskアプリケーションの作成
         app = AppConfig.create_flask_app()
         
+        # エンドポイント別リクエストメトリクス
+        init_request_metrics(app)
+        
+        # リクエストトレーシング（Server-Timing・遅いトレース記録）
+        tracing_config = AppConfig.get_tracing_config()
+        if tracing_config['enabled']:
+            init_request_tracing(app, tracing_config['slow_trace_capacity'], tracing_config['server_timing'])
+        
+        # SQLite遅延クエリのしきい値
+        get_query_stats().slow_query_ms = AppConfig.get_database_config()['slow_query_ms']
+        
+        # BoatraceOpenAPI の接続先（ローカルの再生サーバーを指定するとオフラインで再現可能）
+        set_base_url(AppConfig.get_api_config()['base_url'])
+        
         # システムコンポーネントの初期化
         components = initialize_components(app, logger)
         
@@ -30,7 +51,7 @@ def create_application():
         # システム情報の出力
         _print_system_info()
         
-        logger.info("アプリケーション作成完了")
+        logger.info(f"アプリケーション作成完了 ({(time.perf_counter() - started) * 1000:.0f}ms)")
         return app, components
         
     except Exception as e:
@@ -5,20 +5,48 @@ Admin Routes - 管理・その他ルート
 """
 
 import json
-import sqlite3
 import requests
 import logging
 import asyncio
+import itertools
 from datetime import datetime, timedelta
-from flask import jsonify, render_template, request
+from flask import Response, current_app, jsonify, render_template, request, stream_with_context
 
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+_modules_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _modules_dir not in sys.path:
+    sys.path.append(_modules_dir)
 from api_fetcher import VENUE_MAPPING
+from core.data_calendar import get_data_calendar
+from core.date_view import bump_data_version
+from core.historical_data_analyzer import HistoricalDataAnalyzer
+from core.openapi_endpoint import results_url
+from core.query_profiler import connect as sqlite_connect, get_query_stats
+from core.request_tracing import get_trace_buffer
+from core.result_update import save_results
 
 logger = logging.getLogger(__name__)
 
+# ストリーミング描画でまとめて送るテンプレート出力の単位
+STREAM_BUFFER_SIZE = 50
+
+
+def _stream_template(template_name, **context):
+    """テンプレートを生成しながら送信する（先頭のサマリーから順に送る）"""
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
+def _logged_rows(rows, label):
+    """送信中の読み出しエラーはログに残して打ち切る（ヘッダー送信後はエラーページにできないため）"""
+    try:
+        yield from rows
+    except Exception as e:
+        logger.error(f"{label}の読み出しエラー: {e}")
+
 class AdminRoutes:
     """管理・その他ルートハンドラー"""
     
@@ -39,6 +67,8 @@ class AdminRoutes:
         self.app.add_url_rule('/api/clear-test-results', 'api_clear_test_results', self.api_clear_test_results, methods=['POST', 'GET'])
         self.app.add_url_rule('/historical', 'historical_report', self.historical_report)
         self.app.add_url_rule('/api/historical/<start_date>/<end_date>', 'api_historical_data', self.api_historical_data)
+        self.app.add_url_rule('/api/admin/slow-traces', 'api_slow_traces', self.api_slow_traces, methods=['GET', 'DELETE'])
+        self.app.add_url_rule('/api/admin/query-stats', 'api_query_stats', self.api_query_stats, methods=['GET', 'DELETE'])
     
     def accuracy_report(self, date=None):
         """的中率レポート（日付別）"""
@@ -47,16 +77,14 @@ class AdminRoutes:
                 date = datetime.now().strftime('%Y-%m-%d')
             
             tracker = self.AccuracyTracker()
-            logger.info(f"AccuracyTrackerインスタンス作成完了: {type(tracker).__name__}")
-            logger.info(f"AccuracyTracker DB path: {getattr(tracker, 'db_path', 'N/A')}")
+            logger.debug(f"AccuracyTracker: {type(tracker).__name__} ({getattr(tracker, 'db_path', 'N/A')})")
             
             # 指定日の的中率を計算
             accuracy_summary = tracker.calculate_accuracy(date)
-            logger.info(f"calculate_accuracy結果: summary={accuracy_summary}")
             
             # 指定日のレース一覧を取得
             race_list = tracker.get_all_races_by_date(date)
-            logger.info(f"デバッグ: race_list長さ={len(race_list)}, 最初のレース={race_list[0] if race_list else 'なし'}")
+            logger.debug(f"race_list長さ={len(race_list)}")
             
             # 完全なデータ（発走時間+予想+結果）が存在する前日・翌日を検索
             current_date = datetime.strptime(date, '%Y-%m-%d')
@@ -103,19 +131,38 @@ class AdminRoutes:
         """的中率レポート（全期間）"""
         try:
             tracker = self.AccuracyTracker()
-            logger.info(f"AccuracyTrackerインスタンス作成完了: {type(tracker).__name__}")
-            logger.info(f"AccuracyTracker DB path: {getattr(tracker, 'db_path', 'N/A')}")
+            logger.debug(f"AccuracyTracker: {type(tracker).__name__} ({getattr(tracker, 'db_path', 'N/A')})")
             
             # 全期間の的中率を計算（target_date=Noneで全データ取得）
             accuracy_summary = tracker.calculate_accuracy(target_date=None)
-            logger.info(f"calculate_accuracy結果: summary={accuracy_summary}")
+            today = datetime.now().strftime('%Y-%m-%d')
+            
+            import time
+            if hasattr(tracker, 'iter_all_races'):
+                # 全期間のレース一覧は1日分ずつ読みながらストリーミングで描画
+                rows = _logged_rows(tracker.iter_all_races(), '全期間レース一覧')
+                first = next(rows, None)
+                races = itertools.chain([first], rows) if first is not None else []
+                return _stream_template('accuracy_report.html',
+                                        date='全期間',
+                                        current_date='全期間',
+                                        prev_date=None,
+                                        next_date=None,
+                                        is_today=False,
+                                        today=today,
+                                        timestamp=int(time.time()),
+                                        accuracy_data={
+                                            'summary': accuracy_summary,
+                                            'venues': VENUE_MAPPING
+                                        },
+                                        summary=accuracy_summary,
+                                        races=races,
+                                        venues=VENUE_MAPPING)
             
             # 今日のレース一覧を取得（全期間なら今日のデータを表示）
-            today = datetime.now().strftime('%Y-%m-%d')
             race_list = tracker.get_all_races_by_date(today)
-            logger.info(f"デバッグ: race_list長さ={len(race_list)}, 最初のレース={race_list[0] if race_list else 'なし'}")
+            logger.debug(f"race_list長さ={len(race_list)}")
             
-            import time
             return render_template('accuracy_report.html',
                                  date='全期間',
                                  current_date='全期間',
@@ -209,57 +256,14 @@ class AdminRoutes:
             logger.info("実際のレース結果を自動取得中...")
             
             # 今日の実際の結果を取得
-            results_url = 'https://boatraceopenapi.github.io/results/v2/today.json'
-            response = requests.get(results_url, timeout=10)
+            response = requests.get(results_url(), timeout=10)
             
             if response.status_code == 200:
                 results_data = response.json()
                 
                 # 結果をデータベースに保存
-                updated_count = 0
-                with sqlite3.connect(tracker.db_path) as conn:
-                    cursor = conn.cursor()
-                    
-                    for race in results_data.get('results', []):
-                        venue_id = race.get('race_stadium_number')
-                        race_number = race.get('race_number')
-                        
-                        # 着順データを整理
-                        boats = race.get('boats', [])
-                        place_results = [None, None, None]
-                        
-                        for boat in boats:
-                            place = boat.get('racer_place_number')
-                            boat_num = boat.get('racer_boat_number')
-                            if place and place <= 3:
-                                place_results[place-1] = boat_num
-                        
-                        # 1位が決まっていれば結果データとして保存
-                        if place_results[0] is not None:
-                            winning_boat = place_results[0]
-                            venue_name = VENUE_MAPPING.get(venue_id, '不明')
-                            
-                            # 三連単結果作成（不明な順位はNullで保存）
-                            second_boat = place_results[1]
-                            third_boat = place_results[2]
-                            trifecta_result = f"{place_results[0]}-{place_results[1] or 'N'}-{place_results[2] or 'N'}"
-                            cursor.execute('''
-                                INSERT OR REPLACE INTO race_results
-                                (race_date, venue_id, venue_name, race_number, winning_boat, second_boat, third_boat, trifecta_result, raw_result_data, fetched_at)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (datetime.now().strftime('%Y-%m-%d'), venue_id, venue_name, race_number,
-                                  winning_boat, second_boat, third_boat, trifecta_result, '{"auto_updated": true}', datetime.now().isoformat()))
-                            
-                            updated_count += 1
-                    
-                    conn.commit()
-                
-                if updated_count > 0:
-                    logger.info(f"実際の結果を自動更新: {updated_count}件")
-                    return updated_count
-                else:
-                    logger.info("更新対象のレース結果がありませんでした")
-                    return 0
+                programs = (self.fetcher.get_today_races() or {}).get('programs', [])
+                return save_results(tracker.db_path, results_data.get('results', []), programs)
             else:
                 logger.warning(f"結果データAPI失敗: HTTP {response.status_code}")
                 return 0
@@ -268,6 +272,64 @@ class AdminRoutes:
             logger.warning(f"自動結果更新失敗: {e}")
             raise e
     
+    def api_slow_traces(self):
+        """遅いリクエストトレース一覧API（DELETEでクリア）"""
+        try:
+            buffer = get_trace_buffer()
+            if request.method == 'DELETE':
+                buffer.clear()
+                return jsonify({'success': True, 'message': 'トレースをクリアしました'})
+            
+            limit = request.args.get('limit', type=int)
+            path_prefix = request.args.get('path')
+            traces = buffer.slowest()
+            if path_prefix:
+                traces = [t for t in traces if t['path'].startswith(path_prefix)]
+            if limit:
+                traces = traces[:limit]
+            
+            return jsonify({
+                'success': True,
+                'capacity': buffer.capacity,
+                'recorded_requests': buffer.recorded,
+                'traces': traces
+            })
+        except Exception as e:
+            logger.error(f"トレース取得エラー: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    def api_query_stats(self):
+        """SQLiteステートメント別統計API（DELETEでリセット）"""
+        try:
+            stats = get_query_stats()
+            if request.method == 'DELETE':
+                stats.reset()
+                return jsonify({'success': True, 'message': 'クエリ統計をリセットしました'})
+            
+            sort_by = request.args.get('sort', 'total_ms')
+            if sort_by not in ('total_ms', 'avg_ms', 'max_ms', 'count', 'slow_count'):
+                sort_by = 'total_ms'
+            statements = stats.get_stats(
+                sort_by=sort_by,
+                limit=request.args.get('limit', type=int),
+                slow_only=request.args.get('slow_only') == '1'
+            )
+            
+            return jsonify({
+                'success': True,
+                'slow_query_ms': stats.slow_query_ms,
+                'statements': statements
+            })
+        except Exception as e:
+            logger.error(f"クエリ統計取得エラー: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
     def api_clear_test_results(self):
         """不適切なテスト結果データを削除するAPI"""
         try:
@@ -276,7 +338,7 @@ class AdminRoutes:
             today = datetime.now().strftime('%Y-%m-%d')
             
             # テストデータまたは全ての結果データを削除
-            with sqlite3.connect(tracker.db_path) as conn:
+            with sqlite_connect(tracker.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # race_results テーブルから今日のデータを削除
@@ -287,6 +349,7 @@ class AdminRoutes:
                 
                 deleted_count = cursor.rowcount
                 conn.commit()
+            bump_data_version(tracker.db_path, today)
                 
             logger.info(f"不適切な結果データを削除: {deleted_count}件")
             
@@ -322,65 +385,25 @@ class AdminRoutes:
             return 0
     
     def _find_previous_data_date(self, current_date, tracker):
-        """完全なデータ（発走時間+予想+結果）が存在する前の日付を検索"""
+        """完全なデータ（予想+結果）が存在する前の日付を検索"""
         try:
-            import sqlite3
-            with sqlite3.connect('cache/accuracy_tracker.db') as conn:
-                cursor = conn.cursor()
-                # race_detailsとrace_resultsの両方にデータがある日付を検索
-                cursor.execute('''
-                    SELECT rd.race_date 
-                    FROM race_details rd
-                    INNER JOIN race_results rr ON rd.race_date = rr.race_date
-                    WHERE rd.race_date < ? 
-                      AND rd.prediction_data IS NOT NULL
-                      AND rr.winning_boat IS NOT NULL
-                    GROUP BY rd.race_date 
-                    HAVING COUNT(DISTINCT rd.race_number) >= 10 
-                       AND COUNT(DISTINCT rr.race_number) >= 5
-                    ORDER BY rd.race_date DESC 
-                    LIMIT 1
-                ''', (current_date.strftime('%Y-%m-%d'),))
-                
-                result = cursor.fetchone()
-                return result[0] if result else None
-        except:
+            return get_data_calendar(tracker.db_path).previous_date(current_date.strftime('%Y-%m-%d'))
+        except Exception as e:
+            logger.warning(f"前日検索エラー: {e}")
             return None
     
     def _find_next_data_date(self, current_date, tracker):
-        """完全なデータ（発走時間+予想+結果）が存在する次の日付を検索"""
+        """完全なデータ（予想+結果）が存在する次の日付を検索"""
         try:
-            import sqlite3
-            with sqlite3.connect('cache/accuracy_tracker.db') as conn:
-                cursor = conn.cursor()
-                # race_detailsとrace_resultsの両方にデータがある日付を検索
-                cursor.execute('''
-                    SELECT rd.race_date 
-                    FROM race_details rd
-                    INNER JOIN race_results rr ON rd.race_date = rr.race_date
-                    WHERE rd.race_date > ? 
-                      AND rd.prediction_data IS NOT NULL
-                      AND rr.winning_boat IS NOT NULL
-                    GROUP BY rd.race_date 
-                    HAVING COUNT(DISTINCT rd.race_number) >= 10 
-                       AND COUNT(DISTINCT rr.race_number) >= 5
-                    ORDER BY rd.race_date ASC 
-                    LIMIT 1
-                ''', (current_date.strftime('%Y-%m-%d'),))
-                
-                result = cursor.fetchone()
-                return result[0] if result else None
-        except:
+            return get_data_calendar(tracker.db_path).next_date(current_date.strftime('%Y-%m-%d'))
+        except Exception as e:
+            logger.warning(f"翌日検索エラー: {e}")
             return None
     
     def historical_report(self):
         """履歴データレポート（期間選択機能付き）"""
         try:
-            # 履歴データ分析クラスをインポート
-            sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'core'))
-            from historical_data_analyzer import HistoricalDataAnalyzer
-            
-            analyzer = HistoricalDataAnalyzer()
+            analyzer = HistoricalDataAnalyzer(self.AccuracyTracker().db_path)
             
             # 期間選択用データを取得
             selector_data = analyzer.generate_period_selector_data()
@@ -407,15 +430,15 @@ class AdminRoutes:
     def api_historical_data(self, start_date, end_date):
         """期間別履歴データAPI"""
         try:
-            # 履歴データ分析クラスをインポート
-            sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'core'))
-            from historical_data_analyzer import HistoricalDataAnalyzer
+            analyzer = HistoricalDataAnalyzer(self.AccuracyTracker().db_path)
             
-            analyzer = HistoricalDataAnalyzer()
+            # 会場の絞り込み（?venues=2,5 のようにカンマ区切り）
+            venues_param = request.args.get('venues', '')
+            venue_ids = [int(v) for v in venues_param.split(',') if v.strip().isdigit()] or None
             
-            # 期間別データを取得
-            accuracy_report = analyzer.get_accuracy_report_by_date_range(start_date, end_date)
-            venue_analysis = analyzer.get_venue_performance_analysis(start_date, end_date)
+            # 期間別データを取得（累積和の差分で期間の長さによらず一定時間）
+            accuracy_report = analyzer.get_accuracy_report_by_date_range(start_date, end_date, venue_ids)
+            venue_analysis = analyzer.get_venue_performance_analysis(start_date, end_date, venue_ids)
             
             return jsonify({
                 'success': True,
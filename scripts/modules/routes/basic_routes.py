@@ -9,8 +9,13 @@ from flask import jsonify, request
 from datetime import datetime
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+_modules_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _modules_dir not in sys.path:
+    sys.path.append(_modules_dir)
 from core.dummy_data_generator import format_race_data_for_api
+from core.query_profiler import connect as sqlite_connect
+from core.race_model import get_races
+from core.race_timeline import parse_race_time
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +51,6 @@ class BasicRoutes:
                 logger.info(f"過去の日付が指定されました: {date_param}")
                 
                 try:
-                    import sqlite3
                     import os
                     # プロジェクトルートのデータベースパス
                     current_dir = os.path.dirname(os.path.abspath(__file__))  # routes/
@@ -55,7 +59,7 @@ class BasicRoutes:
                     project_root = os.path.dirname(scripts_dir)              # kyotei/
                     db_path = os.path.join(project_root, 'cache', 'comprehensive_kyotei.db')
                     
-                    conn = sqlite3.connect(db_path)
+                    conn = sqlite_connect(db_path)
                     cursor = conn.cursor()
                     cursor.execute("""
                         SELECT venue_id, race_number, race_title, start_time
@@ -92,13 +96,10 @@ class BasicRoutes:
                                 # 今日以外は終了済み
                                 is_finished = True
                             elif row[3] and row[3] != '不明':
-                                # 今日のレースで時刻が分かる場合は現在時刻と比較
-                                try:
-                                    race_time = datetime.strptime(f"{date_param} {row[3]}", '%Y-%m-%d %H:%M:%S')
-                                    is_finished = now > race_time
-                                except:
-                                    # 時刻パースに失敗した場合は未完了とする
-                                    is_finished = False
+                                # 今日のレースで時刻が分かる場合は現在時刻と比較（解析結果はメモ化）
+                                race_time = parse_race_time(f"{date_param} {row[3]}")
+                                # 時刻パースに失敗した場合は未完了とする
+                                is_finished = race_time is not None and now > race_time
                             
                             race = {
                                 'race_id': f"{row[0]}_{row[1]}",
@@ -140,7 +141,8 @@ class BasicRoutes:
             # programs配列を抽出してracesとして返す
             raw_races_list = []
             if raw_races and 'programs' in raw_races:
-                raw_races_list = raw_races['programs']
+                # プログラムはスナップショット単位で一度だけ解析
+                raw_races_list = get_races(raw_races['programs'])
             elif isinstance(raw_races, list):
                 raw_races_list = raw_races
             else:
@@ -204,7 +206,6 @@ class BasicRoutes:
     def debug_db_test(self):
         """データベース接続デバッグ用"""
         try:
-            import sqlite3
             import os
             from flask import request
             
@@ -228,7 +229,7 @@ class BasicRoutes:
             }
             
             if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
+                conn = sqlite_connect(db_path)
                 cursor = conn.cursor()
                 
                 # テーブル存在確認
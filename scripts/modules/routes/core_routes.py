@@ -5,23 +5,39 @@ Core Routes - 基本ルート
 """
 
 import logging
+import time
 from datetime import datetime
-from flask import render_template, request
+from flask import Response, jsonify, render_template, request
+
+import sys
+import os
+_modules_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _modules_dir not in sys.path:
+    sys.path.append(_modules_dir)
+from core.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
 class CoreRoutes:
     """基本ルートハンドラー"""
     
-    def __init__(self, app, fetcher):
+    def __init__(self, app, fetcher, registry=None):
         self.app = app
         self.fetcher = fetcher
+        self.registry = registry
+        
+        # 的中率サマリーのキャッシュ（ライブ統計の30秒ポーリング対策）
+        self._accuracy_cache = {'data': None, 'timestamp': 0, 'expiry_seconds': 60}
+        
         self._register_routes()
     
     def _register_routes(self):
         """基本ルートを登録"""
         self.app.add_url_rule('/', 'index', self.index)
         self.app.add_url_rule('/test', 'test', self.test)
+        self.app.add_url_rule('/api/system/components', 'api_system_components', self.api_system_components)
+        self.app.add_url_rule('/api/system/live-stats', 'api_system_live_stats', self.api_system_live_stats)
+        self.app.add_url_rule('/metrics', 'metrics', self.prometheus_metrics)
     
     def index(self):
         """メインページ（軽量化版）"""
@@ -51,4 +67,117 @@ class CoreRoutes:
     
     def test(self):
         """テストページ"""
-        return "System OK", 200
\ No newline at end of file
+        return "System OK", 200
+    
+    def api_system_components(self):
+        """コンポーネント初期化状態API"""
+        try:
+            components = self.registry.get_init_report() if self.registry else {}
+            return jsonify({
+                'success': True,
+                'components': components
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    def api_system_live_stats(self):
+        """ライブ統計API（live_stats.html 用の値とメトリクス）"""
+        try:
+            snapshot = get_metrics().snapshot()
+            accuracy = self._get_accuracy_summary()
+            
+            current_accuracy = accuracy['today'].get('win_accuracy', 0) / 100
+            avg_accuracy = accuracy['overall'].get('win_accuracy', 0) / 100
+            if accuracy['today'].get('completed_races', 0) == 0:
+                direction = 'stable'
+            elif current_accuracy > avg_accuracy + 0.02:
+                direction = 'up'
+            elif current_accuracy < avg_accuracy - 0.02:
+                direction = 'down'
+            else:
+                direction = 'stable'
+            
+            request_success = self._success_ratio(snapshot, 'http_requests_total',
+                                                  lambda labels: labels.get('status') != '5xx')
+            
+            return jsonify({
+                'success': True,
+                'current_accuracy': current_accuracy,
+                'avg_accuracy': avg_accuracy,
+                'prediction_count': accuracy['overall'].get('total_predictions', 0),
+                'success_rate': request_success if request_success is not None else 1.0,
+                'trend': {'direction': direction},
+                'systems': self._build_system_status(snapshot, request_success),
+                'metrics': snapshot
+            })
+        except Exception as e:
+            logger.error(f"ライブ統計取得エラー: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    def prometheus_metrics(self):
+        """Prometheus テキスト形式のメトリクス"""
+        return Response(get_metrics().to_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    
+    def _get_accuracy_summary(self):
+        """本日・全期間の的中率サマリー（一定時間キャッシュ）"""
+        cache = self._accuracy_cache
+        if cache['data'] is not None and time.time() - cache['timestamp'] < cache['expiry_seconds']:
+            get_metrics().cache_hit('live_stats_accuracy', True)
+            return cache['data']
+        
+        get_metrics().cache_hit('live_stats_accuracy', False)
+        data = {'today': {}, 'overall': {}}
+        if self.registry:
+            try:
+                tracker = self.registry.get('accuracy_tracker')()
+                today = datetime.now().strftime('%Y-%m-%d')
+                for key, target_date in (('today', today), ('overall', None)):
+                    result = tracker.calculate_accuracy(target_date) or {}
+                    data[key] = result.get('summary', result)
+            except Exception as e:
+                logger.warning(f"的中率サマリー取得エラー: {e}")
+        
+        cache['data'] = data
+        cache['timestamp'] = time.time()
+        return data
+    
+    def _success_ratio(self, snapshot, counter_name, is_success):
+        """カウンターの成功割合（データがなければNone）"""
+        total = 0
+        succeeded = 0
+        for counter in snapshot['counters']:
+            if counter['name'] == counter_name:
+                total += counter['value']
+                if is_success(counter['labels']):
+                    succeeded += counter['value']
+        return succeeded / total if total else None
+    
+    def _build_system_status(self, snapshot, request_success):
+        """サブシステム別の稼働状況"""
+        fetch_count = sum(h['count'] for h in snapshot['histograms'] if h['name'] == 'upstream_fetch_seconds')
+        fetch_errors = sum(c['value'] for c in snapshot['counters'] if c['name'] == 'upstream_fetch_errors_total')
+        job_runs = sum(h['count'] for h in snapshot['histograms'] if h['name'] == 'scheduler_job_seconds')
+        job_failures = sum(c['value'] for c in snapshot['counters'] if c['name'] == 'scheduler_job_failures_total')
+        cache_hit_ratio = self._success_ratio(snapshot, 'cache_requests_total',
+                                              lambda labels: labels.get('result') == 'hit')
+        
+        ratios = [
+            ('Webリクエスト', request_success),
+            ('上流API取得', 1 - fetch_errors / fetch_count if fetch_count else None),
+            ('キャッシュ', cache_hit_ratio),
+            ('スケジューラー', 1 - job_failures / job_runs if job_runs else None)
+        ]
+        return [
+            {
+                'name': name,
+                'status': '稼働中' if ratio is not None else 'データなし',
+                'accuracy': ratio if ratio is not None else 0.0
+            }
+            for name, ratio in ratios
+        ]
@@ -10,8 +10,12 @@ from flask import render_template, jsonify, request
 
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from api_fetcher import VENUE_MAPPING, calculate_prediction
+_modules_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _modules_dir not in sys.path:
+    sys.path.append(_modules_dir)
+from api_fetcher import VENUE_MAPPING, calculate_prediction, run_async_in_thread
+from core.openapi_endpoint import results_url
+from core.request_tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -43,20 +47,28 @@ class PredictionRoutes:
             if not race_info['valid']:
                 return race_info['error_response']
             
+            # 今日のレースは出走表と結果を並行取得
+            with span('api_day_bundle', 'upstream'):
+                bundle = self._fetch_day_bundle(race_info)
+            
             # レースデータを取得
-            race_data, prediction_result = self._fetch_race_data(race_info)
+            with span('fetch_race_data'):
+                race_data, prediction_result = self._fetch_race_data(race_info, bundle)
             
             # レース結果を取得
-            race_results = self._get_race_results(race_info)
+            with span('race_results'):
+                race_results = self._get_race_results(race_info, bundle)
             
             # 予想結果を取得
-            prediction_result = self._get_prediction_result(race_data, prediction_result, race_info)
+            with span('prediction'):
+                prediction_result = self._get_prediction_result(race_data, prediction_result, race_info)
             
             if not prediction_result:
                 return self._render_error_template(race_id, "予想データの生成に失敗しました。しばらく時間をおいて再度お試しください。")
             
             # テンプレートを描画
-            return self._render_race_template(race_info, race_data, prediction_result, race_results)
+            with span('render'):
+                return self._render_race_template(race_info, race_data, prediction_result, race_results)
             
         except Exception as e:
             logger.error(f"予想ページエラー: {e}")
@@ -87,15 +99,38 @@ class PredictionRoutes:
                 'error_response': (f"レースID解析エラー: {race_id}", 400)
             }
     
-    def _fetch_race_data(self, race_info):
+    def _is_today(self, race_info):
+        return race_info['race_date'] is None or race_info['race_date'] == datetime.now().strftime('%Y-%m-%d')
+    
+    def _fetch_day_bundle(self, race_info):
+        """今日の出走表と結果を並行取得（過去日・取得失敗時は None）"""
+        if not self._is_today(race_info):
+            return None
+        try:
+            return run_async_in_thread(self.fetcher.get_day_bundle_async())
+        except Exception as e:
+            logger.warning(f"出走表・結果の並行取得失敗: {e}")
+            return None
+    
+    def _find_in(self, items, race_info):
+        """会場・レース番号が一致する要素を探す"""
+        for item in items or []:
+            if (item.get('race_stadium_number') == race_info['venue_id'] and 
+                item.get('race_number') == race_info['race_number']):
+                return item
+        return None
+    
+    def _fetch_race_data(self, race_info, bundle=None):
         """レースデータを取得"""
         race_data = None
         prediction_result = None
         
         # 今日のAPIデータから取得を試行
-        if (race_info['race_date'] is None or 
-            race_info['race_date'] == datetime.now().strftime('%Y-%m-%d')):
-            race_data = self.fetcher.get_race_detail(race_info['venue_id'], race_info['race_number'])
+        if bundle is not None:
+            race_data = self._find_in(bundle['programs'], race_info)
+        elif self._is_today(race_info):
+            with span('api_race_detail', 'handler'):
+                race_data = self.fetcher.get_race_detail(race_info['venue_id'], race_info['race_number'])
         
         # APIデータがない場合、データベースから取得
         if not race_data:
@@ -110,11 +145,12 @@ class PredictionRoutes:
         """保存済みレースデータを取得"""
         try:
             tracker = self.AccuracyTracker()
-            saved_data = tracker.get_race_details(
-                race_info['venue_id'], 
-                race_info['race_number'], 
-                race_info['race_date']
-            )
+            with span('db_race_details', 'handler'):
+                saved_data = tracker.get_race_details(
+                    race_info['venue_id'], 
+                    race_info['race_number'], 
+                    race_info['race_date']
+                )
             if saved_data and saved_data.get('status') == 'found':
                 logger.info(f"データベースからレース詳細を取得: {race_info['venue_name']} {race_info['race_number']}R")
                 # DummyAccuracyTrackerの戻り値を適切な形式に変換
@@ -127,11 +163,15 @@ class PredictionRoutes:
         
         return None
     
-    def _get_race_results(self, race_info):
+    def _get_race_results(self, race_info, bundle=None):
         """レース結果を取得（過去レース対応）"""
         try:
             # まず今日のレースから結果を取得
-            today_races = self.fetcher.get_today_races()
+            if bundle is not None:
+                today_races = None
+            else:
+                with span('api_today_races', 'handler'):
+                    today_races = self.fetcher.get_today_races()
             if today_races and 'race_results' in today_races:
                 for race_result in today_races['race_results']:
                     if (race_result.get('venue_id') == race_info['venue_id'] and 
@@ -150,15 +190,19 @@ class PredictionRoutes:
                                 'status': 'found'
                             }
             
-            # BoatraceOpenAPIの結果APIから直接取得を試行
+            # BoatraceOpenAPIの結果APIから直接取得を試行（並行取得済みならそれを使う）
             try:
-                import requests
-                race_date = race_info.get('race_date', datetime.now().strftime('%Y-%m-%d'))
-                results_url = f"https://boatraceopenapi.github.io/results/v2/{race_date.replace('-', '')}.json"
-                response = requests.get(results_url, timeout=10)
+                if bundle is not None:
+                    results_data = {'results': bundle['results']}
+                else:
+                    import requests
+                    race_date = race_info.get('race_date', datetime.now().strftime('%Y-%m-%d'))
+                    url = results_url(race_date)
+                    with span('api_results', 'upstream', url):
+                        response = requests.get(url, timeout=10)
+                    results_data = response.json() if response.status_code == 200 else {}
                 
-                if response.status_code == 200:
-                    results_data = response.json()
+                if results_data:
                     for race_result in results_data.get('results', []):
                         if (race_result.get('race_stadium_number') == race_info['venue_id'] and 
                             race_result.get('race_number') == race_info['race_number']):
@@ -182,11 +226,12 @@ class PredictionRoutes:
             
             # フォールバック: AccuracyTrackerから取得
             tracker = self.AccuracyTracker()
-            race_results = tracker.get_race_results(
-                race_info['venue_id'], 
-                race_info['race_number'], 
-                race_info['race_date']
-            )
+            with span('db_race_results', 'handler'):
+                race_results = tracker.get_race_results(
+                    race_info['venue_id'], 
+                    race_info['race_number'], 
+                    race_info['race_date']
+                )
             if race_results:
                 logger.info(f"AccuracyTrackerからレース結果取得: {race_info['venue_name']} {race_info['race_number']}R")
             return race_results
@@ -205,11 +250,12 @@ class PredictionRoutes:
         try:
             tracker = self.AccuracyTracker()
             # venue_idとrace_numberで予想を生成
-            new_prediction = tracker._generate_real_prediction(
-                race_info['venue_id'], 
-                race_info['race_number'], 
-                race_data  # race_dataをオプション引数として渡す
-            )
+            with span('predict_tracker'):
+                new_prediction = tracker._generate_real_prediction(
+                    race_info['venue_id'], 
+                    race_info['race_number'], 
+                    race_data  # race_dataをオプション引数として渡す
+                )
             
             if new_prediction:
                 logger.info(f"予想システム使用 {race_info['venue_name']} {race_info['race_number']}R")
@@ -221,7 +267,8 @@ class PredictionRoutes:
         # フォールバック: race_dataがある場合のみ従来システムを使用
         if race_data:
             logger.warning("従来システムを使用")
-            prediction = calculate_prediction(race_data)
+            with span('predict_legacy'):
+                prediction = calculate_prediction(race_data)
             if prediction:
                 return prediction
             else:
@@ -231,9 +278,11 @@ class PredictionRoutes:
         logger.info("APIから直接データを取得して予想を試行")
         try:
             # 今日のデータを取得
-            today_data = self.fetcher.get_race_detail(race_info['venue_id'], race_info['race_number'])
+            with span('api_race_detail', 'handler'):
+                today_data = self.fetcher.get_race_detail(race_info['venue_id'], race_info['race_number'])
             if today_data:
-                prediction = calculate_prediction(today_data)
+                with span('predict_legacy'):
+                    prediction = calculate_prediction(today_data)
                 if prediction:
                     logger.info(f"API直接取得で予想成功: {race_info['venue_name']} {race_info['race_number']}R")
                     return prediction
@@ -284,7 +333,8 @@ class PredictionRoutes:
         else:
             # race_dataがない場合、直接APIから基本情報を取得
             try:
-                today_races = self.fetcher.get_today_races()
+                with span('api_today_races', 'handler'):
+                    today_races = self.fetcher.get_today_races()
                 if today_races and 'programs' in today_races:
                     for program in today_races['programs']:
                         if (program.get('race_stadium_number') == race_info['venue_id'] and 
@@ -6,14 +6,20 @@ Scheduler Service
 
 import json
 import logging
-import sqlite3
-import threading
-import time
 import os
-import schedule
-import requests
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set, Tuple
+
+from config.app_config import AppConfig
+from core.job_scheduler import TimerScheduler
+from core.date_view import bump_data_version
+from core.feature_store import get_feature_store, program_boats_by_race
+from core.metrics import get_metrics
+from core.query_profiler import connect as sqlite_connect
+from core.race_model import get_races
+from core.race_timeline import get_race_timeline
+from core.result_update import write_results
+from core.result_watch import ResultWatchQueue
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +32,21 @@ class IntegratedScheduler:
         self.EnhancedPredictor = enhanced_predictor_class
         
         self.is_running = False
-        self.thread = None
+        
+        # 結果取得モード（event: 締切時刻ベース, hourly: 17時以降毎時）
+        scheduler_config = AppConfig.get_scheduler_config()
+        self.job_timeouts = scheduler_config['job_timeouts']
+        self.timer = TimerScheduler(max_workers=scheduler_config['max_workers'])
+        self.result_mode = scheduler_config['result_mode']
+        self.result_watch = ResultWatchQueue(
+            first_delay_minutes=scheduler_config['result_delay_minutes'],
+            backoff_minutes=scheduler_config['result_backoff_minutes'],
+            backoff_max_minutes=scheduler_config['result_backoff_max_minutes'],
+            max_attempts=scheduler_config['result_max_attempts']
+        )
+        
+        # メトリクス集計時にキュー状態をゲージへ反映
+        get_metrics().register_collector(self._collect_metrics)
         
         # ログディレクトリ作成
         os.makedirs("logs", exist_ok=True)
@@ -42,38 +62,58 @@ class IntegratedScheduler:
         self.is_running = True
         
         # スケジュール設定
-        schedule.clear()
+        self.timer.clear()
         
         # AM6時に本日分データ取得
-        schedule.every().day.at("06:00").do(self.morning_data_collection)
+        self.timer.daily("06:00", self.morning_data_collection,
+                         timeout=self.job_timeouts.get('morning_data_collection'))
         
-        # 毎時間、結果データを確認・更新
-        schedule.every().hour.do(self.update_results_if_available)
+        if self.result_mode == 'event':
+            # 締切時刻に合わせて結果データを取得（次の取得予定時刻にだけ起床）
+            # 計画には上流取得・DB参照を伴うため、起動をブロックしないよう単発ジョブで実行
+            self.timer.once(datetime.now(), self.plan_result_fetches, name='plan_result_fetches')
+        else:
+            # 毎時間、結果データを確認・更新
+            self.timer.every(3600, self.update_results_if_available,
+                             timeout=self.job_timeouts.get('update_results_if_available'))
         
         # 毎日PM11時に的中率レポート更新
-        schedule.every().day.at("23:00").do(self.update_accuracy_report)
+        self.timer.daily("23:00", self.update_accuracy_report,
+                         timeout=self.job_timeouts.get('update_accuracy_report'))
+        
+        # 特徴量ストアを起動直後にバックグラウンドで読み込む
+        self.timer.once(datetime.now(), get_feature_store().ensure_loaded, name='feature_store_load')
         
         # バックグラウンドで実行
-        self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.thread.start()
+        self.timer.start()
         
-        logger.info("統合スケジューラー開始: AM6時データ取得, 毎時結果更新, PM11時レポート更新")
+        result_label = '締切後結果取得' if self.result_mode == 'event' else '毎時結果更新'
+        logger.info(f"統合スケジューラー開始: AM6時データ取得, {result_label}, PM11時レポート更新")
     
     def stop(self):
         """スケジューラー停止"""
         self.is_running = False
-        schedule.clear()
+        self.timer.clear()
+        self.timer.stop()
+        self.result_watch.clear()
         logger.info("統合スケジューラー停止")
     
-    def _run_scheduler(self):
-        """スケジューラーメインループ"""
-        while self.is_running:
-            try:
-                schedule.run_pending()
-                time.sleep(60)  # 1分間隔でチェック
-            except Exception as e:
-                logger.error(f"スケジューラーエラー: {e}")
-                time.sleep(60)
+    def _collect_metrics(self, metrics):
+        """スケジューラーのキュー状態をゲージに設定"""
+        status = self.timer.get_status()
+        metrics.set_gauge('scheduler_queue_depth', status['queue_depth'])
+        metrics.set_gauge('scheduler_running_jobs', status['running_jobs'])
+        metrics.set_gauge('scheduler_waiting_for_worker', status['waiting_for_worker'])
+        metrics.set_gauge('result_watch_pending_races', len(self.result_watch))
+    
+    def _arm_result_watch(self):
+        """次の結果取得予定時刻に単発ジョブを設定"""
+        next_due = self.result_watch.next_due()
+        if next_due is None:
+            self.timer.cancel('process_result_watch')
+            return
+        self.timer.once(next_due, self.process_result_watch,
+                        timeout=self.job_timeouts.get('process_result_watch'))
     
     def morning_data_collection(self):
         """AM6時: 本日分データ収集"""
@@ -91,15 +131,22 @@ class IntegratedScheduler:
                 programs = data['programs']
                 logger.info(f"本日のレース数: {len(programs)}件")
                 
+                # プログラムは一度だけ解析し、レースごとの再取得・再解析を避ける
+                races_by_key = {race.key: race for race in get_races(programs)}
+                enhanced_predictor = self.EnhancedPredictor()
+                
                 prediction_count = 0
                 for program in programs:
                     try:
                         venue_id = program['race_stadium_number']
                         race_number = program['race_number']
+                        race = races_by_key[(venue_id, race_number)]
                         
-                        # 強化予想システムで予測
-                        enhanced_predictor = self.EnhancedPredictor()
-                        prediction = enhanced_predictor.calculate_enhanced_prediction(venue_id, race_number, 'today')
+                        # 強化予想システムで予測（解析済みの出走表を直接渡す）
+                        if hasattr(enhanced_predictor, 'calculate_prediction_from_program'):
+                            prediction = enhanced_predictor.calculate_prediction_from_program(race)
+                        else:
+                            prediction = enhanced_predictor.calculate_enhanced_prediction(venue_id, race_number, 'today')
                         
                         if prediction:
                             # データベースに保存
@@ -114,6 +161,11 @@ class IntegratedScheduler:
                 
                 logger.info(f"予測データ生成・保存完了: {prediction_count}件")
             
+            # 本日分の結果取得を締切時刻から計画
+            if self.result_mode == 'event':
+                self.result_watch.clear()
+                self.plan_result_fetches()
+            
             # 的中率データファイルを更新
             self.update_accuracy_report()
             
@@ -131,86 +183,132 @@ class IntegratedScheduler:
             if current_time.hour >= 17:
                 logger.info("結果データ更新チェック実行")
                 
-                # 結果APIから取得
-                results_url = 'https://boatraceopenapi.github.io/results/v2/today.json'
-                response = requests.get(results_url, timeout=10)
-                
-                if response.status_code == 200:
-                    results_data = response.json()
-                    results = results_data.get('results', [])
-                    
-                    result_count = 0
-                    tracker = self.AccuracyTracker()
-                    current_date = current_time.strftime('%Y-%m-%d')
-                    
-                    with sqlite3.connect(tracker.db_path) as conn:
-                        cursor = conn.cursor()
-                        
-                        for race in results:
-                            try:
-                                venue_id = race.get('race_stadium_number')
-                                race_number = race.get('race_number')
-                                venue_name = tracker.venue_mapping.get(venue_id, '不明')
-                                
-                                # 着順データを整理
-                                boats = race.get('boats', [])
-                                place_results = [None, None, None]
-                                
-                                for boat in boats:
-                                    place = boat.get('racer_place_number')
-                                    boat_num = boat.get('racer_boat_number')
-                                    if place and place <= 3:
-                                        place_results[place-1] = boat_num
-                                
-                                if None not in place_results:
-                                    winning_boat = place_results[0]
-                                    
-                                    # データベースに結果を保存
-                                    cursor.execute('''
-                                        INSERT OR REPLACE INTO race_results
-                                        (race_date, venue_id, venue_name, race_number, winning_boat, place_results, result_data)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                                    ''', (current_date, venue_id, venue_name, race_number, winning_boat,
-                                          json.dumps(place_results), json.dumps(race)))
-                                    
-                                    # 対応する予測データがあれば的中記録を作成
-                                    cursor.execute('''
-                                        SELECT id, predicted_win, predicted_place FROM predictions
-                                        WHERE race_date = ? AND venue_id = ? AND race_number = ?
-                                    ''', (current_date, venue_id, race_number))
-                                    
-                                    pred_row = cursor.fetchone()
-                                    if pred_row:
-                                        pred_id, predicted_win, predicted_place_json = pred_row
-                                        result_id = cursor.lastrowid
-                                        
-                                        is_win_hit = (predicted_win == winning_boat)
-                                        predicted_place_list = json.loads(predicted_place_json) if predicted_place_json else []
-                                        is_place_hit = any(boat in place_results[:2] for boat in predicted_place_list[:2])
-                                        
-                                        cursor.execute('''
-                                            INSERT OR REPLACE INTO accuracy_records 
-                                            (prediction_id, result_id, is_win_hit, is_place_hit, hit_status, calculated_at)
-                                            VALUES (?, ?, ?, ?, ?, ?)
-                                        ''', (pred_id, result_id, is_win_hit, is_place_hit,
-                                              'hit' if is_win_hit else 'miss', datetime.now().isoformat()))
-                                    
-                                    result_count += 1
-                            
-                            except Exception as e:
-                                logger.warning(f"結果処理エラー {venue_id}-{race_number}: {e}")
-                                continue
-                        
-                        conn.commit()
-                    
-                    if result_count > 0:
-                        logger.info(f"結果データ更新完了: {result_count}件")
+                current_date = current_time.strftime('%Y-%m-%d')
+                results = self.fetcher.get_results_for_date(current_date)
+                if results:
+                    ingested = self._ingest_results(results, current_date)
+                    if ingested:
+                        logger.info(f"結果データ更新完了: {len(ingested)}件")
             else:
                 logger.debug("結果データ更新スキップ（17時前）")
                 
         except Exception as e:
             logger.error(f"結果データ更新エラー: {e}")
     
+    def plan_result_fetches(self) -> int:
+        """本日分のプログラムから締切時刻ベースの結果取得を計画"""
+        try:
+            data = self.fetcher.get_today_races()
+            if not data or 'programs' not in data:
+                logger.warning("結果取得計画: プログラムデータなし")
+                return 0
+            
+            timeline = get_race_timeline(data['programs'])
+            planned = self.result_watch.plan(timeline, self._get_stored_result_keys())
+            self._arm_result_watch()
+            return planned
+            
+        except Exception as e:
+            logger.error(f"結果取得計画エラー: {e}")
+            return 0
+    
+    def process_result_watch(self):
+        """取得予定時刻に実行: 取得時刻を迎えたレースの結果をまとめて取得"""
+        try:
+            current_time = datetime.now()
+            due_keys = self.result_watch.pop_due(current_time)
+            if not due_keys:
+                self._arm_result_watch()
+                return
+            
+            # 期限到来分は1回の取得にまとめる
+            current_date = current_time.strftime('%Y-%m-%d')
+            results = self.fetcher.get_results_for_date(current_date) or []
+            ingested = self._ingest_results(results, current_date)
+            
+            self.result_watch.mark_done(ingested)
+            retry_count = self.result_watch.reschedule(due_keys - ingested, current_time)
+            
+            logger.info(f"締切後結果取得: 対象{len(due_keys)}件, 反映{len(due_keys & ingested)}件, "
+                        f"再試行{retry_count}件, 残り{len(self.result_watch)}件")
+            
+        except Exception as e:
+            logger.error(f"締切後結果取得エラー: {e}")
+        finally:
+            if self.is_running:
+                self._arm_result_watch()
+    
+    def _get_stored_result_keys(self) -> Set[Tuple[int, int]]:
+        """本日分で結果保存済みのレース"""
+        try:
+            tracker = self.AccuracyTracker()
+            with sqlite_connect(tracker.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT venue_id, race_number FROM race_results
+                    WHERE race_date = ? AND winning_boat IS NOT NULL
+                ''', (datetime.now().strftime('%Y-%m-%d'),))
+                return {(row[0], row[1]) for row in cursor.fetchall()}
+        except Exception as e:
+            logger.warning(f"保存済み結果の確認エラー: {e}")
+            return set()
+    
+    def _ingest_results(self, results: List[Dict], current_date: str) -> Set[Tuple[int, int]]:
+        """結果データを保存し、着順が確定したレースのキーを返す"""
+        ingested = set()
+        tracker = self.AccuracyTracker()
+        program_index = self._program_index(current_date)
+        
+        with sqlite_connect(tracker.db_path) as conn:
+            cursor = conn.cursor()
+            saved = write_results(cursor, tracker.db_path, results, program_index, current_date, complete_only=True)
+            
+            for race, place_results, result_id in saved:
+                venue_id = race.get('race_stadium_number')
+                race_number = race.get('race_number')
+                try:
+                    # 対応する予測データがあれば的中記録を作成（複勝は日付ビューと同じく本命艇の3着内で判定）
+                    cursor.execute('''
+                        SELECT id, predicted_win = ?, predicted_win IN (?, ?, ?)
+                        FROM predictions
+                        WHERE race_date = ? AND venue_id = ? AND race_number = ?
+                    ''', (place_results[0], *place_results, current_date, venue_id, race_number))
+                    
+                    pred_row = cursor.fetchone()
+                    if pred_row:
+                        pred_id, is_win_hit, is_place_hit = pred_row
+                        is_win_hit = bool(is_win_hit)
+                        is_place_hit = bool(is_place_hit)
+                        
+                        cursor.execute('''
+                            INSERT OR REPLACE INTO accuracy_records 
+                            (prediction_id, result_id, is_win_hit, is_place_hit, hit_status, calculated_at)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        ''', (pred_id, result_id, is_win_hit, is_place_hit,
+                              'hit' if is_win_hit else 'miss', datetime.now().isoformat()))
+                except Exception as e:
+                    logger.warning(f"的中記録作成エラー {venue_id}-{race_number}: {e}")
+                
+                ingested.add((venue_id, race_number))
+            
+            conn.commit()
+        
+        if ingested:
+            bump_data_version(tracker.db_path, current_date)
+        return ingested
+    
+    def _program_index(self, date: str) -> Dict:
+        """結果にないモーター・ボート番号を補完するためのプログラム索引"""
+        try:
+            if date == datetime.now().strftime('%Y-%m-%d'):
+                programs = (self.fetcher.get_today_races() or {}).get('programs', [])
+            else:
+                programs = self.fetcher.get_programs_for_date(date)
+            return program_boats_by_race(programs)
+        except Exception as e:
+            logger.warning(f"プログラム索引作成エラー: {e}")
+            return {}
+    
     def check_ml_retrain(self):
         """ML再学習チェック"""
         try:
@@ -290,15 +388,22 @@ def create_scheduler_routes(app, scheduler):
     def api_scheduler_status():
         """スケジューラー状態確認API"""
         try:
-            next_run = None
-            if schedule.jobs:
-                next_run = min(job.next_run for job in schedule.jobs).isoformat() if schedule.jobs else None
+            timer_status = scheduler.timer.get_status()
+            next_result_fetch = scheduler.result_watch.next_due()
             
             return jsonify({
                 'success': True,
                 'is_running': scheduler.is_running,
-                'total_jobs': len(schedule.jobs),
-                'next_run': next_run
+                'total_jobs': len(timer_status['jobs']),
+                'next_run': timer_status['next_run'],
+                'queue_depth': timer_status['queue_depth'],
+                'waiting_for_worker': timer_status['waiting_for_worker'],
+                'running_jobs': timer_status['running_jobs'],
+                'max_workers': timer_status['max_workers'],
+                'jobs': timer_status['jobs'],
+                'result_mode': scheduler.result_mode,
+                'pending_result_races': len(scheduler.result_watch),
+                'next_result_fetch': next_result_fetch.isoformat() if next_result_fetch else None
             })
         except Exception as e:
             return jsonify({
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+BoatraceOpenAPI スタンドイン
+programs/v2・results/v2 の実レスポンスを記録し、ローカルで再生する（遅延・ゆらぎ・エラー注入・ETag対応）。
+アプリ側は BOATRACE_API_BASE_URL に表示された接続先を指定すると、全取得処理が再生サーバーを参照する
+
+使用例:
+    python scripts/openapi_standin.py record --date 2025-08-31
+    python scripts/openapi_standin.py import-cache cache/boatrace_openapi_cache.json
+    python scripts/openapi_standin.py serve --port 8765 --latency-ms 120 --jitter-ms 40 --error-rate 0.02
+    BOATRACE_API_BASE_URL=http://127.0.0.1:8765 python scripts/web_app_modular.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES_DIR = os.path.join(PROJECT_ROOT, 'scripts', 'modules')
+if MODULES_DIR not in sys.path:
+    sys.path.insert(0, MODULES_DIR)
+
+from core.openapi_endpoint import DEFAULT_BASE_URL
+from core.openapi_replay import KINDS, ReplayConfig, ReplayStore, create_replay_server
+
+DEFAULT_CACHE_FILE = os.path.join(PROJECT_ROOT, 'cache', 'boatrace_openapi_cache.json')
+
+
+def record(store: ReplayStore, date: str, upstream: str, kinds) -> int:
+    """実APIから指定日のレスポンスを取得して記録"""
+    failures = 0
+    date_key = 'today' if date == 'today' else date.replace('-', '')
+    for kind in kinds:
+        url = f"{upstream.rstrip('/')}/{kind}/v2/{date_key}.json"
+        response = requests.get(url, timeout=30)
+        if response.status_code != 200:
+            print(f"[ERROR] {url}: HTTP {response.status_code}")
+            failures += 1
+            continue
+        # today.json はレスポンス内の日付で保存する
+        record_date = date
+        if date == 'today':
+            items = response.json().get(kind) or [{}]
+            record_date = items[0].get('race_date') or time.strftime('%Y-%m-%d')
+        print(f"[OK] {url} -> {store.record(kind, record_date, response.content)}")
+    return 1 if failures else 0
+
+
+def serve(store: ReplayStore, args) -> int:
+    """再生サーバーを起動（Ctrl+C で停止）"""
+    if not any(store.dates(kind) for kind in KINDS) and os.path.exists(DEFAULT_CACHE_FILE):
+        print(f"[INFO] 記録がないため {DEFAULT_CACHE_FILE} を取り込みます")
+        store.import_cache_file(DEFAULT_CACHE_FILE)
+
+    config = ReplayConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                          error_status=args.error_status, today=args.today, seed=args.seed)
+    server = create_replay_server(store, config, args.host, args.port)
+    for kind in KINDS:
+        print(f"[INFO] {kind}: {', '.join(store.dates(kind)) or '記録なし'}")
+    print(f"[INFO] 再生サーバー: {server.base_url}")
+    print(f"[INFO] アプリ側の設定: BOATRACE_API_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[INFO] 応答統計: {server.stats}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BoatraceOpenAPI スタンドイン（記録・再生）')
+    parser.add_argument('--fixtures', help='記録の保存先（既定: data/openapi_fixtures）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='実APIのレスポンスを記録')
+    record_parser.add_argument('--date', default='today', help='YYYY-MM-DD または today')
+    record_parser.add_argument('--upstream', default=DEFAULT_BASE_URL, help='記録元のAPI')
+    record_parser.add_argument('--kind', choices=KINDS, action='append', help='記録する種別（既定: 両方）')
+
+    import_parser = subparsers.add_parser('import-cache', help='既存の取得キャッシュを記録として取り込む')
+    import_parser.add_argument('cache_file', nargs='?', default=DEFAULT_CACHE_FILE)
+
+    serve_parser = subparsers.add_parser('serve', help='記録を再生するサーバーを起動')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--latency-ms', type=float, default=0.0, help='応答遅延（ms）')
+    serve_parser.add_argument('--jitter-ms', type=float, default=0.0, help='遅延のゆらぎ（±ms）')
+    serve_parser.add_argument('--error-rate', type=float, default=0.0, help='エラーを返す割合（0-1）')
+    serve_parser.add_argument('--error-status', type=int, default=503, help='注入するエラーのステータス')
+    serve_parser.add_argument('--today', help='today.json に使う日付（既定: 最新の記録）')
+    serve_parser.add_argument('--seed', type=int, help='遅延・エラー注入の乱数シード')
+    args = parser.parse_args()
+
+    store = ReplayStore(args.fixtures)
+    if args.command == 'record':
+        return record(store, args.date, args.upstream, args.kind or KINDS)
+    if args.command == 'import-cache':
+        path = store.import_cache_file(args.cache_file)
+        print(f"[OK] {path}" if path else "[ERROR] 取り込めませんでした")
+        return 0 if path else 1
+    return serve(store, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+起動ベンチマーク
+scripts/modules/main_app.run_application と同じ起動経路（create_application → スケジューラー開始 → 初回リクエスト）を
+新しいプロセスで計測し、コンポーネント初期化・DB接続・初回リクエスト応答をJSONレポートに出力する。
+上流APIは遅延付きのローカル再生サーバー（openapi_replay）に向け、起動中の上流待ちも計測に含める。
+インポート時間の内訳は計測値に影響しないよう `-X importtime` の別プロセスで取得する。
+起動時間がしきい値（またはベースラインからの許容悪化率）を超えた場合は終了コード1を返す
+
+使用例:
+    python scripts/startup_benchmark.py --runs 5 --threshold-ms 1000
+    python scripts/startup_benchmark.py --baseline logs/startup_benchmark.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES_DIR = os.path.join(PROJECT_ROOT, 'scripts', 'modules')
+
+DEFAULT_THRESHOLD_MS = 1000
+DEFAULT_OUTPUT = os.path.join('logs', 'startup_benchmark.json')
+# 再生サーバーで出走表として返す記録（today.json）と応答遅延
+DEFAULT_FIXTURE = os.path.join(PROJECT_ROOT, 'cache', 'boatrace_openapi_cache.json')
+DEFAULT_UPSTREAM_LATENCY_MS = 300
+
+# レポート対象のフェーズ
+PHASES = ['import_main_app', 'create_application', 'scheduler_start', 'db_open', 'first_request',
+          'deferred_components', 'total']
+
+_IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr: str, top: int = 15, start_module: str = 'main_app') -> List[Dict]:
+    """`python -X importtime` の出力から start_module 配下のインポートを累積時間順に抽出
+    （子モジュールは親より先に出力されるため、start_module の行で終わるブロックを対象にする）"""
+    block = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        # インデントは1文字が深さ0、以降2文字ごとに1段深い
+        depth = (len(indent) - 1) // 2
+        if depth == 0:
+            if module == start_module:
+                break
+            block = []
+            continue
+        block.append({
+            'module': module,
+            'depth': depth,
+            'self_ms': round(int(self_us) / 1000, 2),
+            'cumulative_ms': round(int(cumulative_us) / 1000, 2)
+        })
+    else:
+        return []
+    block.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return block[:top]
+
+
+def summarize_runs(runs: List[Dict]) -> Dict[str, Dict]:
+    """各フェーズの中央値・最小・最大"""
+    summary = {}
+    for phase in PHASES:
+        values = [run['phases'][phase] for run in runs if run['phases'].get(phase) is not None]
+        if not values:
+            continue
+        summary[phase] = {
+            'median_ms': round(statistics.median(values), 2),
+            'min_ms': round(min(values), 2),
+            'max_ms': round(max(values), 2)
+        }
+    return summary
+
+
+def evaluate(summary: Dict[str, Dict], threshold_ms: float, baseline: Optional[Dict] = None,
+             max_regression: float = 0.2) -> List[str]:
+    """しきい値・ベースラインとの比較（違反内容の一覧を返す）"""
+    failures = []
+    total = summary.get('total', {}).get('median_ms')
+    if total is None:
+        return ['起動計測に失敗しました']
+
+    if total > threshold_ms:
+        failures.append(f"起動時間 {total:.0f}ms がしきい値 {threshold_ms:.0f}ms を超過")
+
+    if baseline:
+        for phase, stats in summary.items():
+            base = baseline.get('summary', {}).get(phase, {}).get('median_ms')
+            if not base:
+                continue
+            if stats['median_ms'] > base * (1 + max_regression):
+                failures.append(f"{phase}: {stats['median_ms']:.0f}ms (ベースライン {base:.0f}ms から "
+                                f"{(stats['median_ms'] / base - 1) * 100:.0f}% 悪化)")
+    return failures
+
+
+def run_child(workdir: Optional[str] = None) -> Dict:
+    """子プロセス側: 起動経路を計測してJSONを返す
+    （workdir を指定すると取得キャッシュ・ログをそこに書き、リポジトリの記録済みキャッシュを上書きしない）"""
+    started = time.perf_counter()
+    phases = {}
+    errors = []
+
+    os.chdir(workdir or PROJECT_ROOT)
+    if MODULES_DIR not in sys.path:
+        sys.path.insert(0, MODULES_DIR)
+
+    t = time.perf_counter()
+    import main_app
+    phases['import_main_app'] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    try:
+        app, components = main_app.create_application()
+    except SystemExit:
+        return {'phases': phases, 'errors': ['create_application が失敗しました'], 'components': {}}
+    phases['create_application'] = (time.perf_counter() - t) * 1000
+
+    # スケジューラー開始（run_application と同じく初回リクエスト受付前）
+    scheduler = components.get('scheduler')
+    t = time.perf_counter()
+    if scheduler:
+        try:
+            scheduler.start()
+        except Exception as e:
+            errors.append(f"scheduler: {e}")
+    phases['scheduler_start'] = (time.perf_counter() - t) * 1000
+
+    # 初回リクエスト（ヘルスチェック）
+    t = time.perf_counter()
+    response = app.test_client().get('/test')
+    phases['first_request'] = (time.perf_counter() - t) * 1000
+    if response.status_code != 200:
+        errors.append(f"/test が HTTP {response.status_code} を返しました")
+
+    # ここまでがコールドスタートから初回応答まで
+    phases['total'] = (time.perf_counter() - started) * 1000
+
+    # 遅延初期化コンポーネント（初回API呼び出し時のコスト）
+    registry = components.get('registry')
+    t = time.perf_counter()
+    if registry:
+        for name in ('fetcher', 'accuracy_tracker', 'enhanced_predictor'):
+            try:
+                registry.get(name)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+    phases['deferred_components'] = (time.perf_counter() - t) * 1000
+
+    # DB接続
+    t = time.perf_counter()
+    try:
+        tracker = components['accuracy_tracker']()
+        with sqlite3.connect(tracker.db_path) as conn:
+            conn.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        phases['db_open'] = (time.perf_counter() - t) * 1000
+    except Exception as e:
+        errors.append(f"DB接続: {e}")
+
+    if scheduler:
+        scheduler.stop()
+
+    return {
+        'phases': {name: round(value, 2) for name, value in phases.items()},
+        'components': registry.get_init_report() if registry else {},
+        'errors': errors
+    }
+
+
+def run_once(env: Optional[Dict] = None, workdir: Optional[str] = None) -> Dict:
+    """新しいインタプリタで1回計測"""
+    command = [sys.executable, os.path.abspath(__file__), '--child']
+    if workdir:
+        command += ['--workdir', workdir]
+    started = time.perf_counter()
+    proc = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, env=env)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    result = None
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            try:
+                result = json.loads(line)
+                break
+            except ValueError:
+                continue
+    if result is None:
+        tail = proc.stderr.strip().splitlines()[-5:]
+        result = {'phases': {}, 'components': {}, 'errors': [f"子プロセス失敗 (exit {proc.returncode})"] + tail}
+
+    result['process_wall_ms'] = round(wall_ms, 2)
+    return result
+
+
+def profile_imports(env: Optional[Dict] = None) -> List[Dict]:
+    """`-X importtime` の別プロセスで main_app のインポート内訳を取得（計測パスとは分ける）"""
+    code = f"import sys; sys.path.insert(0, {MODULES_DIR!r}); import main_app"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=PROJECT_ROOT, capture_output=True, text=True, env=env)
+    return parse_importtime(proc.stderr)
+
+
+def start_upstream(directory: str, fixture: str, latency_ms: float):
+    """記録済みの出走表を today.json として返す再生サーバーを起動"""
+    if MODULES_DIR not in sys.path:
+        sys.path.insert(0, MODULES_DIR)
+    from core.openapi_replay import ReplayConfig, ReplayStore, start_replay_server
+
+    store = ReplayStore(directory)
+    recorded = store.import_cache_file(fixture) if os.path.exists(fixture) else None
+    today = store.dates('programs')[-1] if recorded and store.dates('programs') else None
+    return start_replay_server(store, ReplayConfig(latency_ms=latency_ms, today=today))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='起動ベンチマーク')
+    parser.add_argument('--runs', type=int, default=3, help='計測回数（中央値で評価）')
+    parser.add_argument('--threshold-ms', type=float, default=DEFAULT_THRESHOLD_MS,
+                        help='コールドスタートから初回応答までの許容時間（ms）')
+    parser.add_argument('--baseline', help='比較対象の過去レポート（JSON）')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='ベースラインからの許容悪化率')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='レポート出力先')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='再生サーバーが返す出走表（取得キャッシュ形式）')
+    parser.add_argument('--upstream-latency-ms', type=float, default=DEFAULT_UPSTREAM_LATENCY_MS,
+                        help='再生サーバーの応答遅延（ms）')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # ログ出力と区別するため最終行にJSONを出力
+        print(json.dumps(run_child(args.workdir), ensure_ascii=False))
+        return 0
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='startup_benchmark_') as temp_dir:
+        upstream = start_upstream(os.path.join(temp_dir, 'replay'), args.fixture, args.upstream_latency_ms)
+        env = dict(os.environ, BOATRACE_API_BASE_URL=upstream.base_url)
+        print(f"[UPSTREAM] 再生サーバー: {upstream.base_url} (遅延 {args.upstream_latency_ms:.0f}ms)")
+        try:
+            for i in range(args.runs):
+                workdir = os.path.join(temp_dir, f'run{i + 1}')
+                os.makedirs(workdir)
+                run = run_once(env, workdir)
+                runs.append(run)
+                total = run['phases'].get('total')
+                print(f"[RUN {i + 1}/{args.runs}] 初回応答まで: "
+                      f"{f'{total:.0f}ms' if total is not None else '失敗'} (プロセス全体 {run['process_wall_ms']:.0f}ms)")
+            imports = profile_imports(env)
+        finally:
+            upstream.shutdown()
+            upstream.server_close()
+
+    summary = summarize_runs(runs)
+    failures = evaluate(summary, args.threshold_ms, baseline, args.max_regression)
+    for run in runs:
+        failures.extend(run['errors'])
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'threshold_ms': args.threshold_ms,
+        'upstream_latency_ms': args.upstream_latency_ms,
+        'summary': summary,
+        'slowest_imports': imports,
+        'components': runs[-1]['components'] if runs else {},
+        'raw_runs': runs,
+        'passed': not failures,
+        'failures': failures
+    }
+
+    output_path = os.path.join(PROJECT_ROOT, args.output) if not os.path.isabs(args.output) else args.output
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n[REPORT] フェーズ別中央値:")
+    for phase, stats in summary.items():
+        print(f"  {phase}: {stats['median_ms']:.1f}ms")
+    print("\n[SLOW] インポート時間上位:")
+    for record in report['slowest_imports'][:5]:
+        print(f"  {record['module']}: {record['cumulative_ms']:.1f}ms")
+    print(f"\n[SAVE] {output_path}")
+
+    if failures:
+        print("\n[FAIL] 起動ベンチマーク不合格:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    print("\n[PASS] 起動ベンチマーク合格")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
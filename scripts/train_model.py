@@ -1,11 +1,4 @@
 import json
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import accuracy_score, classification_report
 import pickle
 import os
 
@@ -13,6 +6,15 @@ def train_model():
     """
     抽出された訓練データを使用してモデルを訓練し、保存します。
     """
+    # pandas / sklearn は重いため訓練実行時にのみ読み込む
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.metrics import accuracy_score, classification_report
+
     # --- 1. データの読み込み ---
     data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'training_data_from_db.json')
     try:
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+JSON API（ASGI版）エントリーポイント
+/api/races・/api/races/enhanced-prediction・/api/update-results を非同期で配信する。
+HTMLページと他の /api/*（/api/historical を含む）は web_app_modular.py（Flask）が引き続き配信し、リバースプロキシで振り分ける
+
+使用例:
+    python scripts/web_api_asgi.py
+    uvicorn web_api_asgi:app --app-dir scripts --port 5002
+"""
+
+import os
+import sys
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modules')
+if MODULES_DIR not in sys.path:
+    sys.path.insert(0, MODULES_DIR)
+
+from asgi_api import create_asgi_application
+from config.app_config import AppConfig
+from config.logging_config import setup_logging
+from core.openapi_endpoint import set_base_url
+from core.query_profiler import get_query_stats
+
+setup_logging()
+get_query_stats().slow_query_ms = AppConfig.get_database_config()['slow_query_ms']
+set_base_url(AppConfig.get_api_config()['base_url'])
+
+app = create_asgi_application(AppConfig.get_asgi_config()['db_workers'])
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    config = AppConfig.get_asgi_config()
+    uvicorn.run(app, host=config['host'], port=config['port'], log_level='info')
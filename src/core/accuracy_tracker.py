@@ -4,15 +4,20 @@
 予想データと結果データを管理し、的中率を計算・表示する
 """
 
-import sqlite3
 import json
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+# 一覧・的中率は型付きカラムと日付ビュー（scripts/modules/core）に依存する。
+# 読み込めない場合は ImportError のまま送出し、component_initializer の代替トラッカーに切り替える
+from core.query_profiler import connect as sqlite_connect
+from core.typed_schema import ensure_typed_schema
+from core.date_view import iter_period_views, load_date_view
+
 
 import os
 
@@ -33,115 +38,72 @@ class AccuracyTracker:
             19: "下関", 20: "若松", 21: "芦屋", 22: "福岡", 23: "唐津", 24: "大村"
         }
         logger.info(f"AccuracyTracker DB path: {self.db_path}")
+        ensure_typed_schema(self.db_path)
 
     def get_all_races_by_date(self, date_str: str) -> List[Dict]:
         """指定日付のすべてのレースを取得（comprehensive_kyotei.db対応）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT 
-                        p.venue_id, p.venue_name, p.race_number, 
-                        p.predicted_win, p.predicted_place, p.predicted_trifecta,
-                        p.confidence, p.created_at,
-                        r.winning_boat, r.second_boat, r.third_boat,
-                        ri.start_time, ri.race_title
-                    FROM predictions p
-                    LEFT JOIN race_results r ON p.race_date = r.race_date 
-                                             AND p.venue_id = r.venue_id 
-                                             AND p.race_number = r.race_number
-                    LEFT JOIN race_info ri ON p.race_date = ri.race_date 
-                                            AND p.venue_id = ri.venue_id 
-                                            AND p.race_number = ri.race_number
-                    WHERE p.race_date = ?
-                    ORDER BY p.venue_id, p.race_number
-                ''', (date_str,))
-                
-                races = []
-                for row in cursor.fetchall():
-                    venue_id, venue_name, race_number, predicted_win, predicted_place, predicted_trifecta, confidence, created_at, winning_boat, second_boat, third_boat, start_time, race_title = row
-                    
-                    # 予想データを整理
-                    predicted_place_list = []
-                    if predicted_place:
-                        try:
-                            predicted_place_list = list(map(int, predicted_place.split(',')))
-                        except:
-                            predicted_place_list = [predicted_win] if predicted_win else []
-                    
-                    predicted_trifecta_list = []
-                    if predicted_trifecta:
-                        try:
-                            predicted_trifecta_list = list(map(int, predicted_trifecta.split(',')))
-                        except:
-                            predicted_trifecta_list = predicted_place_list[:3] if len(predicted_place_list) >= 3 else []
-                    
-                    # 結果データを整理
-                    actual_results = []
-                    has_result = winning_boat is not None
-                    if has_result:
-                        actual_results = [winning_boat, second_boat, third_boat]
-                    
-                    # 的中判定
-                    is_win_hit = 0
-                    is_place_hit = 0
-                    is_trifecta_hit = 0
-                    
-                    if has_result and predicted_win:
-                        # 単勝判定
-                        is_win_hit = 1 if predicted_win == winning_boat else 0
-                        
-                        # 複勝判定（1-3位内）
-                        is_place_hit = 1 if predicted_win in actual_results else 0
-                        
-                        # 三連単判定
-                        if len(predicted_trifecta_list) >= 3:
-                            is_trifecta_hit = 1 if predicted_trifecta_list == actual_results else 0
-                    
-                    # ステータス判定
-                    status = 'completed' if has_result else 'pending'
-                    hit_status = '○' if has_result and (is_win_hit or is_place_hit) else '×' if has_result else '待'
-                    
-                    race_data = {
-                        'venue_id': venue_id,
-                        'venue_name': venue_name or self.venue_mapping.get(venue_id, '不明'),
-                        'race_number': race_number,
-                        'race_date': date_str,
-                        'start_time': start_time if start_time and start_time != '未定' else '不明',
-                        'race_title': race_title or f'第{race_number}レース',
-                        'confidence': confidence or 0.5,
-                        'prediction': {
-                            'predicted_win': predicted_win,
-                            'predicted_place': predicted_place_list,
-                            'confidence': confidence or 0.5
-                        },
-                        'result': actual_results if has_result else None,
-                        'is_win_hit': is_win_hit,
-                        'is_place_hit': is_place_hit,
-                        'is_trifecta_hit': is_trifecta_hit,
-                        'has_result': has_result,
-                        'status': status,
-                        'predicted_win': predicted_win,
-                        'predicted_place': predicted_place_list,
-                        'winning_boat': winning_boat,
-                        'place_results': actual_results if has_result else None,
-                        'hit_status': hit_status
-                    }
-                    
-                    races.append(race_data)
-                
-                logger.debug(f'{date_str}のrace_list長さ={len(races)}, 最初のレース={races[0] if races else "なし"}')
-                return races
+            races = [self._format_race(row, date_str) for row in load_date_view(self.db_path, date_str)]
+            
+            logger.debug(f'{date_str}のrace_list長さ={len(races)}, 最初のレース={races[0] if races else "なし"}')
+            return races
                 
         except Exception as e:
             logger.error(f"レース一覧取得エラー ({date_str}): {e}")
             return []
 
+    def iter_all_races(self) -> Iterator[Dict]:
+        """全期間のレースを新しい日付から順に返す（1日分ずつ読み出す）"""
+        for view in iter_period_views(self.db_path):
+            for row in view:
+                yield self._format_race(row, view.race_date)
+
+    def _format_race(self, row, date_str: str) -> Dict:
+        """日付ビューの1行をテンプレート・API用の辞書に変換"""
+        has_result = row.has_result
+        predicted_place_list = row.predicted_place or ([row.predicted_win] if row.predicted_win else [])
+        actual_results = row.place_results if has_result else []
+        
+        # 的中判定（SQL側で判定済み）
+        scored = has_result and bool(row.predicted_win)
+        is_win_hit = 1 if scored and row.is_win_hit else 0
+        is_place_hit = 1 if scored and row.is_place_hit else 0
+        is_trifecta_hit = 1 if scored and row.is_trifecta_hit else 0
+        
+        # ステータス判定
+        status = 'completed' if has_result else 'pending'
+        hit_status = '○' if has_result and (is_win_hit or is_place_hit) else '×' if has_result else '待'
+        
+        return {
+            'venue_id': row.venue_id,
+            'venue_name': row.venue_name,
+            'race_number': row.race_number,
+            'race_date': date_str,
+            'start_time': row.start_time if row.start_time and row.start_time != '未定' else '不明',
+            'race_title': row.race_title or f'第{row.race_number}レース',
+            'confidence': row.confidence or 0.5,
+            'prediction': {
+                'predicted_win': row.predicted_win,
+                'predicted_place': predicted_place_list,
+                'confidence': row.confidence or 0.5
+            },
+            'result': actual_results if has_result else None,
+            'is_win_hit': is_win_hit,
+            'is_place_hit': is_place_hit,
+            'is_trifecta_hit': is_trifecta_hit,
+            'has_result': has_result,
+            'status': status,
+            'predicted_win': row.predicted_win,
+            'predicted_place': predicted_place_list,
+            'winning_boat': row.winning_boat,
+            'place_results': actual_results if has_result else None,
+            'hit_status': hit_status
+        }
+
     def calculate_accuracy(self, target_date: Optional[str] = None, date_range_days: int = 1) -> Dict[str, Any]:
         """的中率を計算（comprehensive_kyotei.db対応）"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # 日付条件
@@ -158,7 +120,7 @@ class AccuracyTracker:
                         COUNT(*) as total_predictions,
                         COUNT(CASE WHEN p.predicted_win = r.winning_boat THEN 1 END) as win_hits,
                         COUNT(CASE WHEN p.predicted_win IN (r.winning_boat, r.second_boat, r.third_boat) THEN 1 END) as place_hits,
-                        COUNT(CASE WHEN p.predicted_trifecta = (r.winning_boat || ',' || r.second_boat || ',' || r.third_boat) THEN 1 END) as trifecta_hits,
+                        COUNT(CASE WHEN p.pred_pos1 = r.winning_boat AND p.pred_pos2 = r.second_boat AND p.pred_pos3 = r.third_boat THEN 1 END) as trifecta_hits,
                         COUNT(r.race_date) as completed_races
                     FROM predictions p
                     LEFT JOIN race_results r ON p.race_date = r.race_date 
@@ -230,11 +192,13 @@ class AccuracyTracker:
         if race_date is None:
             race_date = datetime.now().strftime('%Y-%m-%d')
         
-        races = self.get_all_races_by_date(race_date)
-        for race in races:
-            if race['venue_id'] == venue_id and race['race_number'] == race_number:
-                return race
-        return None
+        # 日付ビュー（キャッシュ済み）の索引で1レースを参照
+        try:
+            row = load_date_view(self.db_path, race_date).get(venue_id, race_number)
+        except Exception as e:
+            logger.error(f"レース詳細取得エラー: {e}")
+            return None
+        return self._format_race(row, race_date) if row else None
 
     def get_race_results(self, venue_id: int, race_number: int, race_date: Optional[str] = None) -> Optional[Dict]:
         """レース結果を取得"""
@@ -264,7 +228,7 @@ class AccuracyTracker:
                 race_date = datetime.now().strftime('%Y-%m-%d')
             
             # データベースから実際のレーサーデータを取得
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT boat_number, racer_name, racer_age, racer_weight,
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+JSON API（ASGI版）のルーティング・DBスレッドプール・レース一覧の同時取得のテスト
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+pytest.importorskip('requests')
+
+from asgi_api import AsyncAPI
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'boatrace_openapi_cache.json')
+
+
+class _Fetcher:
+    """今日の出走表を少し遅れて返すフェッチャー（呼び出し回数を記録）"""
+
+    def __init__(self, programs):
+        self.programs = programs
+        self.calls = 0
+
+    async def get_today_races_async(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {'programs': self.programs}
+
+
+def _tracker_class(db_path, threads):
+    class Tracker:
+        def __init__(self):
+            self.db_path = db_path
+
+        def _generate_real_prediction(self, venue_id, race_number, race_data=None, race_date=None):
+            threads.add(threading.current_thread().name)
+            return {'recommended_win': 1, 'recommended_place': [1, 2], 'confidence': 0.4,
+                    'venue_id': venue_id, 'race_number': race_number}
+    return Tracker
+
+
+def _request(app, path, method='GET'):
+    """ASGIアプリに1リクエスト送り (ステータス, JSON) を返す"""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode()}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    async def call():
+        await app(scope, receive, send)
+        return sent[0]['status'], json.loads(sent[1]['body'])
+    return call()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'comprehensive.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE predictions (race_date TEXT, venue_id INTEGER, venue_name TEXT, race_number INTEGER,
+                                                  predicted_win INTEGER, predicted_place TEXT, confidence REAL,
+                                                  pred_pos1 INTEGER, pred_pos2 INTEGER, pred_pos3 INTEGER)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER, second_boat INTEGER, third_boat INTEGER)''')
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-29', 2, NULL, 1, 1, NULL, 0.5, 1, 2, 3)")
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-29', 2, 1, 1, 2, 3)")
+    return path
+
+
+def _app(db_path, threads, db_workers=2):
+    with open(FIXTURE, encoding='utf-8') as f:
+        programs = json.load(f)['data']['programs'][:3]
+    return AsyncAPI(_Fetcher(programs), _tracker_class(db_path, threads), db_workers)
+
+
+def test_routing_and_db_executor(db_path):
+    """ルート一致・404/405、DBを使う処理は上限付きスレッドプールで実行する"""
+    threads = set()
+    app = _app(db_path, threads)
+
+    async def scenario():
+        try:
+            assert (await _request(app, '/api/unknown'))[0] == 404
+            assert (await _request(app, '/api/races', 'POST'))[0] == 405
+            # 履歴データはFlask側で配信する
+            assert (await _request(app, '/api/historical/2025-08-01/2025-08-31'))[0] == 404
+
+            status, payload = await _request(app, '/api/races/enhanced-prediction/2_1')
+            assert status == 200 and payload['prediction']['venue_id'] == 2
+            assert (await _request(app, '/api/races/enhanced-prediction/x'))[0] == 400
+
+            status, payload = await _request(app, '/api/update-results/2025-08-29', 'POST')
+            assert payload == {'success': True, 'message': '2025-08-29の結果更新完了: 0件更新されました'}
+            assert not (await _request(app, '/api/update-results/yesterday'))[1]['success']
+
+            # 同時実行数は db_workers で頭打ち
+            running = []
+            peak = []
+
+            def work():
+                running.append(1)
+                peak.append(len(running))
+                time.sleep(0.05)
+                running.pop()
+
+            await asyncio.gather(*(app.run_db(work) for _ in range(6)))
+            assert max(peak) == 2
+        finally:
+            await app.shutdown()
+
+    asyncio.run(scenario())
+    assert threads and all(name.startswith('asgi-db') for name in threads)
+
+
+def test_race_list_misses_share_one_build(db_path):
+    """同時に届いたキャッシュミスは上流取得・一覧作成を1回だけ行う"""
+    threads = set()
+    app = _app(db_path, threads)
+
+    async def scenario():
+        try:
+            responses = await asyncio.gather(*(_request(app, '/api/races') for _ in range(5)))
+            again = await _request(app, '/api/races')
+        finally:
+            await app.shutdown()
+        return responses, again
+
+    responses, again = asyncio.run(scenario())
+    assert app.fetcher.calls == 1
+    assert all(status == 200 and payload['total_races'] == 3 for status, payload in responses)
+    assert again[1] == responses[0][1]
+    assert all(race['prediction'] for race in again[1]['races'])
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+SimpleOpenAPIFetcher の非同期APIのテスト
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+pytest.importorskip('requests')
+
+from api_fetcher import SimpleOpenAPIFetcher
+from core.async_loop import AsyncLoopService
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fetcher = SimpleOpenAPIFetcher()
+    fetcher.retry_delay = 0
+    return fetcher
+
+
+@pytest.fixture
+def service():
+    service = AsyncLoopService('test-fetch-loop')
+    yield service
+    service.shutdown()
+
+
+def _fake_upstream(fetcher, delay=0.2):
+    """URLを記録し、一定時間後に programs/results を返す"""
+    urls = []
+
+    async def http_get(url, source):
+        urls.append(url)
+        await asyncio.sleep(delay)
+        key = 'programs' if '/programs/' in url else 'results'
+        return 200, {key: [{'race_stadium_number': 2, 'race_number': 5}]}
+
+    fetcher._http_get_async = http_get
+    return urls
+
+
+def test_day_bundle_fetches_concurrently_and_shares_cache(fetcher, service):
+    """今日の出走表・結果は並行取得し、同期版と同じキャッシュファイルに保存する"""
+    urls = _fake_upstream(fetcher)
+
+    started = time.perf_counter()
+    bundle = service.run(fetcher.get_day_bundle_async())
+    assert time.perf_counter() - started < 0.35
+    assert bundle['date'] == datetime.now().strftime('%Y-%m-%d')
+    assert len(bundle['programs']) == 1 and len(bundle['results']) == 1
+    assert sorted(url.rsplit('/', 3)[-3] for url in urls) == ['programs', 'results']
+
+    # 同期版はキャッシュから返し、非同期版も再取得しない
+    assert fetcher.get_today_races()['programs'] == bundle['programs']
+    assert service.run(fetcher.get_today_results_async())['results'] == bundle['results']
+    assert len(urls) == 2
+
+
+def test_past_date_and_failures(fetcher, service):
+    """過去日は日付別URL、失敗時は空リストを返す"""
+    urls = _fake_upstream(fetcher, delay=0)
+    bundle = service.run(fetcher.get_day_bundle_async('2025-08-31'))
+    assert all(url.endswith('/20250831.json') for url in urls)
+    assert bundle['programs'] and bundle['results']
+    assert not os.path.exists(fetcher.cache_file)
+
+    async def failing(url, source):
+        raise OSError('connection refused')
+
+    fetcher._http_get_async = failing
+    assert service.run(fetcher.get_results_for_date_async('2025-08-31')) == []
+    assert service.run(fetcher.get_today_races_async()) is None
+
+
+def test_against_replay_server(fetcher, tmp_path):
+    """実際の HTTP（aiohttp・共通セッション）で再生サーバーから取得"""
+    pytest.importorskip('aiohttp')
+    from core.openapi_replay import ReplayStore, start_replay_server
+    from api_fetcher import run_async_in_thread
+
+    store = ReplayStore(str(tmp_path / 'replay'))
+    store.record('programs', '2025-08-31', json.dumps({'programs': [{'race_number': 1}]}).encode())
+    store.record('results', '2025-08-31', json.dumps({'results': [{'race_number': 1}]}).encode())
+    server = start_replay_server(store)
+    try:
+        fetcher.programs_base_url = f"{server.base_url}/programs/v2"
+        fetcher.results_base_url = f"{server.base_url}/results/v2"
+        bundle = run_async_in_thread(fetcher.get_day_bundle_async('2025-08-31'), timeout=10)
+    finally:
+        server.shutdown()
+    assert bundle['programs'] == [{'race_number': 1}]
+    assert bundle['results'] == [{'race_number': 1}]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+バックグラウンドのイベントループサービスのテスト
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.async_loop import AsyncLoopService
+
+
+async def _thread_name():
+    return threading.current_thread().name
+
+
+def test_coroutines_share_one_loop_thread():
+    """投入したコルーチンは同じループスレッドで実行され、並列に待てる"""
+    service = AsyncLoopService('test-loop')
+    try:
+        assert service.run(_thread_name()) == 'test-loop'
+        threads = threading.active_count()
+        names = {service.run(_thread_name()) for _ in range(5)}
+        assert names == {'test-loop'}
+        assert threading.active_count() == threads
+
+        started = time.perf_counter()
+        futures = [service.submit(asyncio.sleep(0.2, result=i)) for i in range(5)]
+        assert [future.result(2) for future in futures] == list(range(5))
+        assert time.perf_counter() - started < 0.6
+    finally:
+        service.shutdown()
+
+
+def test_errors_timeouts_and_restart():
+    """例外は呼び出し側に伝わり、タイムアウトしたタスクは取り消される。停止後の投入で再起動する"""
+    service = AsyncLoopService('test-loop')
+
+    async def fail():
+        raise ValueError('boom')
+
+    try:
+        with pytest.raises(ValueError):
+            service.run(fail())
+        with pytest.raises(concurrent.futures.TimeoutError):
+            service.run(asyncio.sleep(5), timeout=0.05)
+
+        first_loop = service.loop
+        service.shutdown()
+        assert not service.running
+        assert service.run(_thread_name()) == 'test-loop'
+        assert service.loop is not first_loop
+    finally:
+        service.shutdown()
+
+
+def test_shared_session_is_reused():
+    """aiohttp セッションはループ内で1つだけ作成し、停止時に閉じる"""
+    pytest.importorskip('aiohttp')
+    service = AsyncLoopService('test-loop')
+    try:
+        first = service.run(service.get_session())
+        assert service.run(service.get_session()) is first
+    finally:
+        service.shutdown()
+    assert first.closed
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+コンポーネントレジストリのテスト
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.component_registry import ComponentRegistry
+
+
+class _Fetcher:
+    def get_today_races(self):
+        return {'programs': []}
+
+
+def test_factory_runs_on_first_access_only():
+    """初回アクセスまで初期化せず、以降は同じインスタンスを返す"""
+    calls = []
+    registry = ComponentRegistry()
+    registry.register('fetcher', lambda: calls.append(1) or _Fetcher())
+    fetcher = registry.proxy('fetcher')
+
+    assert calls == []
+    assert registry.get_init_report()['fetcher']['initialized'] is False
+
+    assert fetcher.get_today_races() == {'programs': []}
+    assert fetcher.get_today_races() == {'programs': []}
+    assert calls == [1]
+
+    report = registry.get_init_report()['fetcher']
+    assert report['initialized'] is True
+    assert report['init_ms'] is not None
+
+
+def test_class_component_is_callable_through_proxy():
+    """クラスを登録した場合は代理オブジェクトからインスタンス化できる"""
+    registry = ComponentRegistry()
+    registry.register('tracker', lambda: _Fetcher)
+    tracker_class = registry.proxy('tracker')
+    assert isinstance(tracker_class(), _Fetcher)
+
+
+def test_unavailable_component():
+    """利用できないコンポーネントはアクセス時にエラーとなり、状態に記録される"""
+    registry = ComponentRegistry()
+    registry.register('fetcher', lambda: None)
+    with pytest.raises(RuntimeError):
+        registry.proxy('fetcher').get_today_races()
+
+    def broken():
+        raise ImportError('missing')
+
+    registry.register('predictor', broken)
+    with pytest.raises(ImportError):
+        registry.get('predictor')
+    assert registry.get_init_report()['predictor']['error'] == 'missing'
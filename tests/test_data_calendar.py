@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+データ充足カレンダー（前日・翌日検索）のテスト
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+import core.data_calendar as data_calendar
+from core.data_calendar import DataCalendar
+from core.date_view import bump_data_version
+
+
+def _db(path, days):
+    """days: {日付: (予想レース数, 結果レース数)}"""
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE predictions (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                  predicted_win INTEGER)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER)''')
+        conn.execute('CREATE TABLE race_info (race_date TEXT, venue_id INTEGER, race_number INTEGER, start_time TEXT)')
+        for race_date, (predicted, results) in days.items():
+            _add_races(conn, race_date, predicted, results)
+
+
+def _add_races(conn, race_date, predicted, results, venue_id=1):
+    conn.executemany('INSERT INTO predictions VALUES (?, ?, ?, 1)',
+                     [(race_date, venue_id, race) for race in range(1, predicted + 1)])
+    conn.executemany('INSERT INTO race_results VALUES (?, ?, ?, 1)',
+                     [(race_date, venue_id, race) for race in range(1, results + 1)])
+
+
+def test_previous_and_next_dates(tmp_path, monkeypatch):
+    """予想・結果の揃った日付だけを前日・翌日の移動先にする"""
+    monkeypatch.setattr(data_calendar, 'MIN_PREDICTED_RACES', 3)
+    monkeypatch.setattr(data_calendar, 'MIN_RESULT_RACES', 2)
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path, {'2025-08-27': (4, 4), '2025-08-28': (4, 1), '2025-08-30': (3, 2)})
+
+    calendar = DataCalendar(db_path)
+    assert calendar.previous_date('2025-08-30') == '2025-08-27'
+    assert calendar.next_date('2025-08-27') == '2025-08-30'
+    assert calendar.next_date('2025-08-28') == '2025-08-30'
+    assert calendar.previous_date('2025-08-27') is None
+    assert calendar.next_date('2025-08-30') is None
+    assert calendar.counts('2025-08-28') == {'predictions': 4, 'results': 1, 'race_info': 0}
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM data_calendar').fetchone() == (3,)
+
+    # 書き込み通知のあった日付だけ数え直す
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany('INSERT INTO race_results VALUES (?, 1, ?, 1)', [('2025-08-28', 2), ('2025-08-28', 3)])
+        _add_races(conn, '2025-08-31', 3, 3)
+    bump_data_version(db_path, '2025-08-28')
+    assert calendar.previous_date('2025-08-30') == '2025-08-28'
+    assert calendar.next_date('2025-08-30') is None
+    bump_data_version(db_path, '2025-08-31')
+    assert calendar.next_date('2025-08-30') == '2025-08-31'
+
+    # 保存済みのカレンダーは別インスタンス（再起動後）でも集計し直さずに読み込む
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM predictions WHERE race_date = '2025-08-27'")
+    assert DataCalendar(db_path).previous_date('2025-08-28') == '2025-08-27'
+
+
+def test_missing_database(tmp_path):
+    """DBがない場合は移動先なし"""
+    calendar = DataCalendar(str(tmp_path / 'missing.db'))
+    assert calendar.previous_date('2025-08-30') is None
+    assert not os.path.exists(str(tmp_path / 'missing.db'))
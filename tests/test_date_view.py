@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+日付ビュー（予想・結果の結合一覧）のテスト
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+import core.date_view as date_view
+from core.date_view import (bump_data_version, clear_date_views, clear_query_cache, get_date_view, iter_dates,
+                            iter_period_views, load_date_view)
+
+
+def _comprehensive_db(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE predictions (race_date TEXT, venue_id INTEGER, venue_name TEXT, race_number INTEGER,
+                                                  predicted_win INTEGER, predicted_place TEXT, confidence REAL)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER, second_boat INTEGER, third_boat INTEGER)''')
+        conn.execute('CREATE TABLE race_info (race_date TEXT, venue_id INTEGER, race_number INTEGER, start_time TEXT, race_title TEXT)')
+        conn.executemany('INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)', [
+            ('2025-08-30', 2, '戸田', 1, 1, '1,3,2', 0.6),
+            ('2025-08-30', 2, '戸田', 2, 4, '4,1,2', 0.4),
+            ('2025-08-30', 5, None, 1, 3, '3,1,2', 0.5),
+            ('2025-08-31', 2, '戸田', 1, 1, '1,2,3', 0.5)
+        ])
+        conn.executemany('INSERT INTO race_results VALUES (?, ?, ?, ?, ?, ?)', [
+            ('2025-08-30', 2, 1, 1, 3, 2),
+            ('2025-08-30', 2, 2, 1, 4, 2),
+            ('2025-08-30', 7, 1, 6, 1, 2)
+        ])
+        conn.execute("INSERT INTO race_info VALUES ('2025-08-30', 2, 1, '10:47', '開幕戦')")
+
+
+def test_date_view_joins_predictions_results_and_info(tmp_path):
+    """1回のクエリで予想・結果・レース情報を結合し、的中判定も返す"""
+    clear_query_cache()
+    db_path = str(tmp_path / 'comprehensive.db')
+    _comprehensive_db(db_path)
+
+    rows = get_date_view(db_path, '2025-08-30')
+    assert [row.key for row in rows] == [(2, 1), (2, 2), (5, 1)]
+
+    first, second, pending = rows
+    assert (first.start_time, first.race_title, first.predicted_place) == ('10:47', '開幕戦', [1, 3, 2])
+    assert (first.is_win_hit, first.is_place_hit, first.is_trifecta_hit) == (True, True, True)
+    assert (second.is_win_hit, second.is_place_hit, second.is_trifecta_hit) == (False, True, False)
+    assert second.place_results == [1, 4, 2]
+    assert pending.venue_name == '多摩川'
+    assert not pending.has_result and not pending.is_win_hit
+
+    # 結果のみのレースも含める場合
+    rows = get_date_view(db_path, '2025-08-30', include_unpredicted=True)
+    assert [row.key for row in rows] == [(2, 1), (2, 2), (5, 1), (7, 1)]
+    assert not rows[-1].has_prediction and rows[-1].place_results == [6, 1, 2]
+
+    with sqlite3.connect(db_path) as conn:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_predictions_date', 'idx_race_results_date', 'idx_race_info_date'} <= indexes
+
+
+def test_date_view_uses_race_details_without_predictions(tmp_path):
+    """predictions テーブルがないDBでは race_details の予想を使う"""
+    clear_query_cache()
+    db_path = str(tmp_path / 'tracker.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''CREATE TABLE race_details (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   prediction_data TEXT, start_time TEXT)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER, place_results TEXT, trifecta_result TEXT)''')
+        conn.execute('''INSERT INTO race_details VALUES ('2025-08-30', 1, 3,
+                        '{"recommended_win": 2, "recommended_place": [2, 1, 3], "confidence": 0.7}', '15:10')''')
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 1, 3, 2, '[2, 1, 4, 3, 5, 6]', '[2, 1, 4]')")
+
+    rows = get_date_view(db_path, '2025-08-30')
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.venue_name, row.start_time, row.predicted_win, row.confidence) == ('桐生', '15:10', 2, 0.7)
+    assert row.place_results == [2, 1, 4]
+    assert (row.is_win_hit, row.is_place_hit, row.is_trifecta_hit) == (True, True, False)
+    assert get_date_view(str(tmp_path / 'missing.db'), '2025-08-30') == []
+
+
+def test_date_view_cache_invalidated_by_writes(tmp_path):
+    """同じ日付・版数ならキャッシュを返し、書き込み側が版数を上げると読み直す"""
+    clear_date_views()
+    db_path = str(tmp_path / 'comprehensive.db')
+    _comprehensive_db(db_path)
+
+    view = load_date_view(db_path, '2025-08-30')
+    assert load_date_view(db_path, '2025-08-30') is view
+    assert view.get(2, 2).predicted_win == 4
+    assert view.get(9, 1) is None
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 5, 1, 3, 1, 2)")
+    assert not load_date_view(db_path, '2025-08-30').get(5, 1).has_result
+
+    # 別の日付の書き込みでは無効化されない
+    bump_data_version(db_path, '2025-08-31')
+    assert load_date_view(db_path, '2025-08-30') is view
+
+    bump_data_version(db_path, '2025-08-30')
+    refreshed = load_date_view(db_path, '2025-08-30')
+    assert refreshed is not view
+    assert refreshed.get(5, 1).is_win_hit
+
+    bump_data_version(db_path)
+    assert load_date_view(db_path, '2025-08-30') is not refreshed
+
+
+def test_past_date_view_expires_for_other_process_writes(tmp_path, monkeypatch):
+    """版数の通知が届かない他プロセスの書き込みも、過去日の有効期限が切れれば反映する"""
+    clear_date_views()
+    db_path = str(tmp_path / 'comprehensive.db')
+    _comprehensive_db(db_path)
+
+    view = load_date_view(db_path, '2025-08-30')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 5, 1, 3, 1, 2)")
+    assert load_date_view(db_path, '2025-08-30') is view
+
+    monkeypatch.setattr(date_view, 'PAST_TTL_SECONDS', 0)
+    assert load_date_view(db_path, '2025-08-30').get(5, 1).is_win_hit
+
+
+def test_period_views_page_through_dates(tmp_path):
+    """全期間は日付のキーセットページングで新しい日付から1日ずつ読む"""
+    clear_query_cache()
+    db_path = str(tmp_path / 'comprehensive.db')
+    _comprehensive_db(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-29', 3, '江戸川', 1, 2, '2,1,3', 0.5)")
+
+    assert list(iter_dates(db_path, page_size=1)) == ['2025-08-31', '2025-08-30', '2025-08-29']
+    assert list(iter_dates(db_path, page_size=2)) == ['2025-08-31', '2025-08-30', '2025-08-29']
+
+    views = list(iter_period_views(db_path, page_size=2))
+    assert [(view.race_date, len(view)) for view in views] == [('2025-08-31', 1), ('2025-08-30', 3), ('2025-08-29', 1)]
+    assert views[1].get(2, 1).is_trifecta_hit
+    assert list(iter_dates(str(tmp_path / 'missing.db'))) == []
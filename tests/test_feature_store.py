@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+特徴量ストアのテスト
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.feature_store import FeatureStore, RacerForm, program_boats_by_race
+
+
+def _boats(order, racer_base=4000, start_timing=0.15):
+    """着順リスト（艇番順）から結果データの boats を作成"""
+    return [{
+        'racer_boat_number': boat,
+        'racer_course_number': boat,
+        'racer_number': racer_base + boat,
+        'racer_place_number': place,
+        'racer_start_timing': start_timing
+    } for boat, place in enumerate(order, start=1)]
+
+
+def test_racer_form_rolling_window():
+    """窓から外れた着順・STは集計から差し引かれる"""
+    form = RacerForm(window=3)
+    for place, st in [(1, 0.10), (2, 0.20), (6, 0.30), (3, 0.12)]:
+        form.add(place, 1, st, '2025-08-30')
+
+    features = form.features()
+    assert features['recent_places'] == [2, 6, 3]
+    assert features['recent_avg_place'] == round(11 / 3, 4)
+    assert features['recent_win_rate'] == 0.0
+    assert features['recent_top2_rate'] == round(1 / 3, 4)
+    assert features['recent_avg_st'] == round((0.20 + 0.30 + 0.12) / 3, 4)
+    assert features['starts'] == 4
+    assert features['course_win_rates'][1] == 0.25
+
+    restored = RacerForm.from_dict(json.loads(json.dumps(form.to_dict())), window=3)
+    assert restored.features() == features
+
+
+def test_ingest_is_idempotent_and_persisted(tmp_path):
+    """同じレースは一度だけ反映され、再起動後も同じ特徴量を返す"""
+    db_path = str(tmp_path / 'kyotei.db')
+    sqlite3.connect(db_path).close()
+
+    store = FeatureStore(db_path)
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        assert store.ingest_race(cursor, '2025-08-30', 2, 1, _boats([1, 2, 3, 4, 5, 6]))
+        assert not store.ingest_race(cursor, '2025-08-30', 2, 1, _boats([1, 2, 3, 4, 5, 6]))
+        assert store.ingest_race(cursor, '2025-08-30', 2, 2, _boats([2, 1, 3, 4, 5, 6]))
+        conn.commit()
+
+    card = store.get_card_features([4001, 4002, 9999])
+    assert set(card) == {4001, 4002}
+    assert card[4001]['recent_places'] == [1, 2]
+    assert card[4002]['recent_win_rate'] == 0.5
+
+    reloaded = FeatureStore(db_path)
+    assert reloaded.get_card_features([4001, 4002]) == card
+
+
+def test_backfill_from_stored_results(tmp_path):
+    """集計が未作成なら保存済みの結果履歴から構築する"""
+    db_path = str(tmp_path / 'kyotei.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                       winning_boat INTEGER, result_data TEXT)
+        ''')
+        for race_number, order in [(1, [3, 1, 2, 4, 5, 6]), (2, [1, 3, 2, 4, 5, 6])]:
+            conn.execute('INSERT INTO race_results VALUES (?, ?, ?, ?, ?)',
+                         ('2025-08-30', 5, race_number, 2, json.dumps({'boats': _boats(order)})))
+
+    store = FeatureStore(db_path)
+    features = store.get_racer_features(4002)
+    assert features['recent_places'] == [1, 3]
+    assert store.get_status()['racers'] == 6
+
+
+def test_equipment_stats_from_results_and_program(tmp_path):
+    """モーター・ボート番号は結果になければプログラムから補完して会場別に集計する"""
+    db_path = str(tmp_path / 'kyotei.db')
+    sqlite3.connect(db_path).close()
+    programs = [{
+        'race_stadium_number': 4,
+        'race_number': 1,
+        'boats': [{'racer_boat_number': boat, 'racer_assigned_motor_number': 10 + boat,
+                   'racer_assigned_boat_number': 50 + boat} for boat in range(1, 7)]
+    }]
+    program_index = program_boats_by_race(programs)
+
+    store = FeatureStore(db_path)
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        store.ingest_race(cursor, '2025-08-30', 4, 1, _boats([2, 1, 3, 4, 5, 6]), program_index.get((4, 1)))
+        boats = _boats([1, 3, 2, 4, 5, 6])
+        boats[0]['racer_assigned_motor_number'] = 11  # 結果側の番号を優先
+        store.ingest_race(cursor, '2025-08-31', 4, 1, boats)
+        conn.commit()
+
+    motor = store.get_equipment_stats(4, 'motor', 11)
+    assert motor == {'starts': 2, 'win_rate': 0.5, 'top2_rate': 1.0, 'top3_rate': 1.0}
+    assert store.get_equipment_stats(4, 'boat', 52) == {'starts': 1, 'win_rate': 1.0, 'top2_rate': 1.0, 'top3_rate': 1.0}
+    assert store.get_equipment_stats(5, 'motor', 11) is None
+
+    reloaded = FeatureStore(db_path)
+    assert reloaded.get_equipment_stats(4, 'motor', 11) == motor
+
+
+def test_course_win_rates_dense_table(tmp_path, monkeypatch):
+    """会場×コースの1着率を結果から集計し、レース番号別→会場→なしの順に返す"""
+    import core.feature_store as feature_store
+    monkeypatch.setattr(feature_store, 'MIN_VENUE_RACES', 4)
+    monkeypatch.setattr(feature_store, 'MIN_RACE_NUMBER_RACES', 2)
+
+    store = FeatureStore(str(tmp_path / 'missing.db'))
+    # 会場3: 1コース 2勝・2コース 2勝 / 会場5: 1コース 4勝
+    for day, (race_number, order) in enumerate([(1, [1, 2, 3, 4, 5, 6]), (1, [1, 2, 3, 4, 5, 6]),
+                                                (2, [2, 1, 3, 4, 5, 6]), (3, [2, 1, 3, 4, 5, 6])]):
+        store.ingest_race(None, f'2025-08-{day + 10}', 3, race_number, _boats(order))
+        store.ingest_race(None, f'2025-08-{day + 10}', 5, race_number, _boats([1, 2, 3, 4, 5, 6]))
+
+    assert store.get_course_win_rates(3) == {1: 0.5, 2: 0.5, 3: 0.0, 4: 0.0, 5: 0.0, 6: 0.0}
+    assert store.get_course_win_rates(3, 1)[1] == 1.0
+    assert store.get_course_win_rates(3, 2) == store.get_course_win_rates(3)
+    assert store.get_course_win_rates(7) is None
+
+    # 全国の1コース1着率は 6/8 = 0.75
+    assert store.get_venue_confidence_adjustment(3) == -0.1
+    assert store.get_venue_confidence_adjustment(5) == 0.1
+    assert store.get_venue_confidence_adjustment(7) is None
+
+
+def test_course_stats_backfilled_for_existing_store(tmp_path):
+    """レーサー集計が既にありコース別集計だけがない場合は結果履歴から構築する"""
+    db_path = str(tmp_path / 'kyotei.db')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                       winning_boat INTEGER, result_data TEXT)
+        ''')
+        conn.execute('INSERT INTO race_results VALUES (?, ?, ?, ?, ?)',
+                     ('2025-08-30', 5, 1, 1, json.dumps({'boats': _boats([1, 2, 3, 4, 5, 6])})))
+        conn.execute('CREATE TABLE racer_form (racer_number INTEGER PRIMARY KEY, form_data TEXT NOT NULL, updated_at TEXT)')
+        conn.execute('INSERT INTO racer_form VALUES (?, ?, ?)', (4001, json.dumps(RacerForm().to_dict()), None))
+
+    store = FeatureStore(db_path)
+    store.ensure_loaded()
+    assert store.get_status()['course_stat_races'] == 1
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT starts, wins FROM venue_course_stats WHERE venue_id = 5 AND course = 1').fetchone() == (1, 1)
+
+
+
+def test_ingest_across_processes_keeps_both_updates(tmp_path):
+    """別プロセスのストア（メモリは別）が交互に取り込んでも、互いの加算を上書きしない"""
+    db_path = str(tmp_path / 'kyotei.db')
+    sqlite3.connect(db_path).close()
+    flask_store, asgi_store = FeatureStore(db_path), FeatureStore(db_path)
+    flask_store.ensure_loaded()
+    asgi_store.ensure_loaded()
+
+    def ingest(store, race_date, order):
+        with sqlite3.connect(db_path) as conn:
+            result = store.ingest_race(conn.cursor(), race_date, 2, 1, _boats(order),
+                                       [{'racer_boat_number': 1, 'racer_assigned_motor_number': 11}])
+            conn.commit()
+        return result
+
+    assert ingest(flask_store, '2025-08-28', [1, 2, 3, 4, 5, 6])
+    # 先に取り込まれたレースは加算せず、DBの集計をメモリに反映する
+    assert not ingest(asgi_store, '2025-08-28', [1, 2, 3, 4, 5, 6])
+    assert asgi_store.get_card_features([4001])[4001]['recent_places'] == [1]
+    assert ingest(asgi_store, '2025-08-29', [2, 1, 3, 4, 5, 6])
+    assert ingest(flask_store, '2025-08-30', [1, 3, 2, 4, 5, 6])
+
+    expected = FeatureStore(db_path)
+    assert expected.get_card_features([4001])[4001]['recent_places'] == [1, 2, 1]
+    assert expected.get_equipment_stats(2, 'motor', 11)['starts'] == 3
+    assert flask_store.get_card_features([4001]) == expected.get_card_features([4001])
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT starts, wins FROM venue_course_stats WHERE venue_id = 2 AND course = 1').fetchall() == [(3, 2)]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+期間集計（累積和）と履歴データ分析のテスト
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+import core.historical_data_analyzer as historical_data_analyzer
+from core.date_view import bump_data_version
+from core.historical_data_analyzer import HistoricalDataAnalyzer, RangeCube
+
+
+def _db(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE predictions (race_date TEXT, venue_id INTEGER, venue_name TEXT, race_number INTEGER,
+                                                  predicted_win INTEGER, predicted_place TEXT, confidence REAL,
+                                                  pred_pos1 INTEGER, pred_pos2 INTEGER, pred_pos3 INTEGER)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER, second_boat INTEGER, third_boat INTEGER)''')
+        conn.executemany('INSERT INTO predictions VALUES (?, ?, NULL, ?, ?, NULL, 0.5, ?, ?, ?)', [
+            ('2025-08-28', 2, 1, 1, 1, 2, 3),
+            ('2025-08-29', 2, 1, 1, 1, 3, 2),
+            ('2025-08-29', 5, 1, 4, 4, 1, 2),
+            ('2025-08-30', 5, 2, 3, 3, 1, 2)
+        ])
+        conn.executemany('INSERT INTO race_results VALUES (?, ?, ?, ?, ?, ?)', [
+            ('2025-08-28', 2, 1, 1, 2, 3),
+            ('2025-08-29', 2, 1, 1, 2, 3),
+            ('2025-08-29', 5, 1, 1, 4, 2)
+        ])
+
+
+def test_range_totals_from_prefix_sums(tmp_path):
+    """期間・会場ごとの集計が生データの集計と一致する"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path)
+    cube = RangeCube(db_path)
+
+    assert cube.available_range() == ('2025-08-28', '2025-08-30')
+    days, counts = cube.venue_counts('2025-08-29', '2025-12-31')
+    assert days == 2
+    assert counts == {2: [1, 1, 1, 1, 0], 5: [2, 1, 0, 1, 0]}
+    assert cube.totals('2025-01-01', '2025-08-28') == (1, [1, 1, 1, 1, 1])
+    assert cube.totals('2025-08-29', '2025-08-30', venue_ids=[5]) == (2, [2, 1, 0, 1, 0])
+    assert cube.totals('2025-09-01', '2025-09-30') == (0, [0, 0, 0, 0, 0])
+
+
+def test_incremental_refresh_on_writes(tmp_path):
+    """書き込み通知のあった日付だけ差分で反映する"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path)
+    cube = RangeCube(db_path)
+    assert cube.totals('2025-08-28', '2025-08-31')[1] == [4, 3, 2, 3, 1]
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 5, 2, 3, 1, 2)")
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-31', 7, NULL, 1, 2, NULL, 0.5, 2, 1, 3)")
+    assert cube.totals('2025-08-28', '2025-08-31')[1] == [4, 3, 2, 3, 1]
+
+    bump_data_version(db_path, '2025-08-30')
+    bump_data_version(db_path, '2025-08-31')
+    assert cube.totals('2025-08-28', '2025-08-31') == (4, [5, 4, 3, 4, 2])
+    assert cube.totals('2025-08-30', '2025-08-30', venue_ids=[5]) == (1, [1, 1, 1, 1, 1])
+    assert cube.available_range() == ('2025-08-28', '2025-08-31')
+
+    # 途中の日付が増えた場合は作り直す
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-27', 2, NULL, 1, 1, NULL, 0.5, 1, 2, 3)")
+    bump_data_version(db_path, '2025-08-27')
+    assert cube.totals('2025-08-01', '2025-08-31') == (5, [6, 4, 3, 4, 2])
+
+
+def test_external_writes_detected_after_ttl(tmp_path, monkeypatch):
+    """通知のない他プロセスの書き込みも、一定時間後に行数・最大rowidの変化から反映する"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path)
+    cube = RangeCube(db_path)
+    assert cube.totals('2025-08-28', '2025-08-31')[1] == [4, 3, 2, 3, 1]
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 5, 2, 3, 1, 2)")
+        # 件数の変わらない置き換え（結果の訂正）
+        conn.execute("DELETE FROM race_results WHERE race_date = '2025-08-28'")
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-28', 2, 1, 2, 1, 3)")
+    assert cube.totals('2025-08-28', '2025-08-31')[1] == [4, 3, 2, 3, 1]
+
+    monkeypatch.setattr(historical_data_analyzer, 'TODAY_TTL_SECONDS', 0)
+    assert cube.totals('2025-08-28', '2025-08-31')[1] == [4, 4, 2, 4, 1]
+    assert cube.totals('2025-08-28', '2025-08-28')[1] == [1, 1, 0, 1, 0]
+
+
+def test_analyzer_reports(tmp_path):
+    """レポートは calculate_accuracy と同じ形式のサマリーと会場別成績を返す"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path)
+    analyzer = HistoricalDataAnalyzer(db_path)
+
+    selector = analyzer.generate_period_selector_data()
+    assert selector['available_range'] == {'start_date': '2025-08-28', 'end_date': '2025-08-30', 'total_days': 3}
+    assert selector['presets'][0] == {'label': '直近7日', 'start_date': '2025-08-28', 'end_date': '2025-08-30'}
+
+    report = analyzer.get_accuracy_report_by_date_range('2025-08-28', '2025-08-30')
+    assert report['days'] == 3
+    assert report['summary']['total_predictions'] == 4
+    assert report['summary']['win_accuracy'] == 50.0
+    assert report['summary']['pending_races'] == 1
+
+    venues = analyzer.get_venue_performance_analysis('2025-08-28', '2025-08-30')
+    assert [(venue['venue_name'], venue['win_accuracy']) for venue in venues] == [('戸田', 100.0), ('多摩川', 0.0)]
+    assert HistoricalDataAnalyzer(str(tmp_path / 'missing.db')).generate_period_selector_data()['available_range'] == {}
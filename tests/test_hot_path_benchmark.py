@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+ホットパスのマイクロベンチマークの固定入力・判定ロジックのテスト
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts'))
+
+from hot_path_benchmark import EXPECTED_PROGRAMS, evaluate, load_programs, run_benchmarks
+
+
+def test_fixture_is_recorded_day():
+    """固定入力は記録済みの1日分（156レース、会場・レース番号順）"""
+    race_date, programs = load_programs()
+    assert race_date == '2025-08-31'
+    assert len(programs) == EXPECTED_PROGRAMS
+    keys = [(p['race_stadium_number'], p['race_number']) for p in programs]
+    assert keys == sorted(keys)
+
+
+def test_benchmarks_report_timings_and_allocations():
+    """読み込める対象は時間・メモリを計測し、読み込めない対象は理由付きでスキップ"""
+    race_date, programs = load_programs()
+    results = run_benchmarks(race_date, programs[:12], repeat=1,
+                             names=['tracker_generate_real_prediction', 'prediction_columns', 'format_race_data_for_api'])
+
+    tracker = results['tracker_generate_real_prediction']
+    assert tracker['calls_per_day'] == 12
+    assert tracker['per_call_us']['median'] > 0
+    assert tracker['allocations']['peak_kb_per_day'] > 0
+    assert results['format_race_data_for_api']['calls_per_day'] == 1
+    for result in results.values():
+        assert 'skipped' in result or 'per_day_ms' in result
+
+
+def test_evaluate_against_baseline():
+    """1回あたりの時間・ピークメモリの悪化を検出し、スキップした対象は比較しない"""
+    def result(us, kb):
+        return {'per_call_us': {'median': us}, 'allocations': {'peak_kb_per_day': kb}}
+
+    baseline = {'results': {'a': result(100.0, 100.0), 'b': result(10.0, 10.0), 'c': result(5.0, 5.0)}}
+    current = {'a': result(110.0, 120.0), 'b': result(13.0, 20.0), 'c': {'skipped': 'ImportError'}}
+    failures = evaluate(current, baseline, max_regression=0.2, max_alloc_regression=0.5)
+    assert len(failures) == 2
+    assert all(failure.startswith('b:') for failure in failures)
+    assert evaluate(current, None) == []
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+タイマースケジューラーのテスト
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.job_scheduler import ScheduledJob, TimerScheduler
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_daily_next_run():
+    """毎日ジョブの次回実行時刻"""
+    job = ScheduledJob('morning', lambda: None, daily_at='06:00')
+    assert job.compute_next_run(datetime(2025, 8, 31, 5, 0)) == datetime(2025, 8, 31, 6, 0)
+    assert job.compute_next_run(datetime(2025, 8, 31, 6, 0)) == datetime(2025, 9, 1, 6, 0)
+
+
+def test_sub_minute_interval_and_once():
+    """1分未満の間隔ジョブと単発ジョブが実行される"""
+    timer = TimerScheduler(max_workers=2)
+    ticks = []
+    fired = threading.Event()
+    timer.every(0.05, lambda: ticks.append(1), name='tick')
+    timer.once(datetime.now() + timedelta(seconds=0.1), fired.set, name='once')
+    timer.start()
+    try:
+        assert fired.wait(2.0)
+        assert _wait_until(lambda: len(ticks) >= 3)
+        status = timer.get_status()
+        assert 'once' not in [job['name'] for job in status['jobs']]
+        tick = next(job for job in status['jobs'] if job['name'] == 'tick')
+        assert tick['runs'] >= 3
+        assert tick['duration_p50_ms'] is not None
+    finally:
+        timer.stop()
+
+
+def test_slow_job_does_not_block_others_and_times_out():
+    """遅いジョブが他のジョブを止めず、同時実行上限とタイムアウトが効く"""
+    timer = TimerScheduler(max_workers=3)
+    release = threading.Event()
+    fast_runs = []
+    timer.every(0.02, lambda: release.wait(2.0), name='slow', timeout=0.2)
+    timer.every(0.02, lambda: fast_runs.append(1), name='fast')
+    timer.start()
+    try:
+        assert _wait_until(lambda: len(fast_runs) >= 5)
+        assert _wait_until(lambda: timer.jobs['slow'].stats['timeouts'] >= 1)
+        slow = timer.jobs['slow'].stats
+        assert slow['skipped'] >= 1
+    finally:
+        release.set()
+        timer.stop()
+
+
+def test_reregistering_keeps_stats():
+    """同名ジョブの再登録で統計を引き継ぐ"""
+    timer = TimerScheduler()
+    first = timer.once(datetime.now() + timedelta(hours=1), lambda: None, name='result')
+    first.stats['runs'] = 3
+    second = timer.once(datetime.now() + timedelta(hours=2), lambda: None, name='result')
+    assert second.stats['runs'] == 3
+    assert timer.get_status()['queue_depth'] == 1
+    timer.cancel('result')
+    assert timer.get_status()['queue_depth'] == 0
+
+
+def test_once_job_stats_survive_dispatch():
+    """実行後に外れた単発ジョブを同名で再登録しても統計を引き継ぐ"""
+    timer = TimerScheduler()
+    fired = threading.Event()
+    timer.once(datetime.now(), fired.set, name='process_result_watch')
+    timer.start()
+    try:
+        assert fired.wait(2.0)
+        assert _wait_until(lambda: 'process_result_watch' not in timer.jobs)
+        rearmed = timer.once(datetime.now() + timedelta(hours=1), lambda: None, name='process_result_watch')
+        assert _wait_until(lambda: rearmed.stats['runs'] == 1)
+        status = next(job for job in timer.get_status()['jobs'] if job['name'] == 'process_result_watch')
+        assert status['runs'] == 1 and status['last_duration_ms'] is not None
+    finally:
+        timer.stop()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+負荷試験ハーネスの集計・判定ロジックのテスト
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts'))
+
+from load_test import evaluate, percentile, run_load, run_session, summarize
+
+
+def test_percentile_and_summary():
+    """分位点は線形補間、全体（_total）も集計する"""
+    assert percentile([], 50) is None
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([5], 99) == 5
+
+    summary = summarize({'index': [(10.0, True), (30.0, False)], 'api_races': [(20.0, True)]}, 2.0)
+    assert summary['index']['error_rate'] == 0.5
+    assert summary['index']['p50_ms'] == 20.0
+    assert summary['_total']['requests'] == 3
+    assert summary['_total']['throughput_rps'] == 1.5
+
+
+def test_evaluate_against_baseline():
+    """エラー率・p95・スループットの悪化を検出する"""
+    summary = summarize({'predict': [(100.0, True)] * 10}, 10.0)
+    assert evaluate(summary) == []
+    assert evaluate({}) == ['リクエストが1件も完了しませんでした']
+
+    baseline = {'summary': {'predict': {'p95_ms': 50.0}, '_total': {'throughput_rps': 2.0}}}
+    failures = evaluate(summary, baseline, max_regression=0.2)
+    assert len(failures) == 2
+    assert any('p95' in failure for failure in failures)
+    assert any('スループット' in failure for failure in failures)
+
+
+def test_session_follows_template_flow():
+    """トップページ → レース一覧API → 予想API → 一覧にあるレースの詳細"""
+    calls = []
+
+    def fetch(route, path):
+        calls.append((route, path))
+        if route == 'api_races':
+            return 200, json.dumps({'races': [{'race_id': '02_05'}]}).encode()
+        return 200, b'{}'
+
+    run_session(fetch, random.Random(0), lambda: None, '2025-08-31')
+    assert [route for route, _ in calls[:3]] == ['index', 'api_races_basic', 'api_races']
+    details = [path for route, path in calls if route == 'predict']
+    assert details and all(path == '/predict/02_05' for path in details)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'{"races": [{"race_id": "01_01"}]}' if self.path.startswith('/api/races') else b'<html></html>'
+        self.send_response(500 if self.path.startswith('/accuracy') else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_run_load_against_local_server():
+    """実際のHTTPサーバーに対して並列実行し、ルート別に集計する"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        summary, elapsed = run_load(f'http://127.0.0.1:{server.server_address[1]}', users=3, duration_s=0.3,
+                                    think_ms=0, ramp_up_s=0, seed=1, report_date='2025-08-31')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert elapsed >= 0.3
+    assert {'index', 'api_races_basic', 'api_races', 'predict'} <= set(summary)
+    assert summary['index']['error_rate'] == 0
+    if 'accuracy' in summary:
+        assert summary['accuracy']['error_rate'] == 1.0
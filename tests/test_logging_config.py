@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+ログ設定（キュー出力・間引きフィルター）のテスト
+"""
+
+import logging
+import os
+import sys
+
+# config パッケージは Flask に依存するためモジュールを直接読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules', 'config'))
+
+import logging_config
+from logging_config import SamplingFilter
+
+
+def _record(message, key=None, level=logging.WARNING):
+    record = logging.LogRecord('test', level, __file__, 1, message, None, None)
+    if key:
+        record.sample_key = key
+    return record
+
+
+def test_sampling_filter_limits_per_key():
+    """キーごとに burst 件まで通し、窓の切り替え時に省略件数を付記する"""
+    sampler = SamplingFilter(burst=2, interval=60)
+    passed = [sampler.filter(_record(f"結果データ未取得 {i}", 'missing')) for i in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert sampler.filter(_record('other', 'prediction'))
+    assert sampler.filter(_record('no key'))
+    assert sampler.filter(_record('error', 'missing', logging.ERROR))
+    assert sampler.suppressed_counts() == {'missing': 3}
+
+    sampler.interval = 0
+    record = _record('結果データ未取得 5', 'missing')
+    assert sampler.filter(record)
+    assert '3件を省略' in record.getMessage()
+
+
+def test_queue_logging_writes_in_background(tmp_path, monkeypatch):
+    """キュー経由でもファイルに出力され、stop_logging で書き出される"""
+    monkeypatch.setenv('LOG_DIRECTORY', str(tmp_path))
+    monkeypatch.setenv('LOG_QUEUE', '1')
+    monkeypatch.setenv('LOG_SAMPLE_BURST', '1')
+
+    logger = logging_config.setup_logging('kyotei_queue_test')
+    logger.propagate = False
+    try:
+        assert [type(h).__name__ for h in logger.handlers] == ['QueueHandler']
+        for i in range(3):
+            logger.warning(f"結果データ未取得: {i}", extra={'sample_key': 'test'})
+        logger.info("完了")
+    finally:
+        logging_config.stop_logging()
+        logger.handlers.clear()
+
+    content = (tmp_path / 'kyotei_system.log').read_text(encoding='utf-8')
+    assert '結果データ未取得: 0' in content
+    assert '結果データ未取得: 1' not in content
+    assert '完了' in content
+
+
+def test_sampling_filter_decides_once_per_record():
+    """複数のハンドラーで同じレコードを判定しても窓の件数は1件分だけ進む"""
+    sampler = SamplingFilter(burst=2, interval=60)
+    first = _record('結果データ未取得 0', 'missing')
+    assert all(sampler.filter(first) for _ in range(3))
+    second = _record('結果データ未取得 1', 'missing')
+    assert all(sampler.filter(second) for _ in range(3))
+    third = _record('結果データ未取得 2', 'missing')
+    assert not any(sampler.filter(third) for _ in range(3))
+    assert sampler.suppressed_counts() == {'missing': 1}
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+メトリクスレジストリのテスト
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.metrics import MetricsRegistry
+
+
+def _find(items, name, **labels):
+    return next(item for item in items if item['name'] == name and item['labels'] == labels)
+
+
+def test_counters_merge_across_threads():
+    """スレッドごとのシャードが集計時に統合され、終了スレッド分も保持される"""
+    metrics = MetricsRegistry()
+
+    def worker():
+        for _ in range(100):
+            metrics.inc('http_requests_total', endpoint='/api/races', status='2xx')
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.snapshot()
+    assert _find(snapshot['counters'], 'http_requests_total', endpoint='/api/races', status='2xx')['value'] == 400
+    # 終了スレッドのシャードは畳み込まれても値が変わらない
+    assert _find(metrics.snapshot()['counters'], 'http_requests_total', endpoint='/api/races', status='2xx')['value'] == 400
+
+
+def test_dead_shards_are_folded_without_snapshots():
+    """スレッドが入れ替わり続けても、集計しなくてもシャード数が増え続けない"""
+    metrics = MetricsRegistry()
+
+    def request():
+        metrics.inc('http_requests_total', endpoint='/predict', status='2xx')
+        metrics.observe('http_request_seconds', 0.01, endpoint='/predict')
+
+    for _ in range(50):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+
+    assert len(metrics._shards) <= 1
+    snapshot = metrics.snapshot()
+    assert _find(snapshot['counters'], 'http_requests_total', endpoint='/predict', status='2xx')['value'] == 50
+    assert _find(snapshot['histograms'], 'http_request_seconds', endpoint='/predict')['count'] == 50
+
+
+def test_histogram_percentiles():
+    """分布のp50/p95/p99を算出する"""
+    metrics = MetricsRegistry()
+    for value in range(1, 101):
+        metrics.observe('upstream_fetch_seconds', value / 1000, source='programs')
+
+    histogram = _find(metrics.snapshot()['histograms'], 'upstream_fetch_seconds', source='programs')
+    assert histogram['count'] == 100
+    assert histogram['p50'] == 0.05
+    assert histogram['p95'] == 0.095
+    assert histogram['p99'] == 0.099
+
+
+def test_prometheus_text_and_collectors():
+    """Prometheus テキスト形式で出力し、収集関数のゲージを反映する"""
+    metrics = MetricsRegistry()
+    metrics.cache_hit('race_list', True)
+    metrics.cache_hit('race_list', False)
+    metrics.observe('scheduler_job_seconds', 0.5, job='morning_data_collection')
+    metrics.register_collector(lambda m: m.set_gauge('scheduler_queue_depth', 3))
+
+    text = metrics.to_prometheus()
+    assert '# TYPE cache_requests_total counter' in text
+    assert 'cache_requests_total{cache="race_list",result="hit"} 1' in text
+    assert '# TYPE scheduler_queue_depth gauge' in text
+    assert 'scheduler_queue_depth 3' in text
+    assert 'scheduler_job_seconds{job="morning_data_collection",quantile="0.5"} 0.5' in text
+    assert 'scheduler_job_seconds_count{job="morning_data_collection"} 1' in text
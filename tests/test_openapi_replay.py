@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+BoatraceOpenAPI 記録・再生サーバーと接続先設定のテスト
+"""
+
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core import openapi_endpoint
+from core.openapi_replay import ReplayConfig, ReplayStore, start_replay_server
+
+
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReplayStore(str(tmp_path / 'fixtures'))
+    cache_file = tmp_path / 'boatrace_openapi_cache.json'
+    cache_file.write_text(json.dumps({'timestamp': 0, 'date': '2025-08-31',
+                                      'data': {'programs': [{'race_stadium_number': 2, 'race_number': 1}]}}))
+    store.import_cache_file(str(cache_file))
+    store.record('results', '2025-08-31', b'{"results": []}')
+    return store
+
+
+def test_replays_recorded_day_with_etag(store):
+    """記録した日付を today.json・日付指定の両方で返し、ETag一致時は 304"""
+    server = start_replay_server(store)
+    try:
+        status, headers, body = _get(f'{server.base_url}/programs/v2/today.json')
+        assert status == 200
+        assert json.loads(body)['programs'][0]['race_stadium_number'] == 2
+
+        status, _, _ = _get(f'{server.base_url}/programs/v2/20250831.json', {'If-None-Match': headers['ETag']})
+        assert status == 304
+        assert _get(f'{server.base_url}/results/v2/20250831.json')[0] == 200
+        assert _get(f'{server.base_url}/results/v2/20250830.json')[0] == 404
+        assert server.stats['ok'] == 2 and server.stats['not_modified'] == 1 and server.stats['not_found'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_error_injection_and_latency(store):
+    """エラー注入の割合と遅延の範囲"""
+    server = start_replay_server(store, ReplayConfig(error_rate=1.0, error_status=502))
+    try:
+        assert _get(f'{server.base_url}/programs/v2/today.json')[0] == 502
+        assert server.stats['errors'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    config = ReplayConfig(latency_ms=100, jitter_ms=20, seed=1)
+    delays = [config.delay() for _ in range(50)]
+    assert all(0.08 <= delay <= 0.12 for delay in delays)
+    assert ReplayConfig(latency_ms=5, jitter_ms=50, seed=1).delay() >= 0
+
+
+def test_base_url_setting(monkeypatch):
+    """接続先は設定値 → 環境変数 → 既定値の順で決まる"""
+    monkeypatch.delenv('BOATRACE_API_BASE_URL', raising=False)
+    openapi_endpoint.set_base_url(None)
+    assert openapi_endpoint.programs_url() == 'https://boatraceopenapi.github.io/programs/v2/today.json'
+
+    monkeypatch.setenv('BOATRACE_API_BASE_URL', 'http://127.0.0.1:8765/')
+    assert openapi_endpoint.results_url('2025-08-31') == 'http://127.0.0.1:8765/results/v2/20250831.json'
+
+    openapi_endpoint.set_base_url('http://localhost:9000')
+    try:
+        assert openapi_endpoint.programs_base_url() == 'http://localhost:9000/programs/v2'
+    finally:
+        openapi_endpoint.set_base_url(None)
@@ -13,7 +13,9 @@ def test_openapi_direct():
     print("=== BoatraceOpenAPI 直接テスト ===")
     
     try:
-        api_url = "https://boatraceopenapi.github.io/programs/v2/today.json"
+        # BOATRACE_API_BASE_URL でローカルの再生サーバー（scripts/openapi_standin.py）を指定可能
+        base_url = os.getenv('BOATRACE_API_BASE_URL', 'https://boatraceopenapi.github.io').rstrip('/')
+        api_url = f"{base_url}/programs/v2/today.json"
         print(f"API URL: {api_url}")
         
         response = requests.get(api_url, timeout=10)
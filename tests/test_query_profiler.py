@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+SQLiteクエリプロファイラーのテスト
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.query_profiler import QueryStatsRegistry, connect, get_query_stats, normalize_sql, param_shape
+
+
+def test_normalize_sql():
+    """空白・リテラル・IN句を正規化する"""
+    sql = """
+        SELECT * FROM race_details
+        WHERE race_date = '2025-08-30' AND venue_id IN (?, ?, ?) AND race_number = 12
+    """
+    assert normalize_sql(sql) == 'SELECT * FROM race_details WHERE race_date = ? AND venue_id IN (...) AND race_number = ?'
+    assert param_shape(('2025-08-30', 1)) == ['str', 'int']
+    assert param_shape({'date': None}) == {'date': 'NoneType'}
+
+
+def test_first_slow_only():
+    """初めて遅延した場合のみTrueを返し、集計は続ける"""
+    registry = QueryStatsRegistry(slow_query_ms=10)
+    assert registry.record('SELECT ?', 1.0, (1,)) is False
+    assert registry.record('SELECT ?', 20.0, (1,)) is True
+    assert registry.record('SELECT ?', 30.0, (1,)) is False
+
+    stats = registry.get_stats()[0]
+    assert stats['count'] == 3
+    assert stats['slow_count'] == 2
+    assert stats['max_ms'] == 30.0
+    assert stats['param_shape'] == ['int']
+
+
+def test_connection_execute_captures_plan():
+    """Connection.execute 経由でも計測し、遅いSELECTの実行計画を取得する"""
+    stats = get_query_stats()
+    original = stats.slow_query_ms
+    stats.reset()
+    stats.slow_query_ms = 0
+    try:
+        with connect(':memory:') as conn:
+            conn.execute('CREATE TABLE race_info (race_date TEXT, venue_id INTEGER)')
+            conn.executemany('INSERT INTO race_info VALUES (?, ?)', [('2025-08-30', 1), ('2025-08-30', 2)])
+            rows = conn.execute('SELECT venue_id FROM race_info WHERE race_date = ?', ('2025-08-30',)).fetchall()
+            cursor = conn.cursor()
+            cursor.execute('SELECT venue_id FROM race_info WHERE race_date = ?', ('2025-08-31',))
+        assert len(rows) == 2
+
+        by_sql = {row['sql']: row for row in stats.get_stats()}
+        select = by_sql['SELECT venue_id FROM race_info WHERE race_date = ?']
+        assert select['count'] == 2
+        assert select['query_plan'] and 'race_info' in select['query_plan'][0]
+        assert by_sql['INSERT INTO race_info VALUES (?, ?)']['query_plan'] is None
+    finally:
+        stats.slow_query_ms = original
+        stats.reset()
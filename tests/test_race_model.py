@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+レースモデル（Race/Entrant）のテスト
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.metrics import get_metrics
+from core.race_model import Entrant, Race, as_race, clear_races_cache, get_races, venue_name
+
+
+def _program(venue_id=2, race_number=1, closed_at='2025-08-30 10:47:00'):
+    return {
+        'race_date': '2025-08-30',
+        'race_stadium_number': venue_id,
+        'race_number': race_number,
+        'race_closed_at': closed_at,
+        'race_grade_number': 5,
+        'race_title': '一般戦',
+        'race_distance': 1800,
+        'boats': [{
+            'racer_boat_number': boat,
+            'racer_name': f'選手{boat}',
+            'racer_number': 4000 + boat,
+            'racer_class_number': 1 if boat == 1 else 3,
+            'racer_average_start_timing': 0.15,
+            'racer_national_top_1_percent': 6.5 - boat * 0.5,
+            'racer_national_top_2_percent': 40.0,
+            'racer_assigned_motor_number': 10 + boat,
+            'racer_assigned_motor_top_2_percent': 35.0,
+            'racer_assigned_boat_number': 50 + boat,
+            'racer_assigned_boat_top_2_percent': '30.5'
+        } for boat in range(1, 7)]
+    }
+
+
+def test_parse_program():
+    """フィードのキー名を型付きの属性に変換する"""
+    race = Race.from_program(_program())
+    assert race.key == (2, 1)
+    assert race.race_id == '02_01'
+    assert race.venue_name == '戸田'
+    assert race.closed_at.hour == 10 and race.closed_at.minute == 47
+    assert race.racer_numbers() == [4001, 4002, 4003, 4004, 4005, 4006]
+
+    first = race.entrant(1)
+    assert first.racer_class == 'A1'
+    assert first.national_win_rate == 6.0
+    assert first.motor_number == 11
+    assert first.boat_top2_rate == 30.5
+    assert race.entrant(7) is None
+    assert venue_name(0) == '不明' and venue_name(24) == '大村'
+
+
+def test_legacy_keys_and_round_trip():
+    """旧形式のキー名（racers / win_rate / racer_rank）にも対応し、to_dict で元の形式に戻る"""
+    race = as_race({'venue_id': 5, 'race_number': 3, 'start_time': '15:30',
+                    'racers': [{'boat_number': 2, 'name': '旧形式', 'win_rate': '5.5', 'racer_rank': 'A2'}]})
+    entrant = race.entrants[0]
+    assert (race.venue_id, entrant.boat_number, entrant.name) == (5, 2, '旧形式')
+    assert entrant.national_win_rate == 5.5
+    assert entrant.racer_class == 'A2'
+    assert as_race(race) is race
+    assert as_race(None) is None
+
+    program = _program()
+    restored = Race.from_program(Race.from_program(program).to_dict())
+    assert restored.to_dict() == Race.from_program(program).to_dict()
+    assert restored.to_dict()['boats'][0]['racer_assigned_boat_top_2_percent'] == 30.5
+
+
+def _race_model_hits():
+    for counter in get_metrics().snapshot()['counters']:
+        if counter['name'] == 'cache_requests_total' and counter['labels'] == {'cache': 'race_model', 'result': 'hit'}:
+            return counter['value']
+    return 0
+
+
+def test_get_races_reuses_snapshot():
+    """同じスナップショットは再解析せず、内容が変われば解析し直す"""
+    clear_races_cache()
+    before = _race_model_hits()
+
+    programs = [_program(2, 1), _program(2, 2, '2025-08-30 11:15:00'), 'invalid']
+    races = get_races(programs)
+    assert [race.key for race in races] == [(2, 1), (2, 2)]
+    assert get_races(list(programs)) is races
+    assert _race_model_hits() == before + 1
+
+    programs[1] = _program(2, 2, '2025-08-30 11:20:00')
+    assert get_races(programs) is not races
+
+
+def test_get_races_reparses_changed_entrants():
+    """同じ形のスナップショットでも、選手・モーター・勝率が変われば解析し直す"""
+    clear_races_cache()
+    races = get_races([_program(2, 1)])
+
+    refetched = _program(2, 1)
+    refetched['boats'][0]['racer_number'] = 4999
+    refetched['boats'][1]['racer_assigned_motor_number'] = 55
+    refetched['boats'][2]['racer_national_top_1_percent'] = 7.1
+    reparsed = get_races([refetched])
+    assert reparsed is not races
+    assert reparsed[0].entrant(1).racer_number == 4999
+    assert reparsed[0].entrant(2).motor_number == 55
+    assert reparsed[0].entrant(3).national_win_rate == 7.1
+
+
+def test_slotted_objects_have_no_dict():
+    """__slots__ によりインスタンス辞書を持たない"""
+    entrant = Entrant.from_program(_program()['boats'][0])
+    assert not hasattr(entrant, '__dict__')
+    assert not hasattr(Race.from_program(_program()), '__dict__')
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+レースタイムラインのテスト
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.race_timeline import RaceTimeline, get_race_timeline, parse_race_time
+
+
+def _programs():
+    return [
+        {'race_stadium_number': 2, 'race_number': 2, 'race_closed_at': '2025-08-31 11:15:00'},
+        {'race_stadium_number': 1, 'race_number': 1, 'race_closed_at': '2025-08-31 10:30:00'},
+        {'race_stadium_number': 3, 'race_number': 1, 'race_closed_at': '2025-08-31 12:00:00'},
+        {'race_stadium_number': 4, 'race_number': 1, 'race_closed_at': '未定'},
+    ]
+
+
+def test_parse_race_time():
+    """締切時刻解析"""
+    assert parse_race_time('2025-08-31 10:30:00') == datetime(2025, 8, 31, 10, 30)
+    assert parse_race_time('未定') is None
+    assert parse_race_time('不正な値') is None
+    assert parse_race_time(None) is None
+
+
+def test_finished_live_upcoming():
+    """時刻tにおける終了・進行中・締切前の判定"""
+    timeline = RaceTimeline(_programs())
+    now = datetime(2025, 8, 31, 11, 20)
+
+    assert timeline.finished_keys(now) == {(1, 1)}
+    assert timeline.live_keys(now) == [(2, 2)]
+    assert timeline.upcoming_keys(now) == [(3, 1)]
+    assert timeline.next_race(now) == (datetime(2025, 8, 31, 12, 0), (3, 1))
+    assert timeline.undetermined == [(4, 1)]
+
+    assert timeline.is_finished(1, 1, now)
+    assert not timeline.is_finished(2, 2, now)
+    assert not timeline.is_finished(4, 1, now)
+    assert timeline.next_race(datetime(2025, 8, 31, 13, 0)) is None
+
+
+def test_sort_key_order():
+    """未終了を時刻順で先、終了済みを後、未定を最後に並べる"""
+    timeline = RaceTimeline(_programs())
+    now = datetime(2025, 8, 31, 11, 20)
+    keys = [(2, 2), (1, 1), (3, 1), (4, 1)]
+    ordered = sorted(keys, key=lambda k: timeline.sort_key(k[0], k[1], timeline.is_finished(k[0], k[1], now), now))
+    assert ordered == [(3, 1), (2, 2), (1, 1), (4, 1)]
+
+
+def test_snapshot_memoization():
+    """同一スナップショットではタイムラインを再構築しない"""
+    first = get_race_timeline(_programs())
+    assert get_race_timeline(_programs()) is first
+
+    changed = _programs()
+    changed[0]['race_closed_at'] = '2025-08-31 11:20:00'
+    assert get_race_timeline(changed) is not first
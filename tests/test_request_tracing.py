@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+リクエストトレーシングのテスト
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.request_tracing import (RequestTrace, SlowTraceBuffer, current_trace, end_trace,
+                                  span, start_trace, traced)
+
+
+def test_spans_and_server_timing():
+    """スパンを記録し、同名スパンを合算してServer-Timingを生成する"""
+    trace = start_trace('GET', '/predict/1_1')
+    try:
+        with span('fetch_race_data'):
+            with span('upstream', 'upstream', 'https://example/today.json'):
+                time.sleep(0.001)
+            with span('upstream', 'upstream'):
+                pass
+        traced('render')(lambda: None)()
+    finally:
+        end_trace()
+    trace.finish(200)
+
+    assert [s['name'] for s in trace.spans] == ['upstream', 'upstream', 'fetch_race_data', 'render']
+    assert [s['depth'] for s in trace.spans] == [1, 1, 0, 0]
+
+    header = trace.server_timing()
+    assert 'upstream;dur=' in header and 'desc="x2"' in header
+    assert header.endswith(f"total;dur={trace.duration_ms:.1f}")
+    assert current_trace() is None
+
+
+def test_span_without_trace_is_noop():
+    """トレース外のスパンは何もしない"""
+    with span('phase'):
+        pass
+    assert current_trace() is None
+
+
+def test_slow_buffer_keeps_slowest():
+    """遅いトレース上位N件のみ保持する"""
+    buffer = SlowTraceBuffer(capacity=2)
+    for duration in (5.0, 50.0, 1.0, 20.0):
+        trace = RequestTrace('GET', f'/r/{duration}')
+        trace.duration_ms = duration
+        buffer.record(trace)
+
+    assert [t['duration_ms'] for t in buffer.slowest()] == [50.0, 20.0]
+    assert buffer.recorded == 4
+
+
+def test_handler_spans_are_not_double_counted():
+    """handler スパンは内訳にのみ残り、Server-Timing・SQLiteメトリクスには載らない"""
+    from core.metrics import get_metrics
+
+    def sqlite_count():
+        return sum(h['count'] for h in get_metrics().snapshot()['histograms'] if h['name'] == 'sqlite_query_seconds')
+
+    before = sqlite_count()
+    trace = start_trace('GET', '/predict/1_1')
+    try:
+        with span('db_race_results', 'handler'):
+            with span('sql', 'db', 'SELECT 1'):
+                pass
+        with span('api_today_races', 'handler'):
+            with span('upstream', 'upstream'):
+                pass
+    finally:
+        end_trace()
+    trace.finish(200)
+
+    assert [s['name'] for s in trace.spans] == ['sql', 'db_race_results', 'upstream', 'api_today_races']
+    header = trace.server_timing()
+    assert 'sql;dur=' in header and 'upstream;dur=' in header
+    assert 'db_race_results' not in header and 'api_today_races' not in header
+    assert sqlite_count() == before + 1
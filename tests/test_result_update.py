@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+当日結果の保存（Flask・ASGI・スケジューラー共通）のテスト
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+import core.feature_store as feature_store
+from core.feature_store import FeatureStore
+from core.result_update import save_results, write_results
+
+
+def _result(venue_id, race_number, places):
+    """艇番→着順 の辞書から結果データを作成"""
+    return {'race_stadium_number': venue_id, 'race_number': race_number,
+            'boats': [{'racer_boat_number': boat, 'racer_number': 4000 + boat, 'racer_place_number': place}
+                      for boat, place in places.items()]}
+
+
+def _db(path, monkeypatch):
+    with sqlite3.connect(path) as conn:
+        # 旧スキーマ（raw_result_data・fetched_at 列のないDB）
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, venue_name TEXT, race_number INTEGER,
+                                                   winning_boat INTEGER, second_boat INTEGER, third_boat INTEGER,
+                                                   trifecta_result TEXT, place_results TEXT, result_data TEXT,
+                                                   UNIQUE(race_date, venue_id, race_number))''')
+    monkeypatch.setattr(feature_store, '_feature_store', FeatureStore(path))
+
+
+def test_save_results_writes_existing_columns(tmp_path, monkeypatch):
+    """DBにある列だけに書き込み、1着が決まったレースを保存する"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path, monkeypatch)
+    results = [_result(2, 1, {1: 1, 2: 3, 3: 2}), _result(2, 2, {4: 1}), _result(2, 3, {})]
+
+    assert save_results(db_path, results, race_date='2025-08-30') == 2
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('''SELECT race_number, venue_name, winning_boat, second_boat, third_boat, trifecta_result,
+                                      place_results, result_data FROM race_results ORDER BY race_number''').fetchall()
+        ingested = conn.execute('SELECT COUNT(*) FROM feature_ingested_races').fetchone()[0]
+    assert [row[:7] for row in rows] == [(1, '戸田', 1, 3, 2, '1-3-2', '[1, 3, 2]'),
+                                         (2, '戸田', 4, None, None, '4-N-N', '[4, null, null]')]
+    assert json.loads(rows[0][7])['race_number'] == 1
+    assert ingested == 2
+
+
+def test_write_results_complete_only(tmp_path, monkeypatch):
+    """complete_only なら3着まで確定したレースのみ保存し、行IDと着順を返す（commit は呼び出し側）"""
+    db_path = str(tmp_path / 'comprehensive.db')
+    _db(db_path, monkeypatch)
+    results = [_result(5, 1, {1: 2, 2: 1, 3: 3}), _result(5, 2, {1: 1, 2: 2})]
+
+    with sqlite3.connect(db_path) as conn:
+        saved = write_results(conn.cursor(), db_path, results, race_date='2025-08-30', complete_only=True)
+        conn.commit()
+    assert [(race['race_number'], places) for race, places, _ in saved] == [(1, [2, 1, 3])]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT rowid, race_number FROM race_results').fetchall() == [(saved[0][2], 1)]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+結果取得ウォッチキューのテスト
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+from core.race_timeline import RaceTimeline
+from core.result_watch import ResultWatchQueue
+
+
+def _timeline():
+    return RaceTimeline([
+        {'race_stadium_number': 1, 'race_number': 1, 'race_closed_at': '2025-08-31 10:30:00'},
+        {'race_stadium_number': 2, 'race_number': 1, 'race_closed_at': '2025-08-31 10:30:30'},
+        {'race_stadium_number': 3, 'race_number': 1, 'race_closed_at': '2025-08-31 10:45:00'},
+    ])
+
+
+def test_same_minute_races_are_coalesced():
+    """同じ分に締め切るレースは1回の取得にまとめる"""
+    queue = ResultWatchQueue(first_delay_minutes=10)
+    assert queue.plan(_timeline()) == 3
+    assert queue.next_due() == datetime(2025, 8, 31, 10, 40)
+
+    assert queue.pop_due(datetime(2025, 8, 31, 10, 39)) == set()
+    assert queue.pop_due(datetime(2025, 8, 31, 10, 40)) == {(1, 1), (2, 1)}
+    assert queue.next_due() == datetime(2025, 8, 31, 10, 55)
+
+
+def test_done_keys_are_not_planned():
+    """結果保存済みのレースは計画しない"""
+    queue = ResultWatchQueue()
+    assert queue.plan(_timeline(), done_keys={(1, 1)}) == 2
+    assert queue.plan(_timeline()) == 1  # 既に計画済みのレースは重複させない
+
+
+def test_exponential_backoff_until_give_up():
+    """結果未反映のレースは指数バックオフで再試行し、上限で断念する"""
+    queue = ResultWatchQueue(first_delay_minutes=10, backoff_minutes=5, backoff_max_minutes=60, max_attempts=3)
+    queue.plan(_timeline())
+    now = datetime(2025, 8, 31, 10, 40)
+    due = queue.pop_due(now)
+    queue.mark_done({(1, 1)})
+
+    assert queue.reschedule(due - {(1, 1)}, now) == 1
+    assert queue.pop_due(datetime(2025, 8, 31, 10, 44)) == set()
+    now = datetime(2025, 8, 31, 10, 45)
+    assert queue.pop_due(now) == {(2, 1)}
+
+    assert queue.reschedule({(2, 1)}, now) == 1
+    now = datetime(2025, 8, 31, 10, 55)
+    assert (2, 1) in queue.pop_due(now)
+
+    assert queue.reschedule({(2, 1)}, now) == 0
+    assert len(queue) == 1  # 残りは(3, 1)のみ
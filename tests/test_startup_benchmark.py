@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+起動ベンチマークの判定ロジックのテスト
+"""
+
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts'))
+
+from startup_benchmark import DEFAULT_FIXTURE, evaluate, parse_importtime, start_upstream, summarize_runs
+
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   _argparse_helper
+import time:      1200 |       8800 | argparse
+import time:       300 |        300 |     flask.json
+import time:       210 |      70000 |   flask
+import time:      4000 |       4000 |   api_fetcher
+import time:       500 |      90000 | main_app
+import time:       700 |        700 | atexit_hook
+"""
+
+
+def test_parse_importtime_reports_modules_under_main_app():
+    """main_app の行で終わるブロック（子は親より先に出力される）の入れ子のインポートを累積時間順に返す"""
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+    assert [(r['module'], r['depth']) for r in records] == [('flask', 1), ('api_fetcher', 1), ('flask.json', 2)]
+    assert records[0]['cumulative_ms'] == 70.0
+    assert parse_importtime(IMPORTTIME_OUTPUT, start_module='missing') == []
+
+
+def test_threshold_and_baseline_regression():
+    """しきい値超過とベースラインからの悪化を検出する"""
+    runs = [{'phases': {'total': value, 'create_application': value / 2}} for value in (400, 500, 900)]
+    summary = summarize_runs(runs)
+    assert summary['total']['median_ms'] == 500
+
+    assert evaluate(summary, threshold_ms=1000) == []
+    assert len(evaluate(summary, threshold_ms=450)) == 1
+
+    baseline = {'summary': {'total': {'median_ms': 300}, 'create_application': {'median_ms': 250}}}
+    failures = evaluate(summary, threshold_ms=1000, baseline=baseline, max_regression=0.2)
+    assert len(failures) == 1 and failures[0].startswith('total')
+
+
+def test_failed_run_is_reported():
+    """計測に失敗した場合は不合格"""
+    assert evaluate(summarize_runs([{'phases': {}}]), threshold_ms=1000) == ['起動計測に失敗しました']
+
+
+def test_upstream_serves_fixture_as_today(tmp_path):
+    """スケジューラー開始時の上流取得は再生サーバーの記録済み出走表を today.json として受け取る"""
+    server = start_upstream(str(tmp_path / 'replay'), DEFAULT_FIXTURE, latency_ms=0)
+    try:
+        with urllib.request.urlopen(f"{server.base_url}/programs/v2/today.json", timeout=5) as response:
+            assert len(json.load(response)['programs']) == 156
+    finally:
+        server.shutdown()
+        server.server_close()
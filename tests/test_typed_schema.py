@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+予想・結果の型付きカラム移行のテスト
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'modules'))
+
+import core.typed_schema as typed_schema
+from core.typed_schema import ensure_typed_schema, parse_positions, prediction_columns, top3
+
+
+def _legacy_db(path):
+    """JSON・カンマ区切りで保存していた旧スキーマのDBを作成"""
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE predictions (race_date TEXT, venue_id INTEGER, venue_name TEXT, race_number INTEGER,
+                                                  predicted_win INTEGER, predicted_place TEXT, confidence REAL)''')
+        conn.execute('''CREATE TABLE race_details (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   race_data TEXT, prediction_data TEXT)''')
+        conn.execute('''CREATE TABLE race_results (race_date TEXT, venue_id INTEGER, race_number INTEGER,
+                                                   winning_boat INTEGER, place_results TEXT)''')
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-30', 2, '戸田', 1, 1, '1,3,2', 0.6)")
+        conn.execute("INSERT INTO predictions VALUES ('2025-08-30', 2, '戸田', 2, 4, '[4, 1, 2]', 0.4)")
+        program = {'race_stadium_number': 2, 'race_number': 1,
+                   'boats': [{'racer_boat_number': boat, 'racer_number': 4000 + boat, 'racer_name': f'選手{boat}',
+                              'racer_national_top_1_percent': 5.0} for boat in range(1, 7)]}
+        conn.execute('INSERT INTO race_details VALUES (?, ?, ?, ?, ?)',
+                     ('2025-08-30', 2, 1, json.dumps(program),
+                      json.dumps({'recommended_win': 1, 'recommended_place': [1, 3, 2], 'confidence': 0.6})))
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 2, 1, 1, '[1, 3, 2, 5, 4, 6]')")
+        conn.execute("INSERT INTO race_results VALUES ('2025-08-30', 2, 2, 1, '[1, 4, 2, 5, 3, 6]')")
+
+
+def test_parse_positions():
+    """保存形式の違いを吸収して艇番リストにする"""
+    assert parse_positions('1,3,2') == [1, 3, 2]
+    assert parse_positions('[4, 1, 2]') == [4, 1, 2]
+    assert parse_positions('1-2-N') == [1, 2]
+    assert parse_positions(None) == []
+    assert parse_positions('broken[') == []
+    assert top3([5]) == (5, None, None)
+    assert prediction_columns({'recommended_win': '2', 'recommended_place': [2, 1, 3], 'confidence': 0.7}) == (2, 0.7, 2, 1, 3)
+    assert prediction_columns(None) == (None, None, None, None, None)
+
+
+def test_migration_runs_once_and_enables_sql_hit_checks(tmp_path, monkeypatch):
+    """既存行を一度だけ移行し、的中判定をSQLだけで行える"""
+    monkeypatch.setattr(typed_schema, '_ready_paths', set())
+    db_path = str(tmp_path / 'tracker.db')
+    _legacy_db(db_path)
+
+    counts = ensure_typed_schema(db_path)
+    assert counts == {'predictions': 2, 'race_details': 1, 'race_entrants': 6, 'race_results': 2}
+    assert ensure_typed_schema(db_path) is None
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('''
+            SELECT p.race_number, p.pred_pos1, p.pred_pos2, p.pred_pos3,
+                   p.predicted_win = r.winning_boat,
+                   p.predicted_win IN (r.winning_boat, r.second_boat, r.third_boat),
+                   p.pred_pos1 = r.winning_boat AND p.pred_pos2 = r.second_boat AND p.pred_pos3 = r.third_boat
+            FROM predictions p
+            JOIN race_results r ON p.race_date = r.race_date AND p.venue_id = r.venue_id AND p.race_number = r.race_number
+            ORDER BY p.race_number
+        ''').fetchall()
+        assert rows == [(1, 1, 3, 2, 1, 1, 1), (2, 4, 1, 2, 0, 1, 0)]
+        assert conn.execute('SELECT predicted_win, confidence, pred_pos2 FROM race_details').fetchone() == (1, 0.6, 3)
+        assert conn.execute('SELECT racer_number, national_win_rate FROM race_entrants WHERE boat_number = 3').fetchone() == (4003, 5.0)
+
+        # 移行済みの記録があれば再移行はしないが、順位が未設定の予想行は新しいプロセスで補完する
+        conn.execute("UPDATE predictions SET pred_pos1 = NULL WHERE race_number = 2")
+    monkeypatch.setattr(typed_schema, '_ready_paths', set())
+    assert ensure_typed_schema(db_path) is None
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT pred_pos1 FROM predictions WHERE race_number = 2').fetchone() == (4,)
+
+
+def test_missing_database_is_not_created(tmp_path):
+    """DBが存在しない場合は作成しない"""
+    db_path = str(tmp_path / 'missing.db')
+    assert ensure_typed_schema(db_path) is None
+    assert not os.path.exists(db_path)
+
+
+
+def test_trifecta_prediction_takes_precedence(tmp_path, monkeypatch):
+    """predicted_trifecta があれば pred_pos1..3 に使い、移行済みのDBにも後から反映する"""
+    monkeypatch.setattr(typed_schema, '_ready_paths', set())
+    db_path = str(tmp_path / 'tracker.db')
+    _legacy_db(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('ALTER TABLE predictions ADD COLUMN predicted_trifecta TEXT')
+        conn.execute("UPDATE predictions SET predicted_trifecta = '4,1,2' WHERE race_number = 1")
+        conn.execute("UPDATE predictions SET predicted_trifecta = '1,N' WHERE race_number = 2")
+
+    # 旧版の移行（predicted_place のみ）だけが済んでいる状態を再現
+    migrations = typed_schema.MIGRATIONS
+    monkeypatch.setattr(typed_schema, 'MIGRATIONS', migrations[:1])
+    assert 'predictions_trifecta' not in ensure_typed_schema(db_path)
+    monkeypatch.setattr(typed_schema, 'MIGRATIONS', migrations)
+    monkeypatch.setattr(typed_schema, '_ready_paths', set())
+
+    assert ensure_typed_schema(db_path) == {'predictions_trifecta': 1}
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('SELECT race_number, pred_pos1, pred_pos2, pred_pos3 FROM predictions ORDER BY race_number').fetchall()
+    # 3艇そろわない三連単予想は predicted_place のまま
+    assert rows == [(1, 4, 1, 2), (2, 4, 1, 2)]
+
+
+def test_rows_written_after_migration_get_positions(tmp_path, monkeypatch):
+    """移行後に外部から追加・更新された予想行もトリガーで pred_pos1..3 が埋まる"""
+    monkeypatch.setattr(typed_schema, '_ready_paths', set())
+    db_path = str(tmp_path / 'tracker.db')
+    _legacy_db(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('ALTER TABLE predictions ADD COLUMN predicted_trifecta TEXT')
+    ensure_typed_schema(db_path)
+
+    columns = '(race_date, venue_id, race_number, predicted_win, predicted_place, predicted_trifecta)'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"INSERT INTO predictions {columns} VALUES ('2025-08-31', 2, 1, 5, '[5, 6, 1]', NULL)")
+        conn.execute(f"INSERT INTO predictions {columns} VALUES ('2025-08-31', 2, 2, 1, '1,2,3', '1-3-2')")
+        conn.execute(f"INSERT INTO predictions {columns} VALUES ('2025-08-31', 2, 3, 4, '4-2-N', '4,N')")
+        conn.execute("UPDATE predictions SET predicted_place = '2,1,3' WHERE race_date = '2025-08-30' AND race_number = 1")
+        rows = conn.execute('SELECT race_date, race_number, pred_pos1, pred_pos2, pred_pos3 FROM predictions '
+                            'ORDER BY race_date, race_number').fetchall()
+    assert rows == [('2025-08-30', 1, 2, 1, 3), ('2025-08-30', 2, 4, 1, 2),
+                    ('2025-08-31', 1, 5, 6, 1), ('2025-08-31', 2, 1, 3, 2), ('2025-08-31', 3, 4, 2, None)]